@@ -44,27 +44,141 @@ except ImportError:
 from discord.ext import commands
 import json
 import os
+import io
+import csv
+import time
 from datetime import datetime, timedelta
 import asyncio
 import pytz
 from zoneinfo import ZoneInfo
 
 from time_tracker import TimeTracker
+from status_engine import StatusEngine
+from name_index import KeyListSource
+from rankings import UserRankings
+from payroll import PayrollTable
+from render_cache import RenderCache, embed_fingerprint
+from role_cache import RoleTypeCache
+from tier_matcher import TierMatcher
+from credit_engine import CreditEngine
+from credit_ledger import KIND_MILESTONE, KIND_GRANT, KIND_REMOVAL
+from notification_outbox import NotificationOutbox, NotificationFileStore, LANE_MILESTONE, LANE_MOVEMENT
+from channel_registry import ChannelRegistry
+from command_sync import CommandSyncState, tree_fingerprint
+from job_runner import JobRunner
+from member_cache import MemberLRU, MemberResolver, MODE_TRACKED, MEMBER_CACHE_MODES, current_rss_mb
+from guild_partitions import GuildPartitions, PartitionProxy, merge_config
+from voice_tracking import VoicePresenceBatcher
 
 # Configuración del bot
+# Momento de arranque (para medir cuánto tarda el bot en estar listo)
+process_started = time.perf_counter()
+
+def read_member_cache_config() -> dict:
+    """Política de caché de miembros (config.json -> member_cache); se lee antes de crear el bot"""
+    try:
+        with open('config.json', 'r') as f:
+            return json.load(f).get('member_cache', {})
+    except Exception:
+        return {}
+
+member_cache_config = read_member_cache_config()
+MEMBER_CACHE_MODE = member_cache_config.get('mode', MODE_TRACKED)
+if MEMBER_CACHE_MODE not in MEMBER_CACHE_MODES:
+    print(f"⚠️ Modo de caché de miembros desconocido '{MEMBER_CACHE_MODE}', usando '{MODE_TRACKED}'")
+    MEMBER_CACHE_MODE = MODE_TRACKED
+
+def read_sharding_config() -> dict:
+    """Sharding (config.json -> sharding); SHARD_COUNT y SHARD_IDS permiten repartir los shards entre procesos"""
+    try:
+        with open('config.json', 'r') as f:
+            sharding = json.load(f).get('sharding', {})
+    except Exception:
+        sharding = {}
+
+    shard_count = os.getenv('SHARD_COUNT') or sharding.get('shard_count')
+    shard_ids = os.getenv('SHARD_IDS') or sharding.get('shard_ids')
+    if isinstance(shard_ids, str):
+        shard_ids = [int(shard_id) for shard_id in shard_ids.split(',') if shard_id.strip()]
+    return {
+        'enabled': bool(sharding.get('enabled')) or bool(shard_count) or bool(shard_ids),
+        'shard_count': int(shard_count) if shard_count else None,
+        'shard_ids': shard_ids or None
+    }
+
+sharding_config = read_sharding_config()
+SHARDING_ENABLED = sharding_config['enabled']
+# Solo una parte de los shards en este proceso: los demás los atienden otros procesos
+SHARDED_ACROSS_PROCESSES = sharding_config['shard_ids'] is not None
+if SHARDED_ACROSS_PROCESSES and not sharding_config['shard_count']:
+    print("❌ Para repartir shards entre procesos indica también shard_count (o SHARD_COUNT)")
+    exit(1)
+
 intents = discord.Intents.default()
 intents.voice_states = True
 intents.guilds = True
 intents.members = True
-intents.message_content = True
-
-bot = commands.Bot(command_prefix='!', intents=intents)
-time_tracker = TimeTracker()
+# Sin message_content: el bot solo usa comandos slash y no lee el texto de los mensajes
+
+class GuildCommandTree(discord.app_commands.CommandTree):
+    """Árbol de comandos que fija el servidor de cada interacción antes de ejecutar el comando"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        guild_partitions.enter(interaction.guild_id)
+        return True
+
+class GuildView(discord.ui.View):
+    """Vista cuyos botones y menús trabajan con el estado del servidor de la interacción"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        guild_partitions.enter(interaction.guild_id)
+        return True
+
+class GuildModal(discord.ui.Modal):
+    """Formulario que trabaja con el estado del servidor de la interacción"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        guild_partitions.enter(interaction.guild_id)
+        return True
+
+bot_options = {'command_prefix': '!', 'intents': intents, 'tree_cls': GuildCommandTree}
+if MEMBER_CACHE_MODE == MODE_TRACKED:
+    # Sin descargar todos los miembros al conectar ni guardar a cada miembro que entra o cambia:
+    # solo se cargan los registrados y los que tienen un rol de tier (ver warm_member_cache) y el
+    # resto bajo demanda. Sin el flag voice: con solo voice, discord.py saca de la caché a quien
+    # sale de un canal de voz y ese miembro deja de recibir on_member_update
+    bot_options.update(member_cache_flags=discord.MemberCacheFlags.none(), chunk_guilds_at_startup=False)
+
+if SHARDING_ENABLED:
+    # Una conexión al gateway por shard; cada servidor llega siempre por el mismo shard
+    if sharding_config['shard_count']:
+        bot_options['shard_count'] = sharding_config['shard_count']
+    if SHARDED_ACROSS_PROCESSES:
+        bot_options['shard_ids'] = sharding_config['shard_ids']
+    bot = commands.AutoShardedBot(**bot_options)
+    print(f"✅ Sharding activado: shards {sharding_config['shard_ids'] or 'todos'} "
+          f"de {sharding_config['shard_count'] or 'los que indique Discord'}")
+else:
+    bot = commands.Bot(**bot_options)
+print(f"✅ Caché de miembros en modo '{MEMBER_CACHE_MODE}'")
+
+# Archivos de estado propios del proceso (con varios procesos, cada uno guarda los de sus shards)
+PROCESS_FILE_SUFFIX = (
+    "_shards_" + "-".join(str(shard_id) for shard_id in sharding_config['shard_ids'])
+    if SHARDED_ACROSS_PROCESSES else ""
+)
 
 # Configuración de zona horaria Colombia
 COLOMBIA_TZ = ZoneInfo("America/Bogota")
-START_TIME_HOUR = 17  # 5:00 PM Colombia
-START_TIME_MINUTE = 00  # 00 minutos
+
+# Horario por defecto (config.json -> schedule; cada servidor puede cambiarlo en guilds -> <id> -> schedule)
+DEFAULT_SCHEDULE = {
+    'timezone': "America/Bogota",
+    'start': "17:00",   # Inicio automático de los pre-registrados
+    'stop': "20:01",    # Detención automática de todos los tiempos
+    'reset': "00:00",   # Reseteo de límites diarios
+    'cutoff': "19:01"   # Hora desde la que ya no se pueden iniciar tiempos
+}
 
 # Task para verificar hora de inicio
 auto_start_task = None
@@ -75,7 +189,15 @@ auto_reset_task = None
 config = {}
 GOLD_ROLE_ID = 1382198935971430440  # ID Gold hardcoded
 RECLUTA_ROLE_ID = 1430689715761451114  # ID Recluta hardcoded
-ROLE_TIERS = {}  # Diccionario para almacenar los nuevos roles
+
+# Canales de notificación del servidor principal si config.json no los indica
+NOTIFICATION_KINDS = ('milestones', 'pauses', 'cancellations', 'movements')
+DEFAULT_NOTIFICATION_CHANNELS = {
+    'milestones': 1430689717602615300,
+    'pauses': 1430689717602615301,
+    'cancellations': 1430689718080897125,
+    'movements': 1430689717602615298  # Canal para notificaciones de movimientos
+}
 
 try:
     with open('config.json', 'r') as f:
@@ -86,81 +208,283 @@ try:
     if config_gold_id:
         GOLD_ROLE_ID = config_gold_id
 
-    # Cargar configuración de roles por niveles
-    ROLE_TIERS = config.get('role_tiers', {})
-
     print(f"✅ Rol Gold configurado: ID {GOLD_ROLE_ID}")
     print(f"✅ Rol Recluta configurado: ID {RECLUTA_ROLE_ID}")
-    print(f"✅ Roles por niveles cargados: {len(ROLE_TIERS)} niveles")
+    print(f"✅ Roles por niveles cargados: {len(config.get('role_tiers', {}))} niveles")
 
-    # Cargar IDs de canales de notificación desde config
+    # IDs de canales de notificación del servidor principal
     notification_channels = config.get('notification_channels', {})
-    NOTIFICATION_CHANNEL_ID = notification_channels.get('milestones', 1430689717602615300)
-    PAUSE_NOTIFICATION_CHANNEL_ID = notification_channels.get('pauses', 1430689717602615301)
-    CANCELLATION_NOTIFICATION_CHANNEL_ID = notification_channels.get('cancellations', 1430689718080897125)
-    MOVEMENTS_CHANNEL_ID = notification_channels.get('movements', 1430689717602615298)  # Canal para notificaciones de movimientos
-
     print(f"✅ Canales de notificación cargados:")
-    print(f"  - Milestones: {NOTIFICATION_CHANNEL_ID}")
-    print(f"  - Pausas: {PAUSE_NOTIFICATION_CHANNEL_ID}")
-    print(f"  - Cancelaciones: {CANCELLATION_NOTIFICATION_CHANNEL_ID}")
-    print(f"  - Movimientos: {MOVEMENTS_CHANNEL_ID}")
+    print(f"  - Milestones: {notification_channels.get('milestones', DEFAULT_NOTIFICATION_CHANNELS['milestones'])}")
+    print(f"  - Pausas: {notification_channels.get('pauses', DEFAULT_NOTIFICATION_CHANNELS['pauses'])}")
+    print(f"  - Cancelaciones: {notification_channels.get('cancellations', DEFAULT_NOTIFICATION_CHANNELS['cancellations'])}")
+    print(f"  - Movimientos: {notification_channels.get('movements', DEFAULT_NOTIFICATION_CHANNELS['movements'])}")
+
+    if config.get('guilds'):
+        print(f"✅ Configuración propia para {len(config['guilds'])} servidor(es) adicional(es)")
 
 except Exception as e:
     print(f"⚠️ No se pudo cargar configuración: {e}")
     config = {}
     # Valores por defecto si no se puede cargar config
-    NOTIFICATION_CHANNEL_ID = 1430689717602615300
-    PAUSE_NOTIFICATION_CHANNEL_ID = 1430689717602615301
-    CANCELLATION_NOTIFICATION_CHANNEL_ID = 1430689718080897125
-    MOVEMENTS_CHANNEL_ID = 1430689717602615298
     GOLD_ROLE_ID = 1382198935971430440
     RECLUTA_ROLE_ID = 1430689715761451114
 
+# Con varios procesos cada uno ve solo sus servidores: "el primero" no identifica a ninguno
+if SHARDED_ACROSS_PROCESSES and not config.get('primary_guild_id'):
+    print("❌ Para repartir shards entre procesos indica primary_guild_id en config.json")
+    exit(1)
+
+# Estado separado por servidor: el principal (primary_guild_id o, si no está, el primero
+# al que se conecta el bot) usa user_times.json; cada servidor adicional, user_times_<id>.json
+guild_partitions = GuildPartitions(lambda guild_id, primary: GuildState(guild_id, primary, config),
+                                   primary_guild_id=config.get('primary_guild_id'))
+
+# Estado del servidor en curso (el de la interacción, el evento o la tarea de fondo)
+time_tracker = PartitionProxy(guild_partitions, 'time_tracker')
+status_engine = PartitionProxy(guild_partitions, 'status_engine')
+user_rankings = PartitionProxy(guild_partitions, 'user_rankings')
+payroll_table = PartitionProxy(guild_partitions, 'payroll_table')
+credit_engine = PartitionProxy(guild_partitions, 'credit_engine')
+row_render_cache = PartitionProxy(guild_partitions, 'row_render_cache')
+notification_outbox = PartitionProxy(guild_partitions, 'notification_outbox')
+ROLE_TIERS = PartitionProxy(guild_partitions, 'role_tiers')
+
+def current_guild():
+    """Servidor del trabajo en curso (el principal si no hay ninguno fijado)"""
+    return guild_partitions.current().guild()
+
+def is_local_guild(guild_id) -> bool:
+    """Si el servidor llega por alguno de los shards de este proceso"""
+    if guild_id is None:
+        # Servidor principal aún sin ID: solo puede ser uno de los de este proceso
+        return True
+    return bot.get_guild(guild_id) is not None
+
+def get_local_states():
+    """Estados de los servidores de este proceso (con varios procesos, cada uno trabaja solo los suyos)"""
+    return [state for state in guild_partitions.all() if is_local_guild(state.guild_id)]
+
+def get_partition_guild_ids():
+    """Servidores cuyo trabajo de fondo (milestones, horarios y avisos) corre en este proceso"""
+    return [state.guild_id for state in get_local_states()]
+
 # Task para verificar milestones periódicamente
 milestone_check_task = None
 
+# Huellas de los comandos ya sincronizados por ámbito (global y por servidor)
+command_sync_state = CommandSyncState(f"command_sync_state{PROCESS_FILE_SUFFIX}.json")
+commands_checked = False
+
 @bot.event
 async def on_ready():
     print(f'{bot.user} se ha conectado a Discord!')
 
-    # Verificar que el canal de notificaciones existe
-    channel = bot.get_channel(NOTIFICATION_CHANNEL_ID)
-    if channel:
-        if hasattr(channel, 'name'):
-            print(f'Canal de notificaciones encontrado: {channel.name} (ID: {channel.id})')
-        else:
-            print(f'Canal de notificaciones encontrado (ID: {channel.id})')
-    else:
-        print(f'⚠️ Canal de notificaciones no encontrado con ID: {NOTIFICATION_CHANNEL_ID}')
+    # Servidor principal: el de config.json o, si no se indica, el primero (como antes)
+    if bot.guilds:
+        guild_partitions.bind_primary(bot.guilds[0].id)
+        if len(bot.guilds) > 1 and not config.get('primary_guild_id'):
+            print("⚠️ El bot está en varios servidores: indica primary_guild_id en config.json "
+                  "para que user_times.json siempre sea del mismo servidor")
+    for guild in bot.guilds:
+        guild_partitions.get(guild.id)
+
+    # Resolver y validar una sola vez los canales de notificación
+    refresh_notification_channels()
+
+    # Miembros registrados en la caché antes de materializar sus roles
+    await warm_member_cache()
+
+    # Materializar estados ahora que los roles de los miembros están disponibles
+    for state in get_local_states():
+        with guild_partitions.use(state.guild_id):
+            state.rebuild()
+
+    # Paneles en vivo: restaurar los guardados y registrar sus botones persistentes
+    global dashboard_view_registered
+    if not dashboard_view_registered:
+        load_dashboards()
+        bot.add_view(DashboardView())
+        dashboard_view_registered = True
+        print(f'✅ Paneles en vivo restaurados: {len(live_dashboards)}')
+
+        # Avisos guardados que no llegaron a enviarse antes del último apagado
+        for state in get_local_states():
+            with guild_partitions.use(state.guild_id):
+                restored_notifications = state.notification_outbox.restore()
+            if restored_notifications:
+                print(f'📨 Notificaciones pendientes reencoladas en {state.guild_id}: {restored_notifications}')
+    for state in get_local_states():
+        print(f'✅ Estados materializados para {len(state.status_engine.status)} usuarios del servidor {state.guild_id}')
+
+    # Seguimiento por voz: los que ya están en los canales no generaron eventos mientras el bot estaba caído
+    for state in get_local_states():
+        if state.auto_voice_tracking and not state.voice_channel_ids:
+            print(f"⚠️ auto_voice_tracking activo sin voice_channel_ids en el servidor {state.guild_id}")
+        in_voice = sync_voice_presence(state)
+        if in_voice:
+            print(f'🎙️ {in_voice} usuarios ya en los canales de voz del servidor {state.guild_id}')
+
+    # Los comandos se sincronizan una sola vez por proceso (las reconexiones no vuelven a sincronizar)
+    global commands_checked
+    if not commands_checked:
+        commands_checked = True
+        await sync_command_tree()
+
+async def sync_command_tree(force: bool = False) -> dict:
+    """Sincronizar los comandos slash solo en los ámbitos cuyas definiciones cambiaron
+
+    Devuelve ámbito -> número de comandos sincronizados (None si no hizo falta).
+    """
+    results = {}
+    scopes = [(f"guild:{guild.id}", guild) for guild in bot.guilds]
+    # Con varios procesos, los comandos globales los sincroniza solo el que tiene el shard 0
+    if not SHARDED_ACROSS_PROCESSES or 0 in sharding_config['shard_ids']:
+        scopes.insert(0, ("global", None))
+
+    for scope, guild in scopes:
+        scope_name = guild.name if guild else "global"
+        try:
+            fingerprint = tree_fingerprint(bot.tree, guild=guild)
+            if not force and not command_sync_state.needs_sync(scope, fingerprint):
+                print(f'✅ Comandos sin cambios en {scope_name}, no se sincroniza')
+                results[scope] = None
+                continue
 
-    try:
-        # Sincronización global primero
-        print("🔄 Sincronizando comandos globalmente...")
-        synced_global = await bot.tree.sync()
-        print(f'✅ Sincronizados {len(synced_global)} comando(s) slash globalmente')
-
-        # Sincronización específica del guild si hay guilds
-        if bot.guilds:
-            for guild in bot.guilds:
-                try:
-                    print(f"🔄 Sincronizando comandos en {guild.name} (ID: {guild.id})...")
-                    synced_guild = await bot.tree.sync(guild=guild)
-                    print(f'✅ Sincronizados {len(synced_guild)} comando(s) en {guild.name}')
-                except Exception as guild_error:
-                    print(f'⚠️ Error sincronizando en {guild.name}: {guild_error}')
+            print(f"🔄 Sincronizando comandos en {scope_name}...")
+            synced = await bot.tree.sync(guild=guild)
+            command_sync_state.mark_synced(scope, fingerprint)
+            results[scope] = len(synced)
+            print(f'✅ Sincronizados {len(synced)} comando(s) en {scope_name}')
+        except Exception as e:
+            print(f'⚠️ Error sincronizando comandos en {scope_name}: {e}')
 
-        # Listar todos los comandos registrados
-        commands = [cmd.name for cmd in bot.tree.get_commands()]
-        print(f'📋 Comandos registrados ({len(commands)}): {", ".join(commands)}')
+    # Listar todos los comandos registrados
+    commands = [cmd.name for cmd in bot.tree.get_commands()]
+    print(f'📋 Comandos registrados ({len(commands)}): {", ".join(commands)}')
 
+    if any(count is not None for count in results.values()):
         print("💡 Si los comandos no aparecen inmediatamente:")
         print("   • Espera 1-5 minutos para que Discord los propague")
         print("   • Reinicia tu cliente de Discord")
         print("   • Verifica que el bot tenga permisos de 'applications.commands'")
+    return results
+
+def get_notification_channel_ids():
+    """Canales configurados para notificaciones en los servidores de este proceso (sin repetir)"""
+    return list(dict.fromkeys(
+        channel_id
+        for state in get_local_states()
+        for channel_id in state.notification_channels.values()
+        if channel_id is not None
+    ))
+
+def get_notification_channel_id(kind: str):
+    """Canal de un tipo de aviso en el servidor en curso (None si no tiene)"""
+    return guild_partitions.current().notification_channels.get(kind)
+
+def check_notification_channel(channel):
+    """Motivo por el que el bot no puede publicar en el canal (None si puede)"""
+    guild = getattr(channel, 'guild', None)
+    if guild is None or guild.me is None:
+        return None
+    if not channel.permissions_for(guild.me).send_messages:
+        return "sin permiso para enviar mensajes"
+    return None
 
-    except Exception as e:
-        print(f'❌ Error al sincronizar comandos: {e}')
+def refresh_notification_channels():
+    """Volver a resolver los canales de notificación (al conectar o si cambia alguno)"""
+    results = channel_registry.resolve(get_notification_channel_ids(), bot.get_channel, check_notification_channel)
+    for channel_id, problem in results.items():
+        channel = channel_registry.get(channel_id)
+        if problem is None:
+            print(f'✅ Canal de notificaciones listo: {getattr(channel, "name", channel_id)} (ID: {channel_id})')
+        else:
+            print(f'⚠️ Canal de notificaciones {channel_id} no utilizable: {problem}')
+
+def get_notification_channel(channel_id: int):
+    """Canal de la caché; si no está (p. ej. antes de conectar) se busca en la caché de discord.py"""
+    return channel_registry.get(channel_id) or bot.get_channel(channel_id)
+
+@bot.event
+async def on_guild_channel_create(channel):
+    if channel.id in get_notification_channel_ids():
+        refresh_notification_channels()
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    if channel.id in get_notification_channel_ids():
+        refresh_notification_channels()
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    # Cambios de permisos o de nombre de un canal de notificaciones
+    if after.id in get_notification_channel_ids():
+        refresh_notification_channels()
+
+@bot.event
+async def on_guild_join(guild: discord.Guild):
+    """Servidor nuevo: crear su estado (con sus propios archivos) y sus canales"""
+    with guild_partitions.use(guild.id) as state:
+        state.rebuild()
+    refresh_notification_channels()
+    print(f"✅ Nuevo servidor {guild.name} ({guild.id}): {len(state.time_tracker.data)} usuarios registrados")
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    """Actualizar el estado materializado cuando cambian los roles de un miembro"""
+    if before.roles != after.roles:
+        state = guild_partitions.get(after.guild.id)
+        state.role_type_cache.invalidate(after.id)
+        state.status_engine.set_role(after.id, get_user_role_type(after))
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    """Un usuario registrado que vuelve al servidor recupera su tier"""
+    pin_member(member)
+    state = guild_partitions.get(member.guild.id)
+    state.role_type_cache.invalidate(member.id)
+    state.status_engine.set_role(member.id, get_user_role_type(member))
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    """Fuera del servidor un usuario registrado cuenta como recluta"""
+    state = guild_partitions.get(member.guild.id)
+    state.role_type_cache.invalidate(member.id)
+    state.status_engine.set_role(member.id, "normal")
+
+@bot.event
+async def on_guild_role_update(before: discord.Role, after: discord.Role):
+    """Un rol renombrado puede cambiar el tier de todos sus miembros (coincidencia por nombre)"""
+    if before.name != after.name:
+        guild_partitions.get(after.guild.id).refresh_roles()
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    """Un rol eliminado cambia el tier de sus miembros"""
+    guild_partitions.get(role.guild.id).refresh_roles()
+
+def reload_role_config() -> bool:
+    """Releer config.json y aplicar roles, canales y horarios a cada servidor"""
+    global GOLD_ROLE_ID, config
+    new_config = load_config()
+    if not new_config:
+        return False
+
+    config = new_config
+    GOLD_ROLE_ID = new_config.get('gold_role_id') or GOLD_ROLE_ID
+    failed = 0
+    for state in guild_partitions.all():
+        with guild_partitions.use(state.guild_id):
+            try:
+                state.reload_config(new_config)
+            except Exception as e:
+                # apply_config no asigna nada si falla: el servidor sigue con la configuración anterior
+                failed += 1
+                print(f"❌ Configuración inválida para el servidor {state.guild_id}, se mantiene la anterior: {e}")
+    refresh_notification_channels()
+    print(f"✅ Configuración recargada para {len(guild_partitions.all()) - failed} servidor(es): Gold {GOLD_ROLE_ID}")
+    return not failed
 
 def is_admin():
     """Decorator para verificar si el usuario tiene permisos"""
@@ -169,8 +493,9 @@ def is_admin():
             if not hasattr(interaction, 'guild') or not interaction.guild:
                 return False
 
-            member = interaction.guild.get_member(interaction.user.id)
-            if not member:
+            # El miembro llega con la interacción; no hace falta buscarlo en la caché
+            member = interaction.user
+            if not isinstance(member, discord.Member):
                 return False
 
             if member.bot:
@@ -198,56 +523,22 @@ def load_config():
 
 
 def calculate_credits(total_seconds: float, role_type: str = "normal", user_id: int = None) -> float:
-    """Calcular créditos basado SOLO en horas completas del tiempo base (SIN contar minutos extra)"""
-    try:
-        if not isinstance(total_seconds, (int, float)) or total_seconds < 0:
-            return 0
-
-        # Calcular solo horas completas
-        total_hours = int(total_seconds // 3600)
-
-        # Sistema de roles por niveles
-        if role_type == "medios":
-            if total_hours >= 2:
-                return 10  # 2 horas = 10 créditos
-            elif total_hours >= 1:
-                return 5   # 1 hora = 5 créditos
-            else:
-                return 0
-
-        elif role_type in ["altos", "imperiales", "nobleza", "monarquia", "supremos"]:
-            tier_config = ROLE_TIERS.get(role_type, {})
-            credits_per_hour = tier_config.get('credits_per_hour', 0)
-
-            # Calcular créditos proporcionales por cada hora completa trabajada
-            credits = total_hours * credits_per_hour
-
-            # Redondear al entero más cercano
-            rounded_credits = round(credits)
-
-            # Si el resultado redondeado es un número entero, devolverlo como int
-            if rounded_credits == credits or abs(credits - rounded_credits) < 0.01:
-                return int(rounded_credits)
-
-            # Si tiene decimales significativos, devolverlos con 2 decimales
-            return round(credits, 2)
-
-        elif role_type == "gold":
-            # Gold ahora gana créditos: 6 por hora
-            credits = total_hours * 6
-            return credits
-
-        else:
-            # Usuarios sin rol específico (normal/recluta)
-            if total_hours >= 1:
-                return 4
-            else:
-                return 0
+    """Calcular créditos basado SOLO en horas completas del tiempo base (SIN contar minutos extra)
 
+    Medios: 1h = 5, 2h = 10. Altos-Supremos: credits_per_hour por hora completa (entero si
+    el redondeo está a menos de 0.01). Gold: 6 por hora. Reclutas: 4 al completar 1 hora.
+    """
+    try:
+        return credit_engine.credits(total_seconds, role_type)
     except Exception as e:
         print(f"Error calculando créditos: {e}")
         return 0
 
+def get_week_start(now: datetime) -> datetime:
+    """Lunes 00:00 de la semana de la fecha dada (en la zona horaria de la fecha, si la tiene)"""
+    monday = now - timedelta(days=now.weekday())
+    return monday.replace(hour=0, minute=0, second=0, microsecond=0)
+
 def get_confirmed_credits(user_id: int) -> int:
     """Obtener créditos YA CONFIRMADOS (solo los que se notificaron oficialmente)"""
     user_data = time_tracker.get_user_data(user_id)
@@ -256,94 +547,27 @@ def get_confirmed_credits(user_id: int) -> int:
     return user_data.get('confirmed_credits', 0)
 
 def get_user_role_type(member: discord.Member) -> str:
-    """Determina el tipo de rol del usuario - SISTEMA CON NIVELES"""
+    """Determina el tipo de rol del usuario - SISTEMA CON NIVELES
+
+    Prioridad: niveles por ID, niveles por nombre, Gold por ID, Gold por nombre,
+    Medios por ID, Medios por nombre y, si no hay ninguno, Recluta. Se resuelve con los
+    roles configurados del servidor del miembro y se cachea por miembro y conjunto de roles.
+    """
     if not member:
         return "normal"
-
-    # PRIORIDAD 1: Verificar roles por niveles PRIMERO (orden de mayor a menor jerarquía)
-    # Gold ahora está DEBAJO de Altos en prioridad
-    role_priority = ["supremos", "monarquia", "nobleza", "imperiales", "altos"]
-
-    for tier_name in role_priority:
-        tier_config = ROLE_TIERS.get(tier_name, {})
-        tier_role_id = tier_config.get('role_id')
-
-        # Verificar PRIMERO por ID configurado (sin ignorar ningún ID válido)
-        if tier_role_id and isinstance(tier_role_id, int):
-            for role in member.roles:
-                if role.id == tier_role_id:
-                    return tier_name
-
-    # RESPALDO: Verificar por nombre del rol si NO se encontró por ID
-    tier_names = {
-        "medios": ["medios", "medio", "[⚔️]  medios", "[⚔️] medios"],
-        "altos": ["altos", "alto", "[⚔️]  altos", "[⚔️] altos"],
-        "imperiales": ["imperiales", "imperial", "[👑]  imperiales", "[👑] imperiales"],
-        "nobleza": ["nobleza", "[🏰]  nobleza", "[🏰] nobleza"],
-        "monarquia": ["monarquia", "monarquía", "[💎]  monarquia", "[💎] monarquía"],
-        "supremos": ["supremos", "supremo", "[⭐]  supremos", "[⭐] supremos"]
-    }
-
-    for tier_name in role_priority:
-        if tier_name in tier_names:
-            for role in member.roles:
-                role_name_lower = role.name.lower().strip()
-                for valid_name in tier_names[tier_name]:
-                    if valid_name.lower() in role_name_lower:
-                        return tier_name
-
-    # PRIORIDAD 2: Verificar Gold (después de Altos, antes de Medios)
-    gold_role_ids = [GOLD_ROLE_ID, 1382198935971430440]
-    for role in member.roles:
-        if role.id in gold_role_ids:
-            return "gold"
-
-    # RESPALDO Gold: Verificar por nombre si no se encontró por ID
-    gold_names = ["gold", "[🟡]  gold", "[🟡] gold", "🟡 gold", "[🟡]gold", "🟡gold"]
-    for role in member.roles:
-        role_name_lower = role.name.lower().strip()
-        # Limpiar espacios extra del nombre del rol
-        role_name_cleaned = ' '.join(role_name_lower.split())
-        for valid_name in gold_names:
-            valid_name_cleaned = ' '.join(valid_name.lower().split())
-            if valid_name_cleaned in role_name_cleaned or role_name_cleaned in valid_name_cleaned:
-                return "gold"
-
-    # PRIORIDAD 3: Verificar Medios
-    role_priority_medios = ["medios"]
-
-    for tier_name in role_priority_medios:
-        tier_config = ROLE_TIERS.get(tier_name, {})
-        tier_role_id = tier_config.get('role_id')
-
-        # Verificar por ID configurado
-        if tier_role_id and isinstance(tier_role_id, int):
-            for role in member.roles:
-                if role.id == tier_role_id:
-                    return tier_name
-
-        # RESPALDO: Verificar por nombre del rol si NO se encontró por ID
-        tier_names_medios = {
-            "medios": ["medios", "medio", "[⚔️]  medios", "[⚔️] medios"]
-        }
-
-        if tier_name in tier_names_medios:
-            for role in member.roles:
-                role_name_lower = role.name.lower().strip()
-                for valid_name in tier_names_medios[tier_name]:
-                    if valid_name.lower() in role_name_lower:
-                        return tier_name
-
-    # PRIORIDAD 4: Si no tiene ningún rol especial, es Recluta
-    return "normal"
+    guild = getattr(member, 'guild', None)
+    state = guild_partitions.get(guild.id) if guild is not None else guild_partitions.current()
+    return state.role_type_cache.get(member)
 
 def get_role_info(member: discord.Member) -> str:
     """Obtiene la información del rol del usuario"""
     if not member:
         return " (Recluta)"
 
-    role_type = get_user_role_type(member)
+    return get_role_info_for_type(get_user_role_type(member))
 
+def get_role_info_for_type(role_type: str) -> str:
+    """Obtiene la información del rol a partir de un tipo ya resuelto"""
     # Mapeo de nombres de roles
     role_names = {
         "supremos": "Supremos",
@@ -360,6 +584,192 @@ def get_role_info(member: discord.Member) -> str:
     else:
         return " (Recluta)"
 
+# Miembros pedidos bajo demanda que no están en la caché de discord.py
+member_lru = MemberLRU(max_size=member_cache_config.get('lru_size', 2000),
+                       ttl=member_cache_config.get('lru_ttl_seconds', 600))
+
+def get_guild_member(guild, user_id: int):
+    """Miembro desde la caché de discord.py o desde la LRU de miembros pedidos bajo demanda"""
+    if guild is None:
+        return None
+    member = guild.get_member(user_id)
+    if member is None:
+        member = member_lru.get(guild.id, user_id)
+    return member
+
+# Pedidos por lotes al gateway de los miembros que faltan (100 IDs por petición)
+member_resolver = MemberResolver(member_lru,
+                                 lambda guild, user_id: should_cache_member(guild, user_id),
+                                 missing_ttl=member_cache_config.get('lru_ttl_seconds', 600))
+
+# Espera máxima de una vista antes de responder con los miembros que ya haya (límite de 3s de Discord)
+MEMBER_RESOLVE_TIMEOUT = 1.5
+
+async def resolve_guild_members(guild, user_ids, timeout=None, unresolved=None):
+    """Miembros de los IDs dados, pidiendo juntos los que faltan en caché
+
+    Los usuarios registrados que llegan nuevos a la caché de discord.py recuperan su rol real
+    en el motor de estado (mientras faltaban se mostraban como reclutas). En unresolved (un set)
+    quedan los IDs que no se pudieron comprobar porque la petición al gateway falló.
+    """
+    if guild is None:
+        return {}
+    state = guild_partitions.get(guild.id)
+    user_ids = list(user_ids)
+    uncached = [user_id for user_id in user_ids if guild.get_member(user_id) is None]
+    members = await member_resolver.resolve_many(guild, user_ids, timeout=timeout, unresolved=unresolved)
+    for user_id in uncached:
+        member = members.get(user_id)
+        if member is not None and str(user_id) in state.time_tracker.data:
+            state.status_engine.set_role(user_id, get_user_role_type(member))
+    return members
+
+async def fetch_guild_member(guild, user_id: int):
+    """Miembro cacheado o pedido al gateway; los usuarios registrados quedan en la caché de discord.py"""
+    members = await resolve_guild_members(guild, [user_id])
+    return members.get(user_id)
+
+# guild_id -> IDs que faltan en caché (registrados o con rol de tier), esperando a pedirse juntos
+pending_member_fetches = {}
+MEMBER_FETCH_DELAY = 1.0
+
+# guild_id -> IDs vistos con un rol de tier: van a la caché de discord.py igual que los registrados
+tier_member_ids = {}
+
+def should_cache_member(guild, user_id: int) -> bool:
+    """Si un miembro pedido al gateway se guarda en la caché de discord.py (y no en la LRU)"""
+    return (str(user_id) in guild_partitions.get(guild.id).time_tracker.data
+            or user_id in tier_member_ids.get(guild.id, ()))
+
+def queue_member_fetch(guild, user_id: int) -> None:
+    """Pedir en segundo plano a un miembro que falta en la caché de discord.py
+
+    Los IDs se juntan durante MEMBER_FETCH_DELAY segundos y se piden en una sola petición por lote.
+    """
+    pending = pending_member_fetches.setdefault(guild.id, set())
+    if guild.get_member(user_id) is not None or user_id in pending:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+
+    async def flush():
+        await asyncio.sleep(MEMBER_FETCH_DELAY)
+        user_ids = list(pending)
+        pending.clear()
+        await resolve_guild_members(guild, user_ids)
+
+    if not pending:
+        loop.create_task(flush())
+    pending.add(user_id)
+
+def on_tracked_user_changed(state, user_id_str: str, user_data) -> None:
+    """Usuarios del tracker que no están en la caché (p. ej. recién registrados): pedirlos en segundo plano"""
+    if MEMBER_CACHE_MODE != MODE_TRACKED or user_data is None:
+        return
+    guild = state.guild()
+    if guild is None:
+        return
+    queue_member_fetch(guild, int(user_id_str))
+
+# Cada cuántas horas se vuelve a buscar a los miembros con rol de tier (modo tracked; 0 = nunca)
+TIER_ROLE_SCAN_HOURS = member_cache_config.get('tier_scan_hours', 6)
+# guild_id -> recorrido de roles de tier en curso
+tier_role_scans = {}
+
+def pin_member(member) -> bool:
+    """Modo tracked: traer a la caché de discord.py a un registrado o a quien tiene un rol de tier
+
+    discord.py no guarda por sí solo a los miembros que llegan en un evento (entrada al servidor,
+    canal de voz) y sin estar en caché no recibe on_member_update, así que su tier quedaría viejo.
+    Se piden al gateway por lotes (query_members con cache=True); una vez en caché no se repite.
+    """
+    if MEMBER_CACHE_MODE != MODE_TRACKED or member.bot:
+        return False
+    guild = member.guild
+    if guild.get_member(member.id) is not None:
+        return False
+    state = guild_partitions.get(guild.id)
+    if state.tier_matcher.resolve(member) != "normal":
+        tier_member_ids.setdefault(guild.id, set()).add(member.id)
+    elif str(member.id) not in state.time_tracker.data:
+        return False
+    # Con una copia en la LRU o marcado como fuera del servidor, el resolver no lo pediría
+    member_lru.discard(guild.id, member.id)
+    member_resolver.forget_missing(guild.id, member.id)
+    queue_member_fetch(guild, member.id)
+    return True
+
+async def pin_tier_role_holders(guild) -> int:
+    """Recorrer los miembros del servidor por REST y traer a la caché a los que tienen un rol de tier
+
+    El gateway no permite pedir miembros por rol: se recorren de 1000 en 1000 sin guardarlos y
+    los de tier se piden después por lotes para la caché. Devuelve cuántos quedaron en caché.
+    """
+    state = guild_partitions.get(guild.id)
+    tier_ids = tier_member_ids.setdefault(guild.id, set())
+    found = []
+    async for member in guild.fetch_members(limit=None):
+        if member.bot or guild.get_member(member.id) is not None:
+            continue
+        if state.tier_matcher.resolve(member) != "normal":
+            tier_ids.add(member.id)
+            member_lru.discard(guild.id, member.id)
+            member_resolver.forget_missing(guild.id, member.id)
+            found.append(member.id)
+    await resolve_guild_members(guild, found)
+    return sum(1 for user_id in found if guild.get_member(user_id) is not None)
+
+async def tier_role_scan_loop(guild):
+    """Repetir el recorrido de roles de tier cada TIER_ROLE_SCAN_HOURS horas
+
+    Un miembro fuera de caché que recibe un rol de tier no genera eventos; se recoge en el
+    siguiente recorrido (o antes, si entra a un canal de voz o vuelve a unirse al servidor).
+    """
+    while not bot.is_closed():
+        started = time.perf_counter()
+        try:
+            with guild_partitions.use(guild.id):
+                pinned = await pin_tier_role_holders(guild)
+            print(f"👥 Roles de tier en {guild.id}: {pinned} miembros nuevos en caché "
+                  f"({time.perf_counter() - started:.1f}s)")
+        except Exception as e:
+            print(f"⚠️ Error recorriendo los roles de tier del servidor {guild.id}: {e}")
+        await asyncio.sleep(TIER_ROLE_SCAN_HOURS * 3600)
+
+async def warm_member_cache():
+    """Cargar en la caché solo a los usuarios registrados (modo tracked) y registrar memoria y tiempos"""
+    started = time.perf_counter()
+    loaded = 0
+    if MEMBER_CACHE_MODE == MODE_TRACKED:
+        for guild in bot.guilds:
+            # Cada servidor carga solo a los registrados en su propio tracker
+            tracked_ids = [int(user_id_str) for user_id_str in guild_partitions.get(guild.id).time_tracker.data]
+            missing = [user_id for user_id in tracked_ids if guild.get_member(user_id) is None]
+            members = await member_resolver.resolve_many(guild, missing)
+            loaded += len(members)
+            # Los que tienen un rol de tier se buscan en segundo plano (no retrasan el arranque)
+            if TIER_ROLE_SCAN_HOURS > 0 and guild.id not in tier_role_scans:
+                tier_role_scans[guild.id] = bot.loop.create_task(tier_role_scan_loop(guild))
+
+    cached_members = sum(len(guild.members) for guild in bot.guilds)
+    total_members = sum(guild.member_count or 0 for guild in bot.guilds)
+    rss = current_rss_mb()
+    print(f"👥 Caché de miembros ({MEMBER_CACHE_MODE}): {cached_members}/{total_members} miembros en memoria, "
+          f"{loaded} cargados en {time.perf_counter() - started:.2f}s")
+    print(f"⏱️ Listo {time.perf_counter() - process_started:.1f}s después de arrancar"
+          + (f" • memoria residente: {rss:.1f} MB" if rss is not None else ""))
+
+# Cantidad máxima de usuarios en las vistas de ranking
+RANKING_SIZE = 50
+
+# Modos de orden de /ver_tiempos y /pagas
+SORT_LABELS = {
+    "time": "Top tiempo",
+    "credits": "Top créditos"
+}
+
 def has_unlimited_time_role(member: discord.Member) -> bool:
     """Verificar si el usuario tiene un rol que le otorga tiempo ilimitado (rol Gold)"""
     if not member:
@@ -369,6 +779,9 @@ def has_unlimited_time_role(member: discord.Member) -> bool:
     role_type = get_user_role_type(member)
     return role_type == "gold"
 
+# Rol necesario para iniciar tiempo (a mano o al entrar a un canal de voz)
+VERIFIED_ROLE_ID = 1430689715761451113
+
 @bot.tree.command(name="iniciar_tiempo", description="Iniciar el seguimiento de tiempo para un usuario")
 @discord.app_commands.describe(usuario="El usuario para quien iniciar el seguimiento de tiempo")
 @is_admin()
@@ -377,9 +790,8 @@ async def iniciar_tiempo(interaction: discord.Interaction, usuario: discord.Memb
         await interaction.response.send_message("❌ No se puede rastrear el tiempo de bots.", ephemeral=True)
         return
 
-    # Verificar que el usuario tenga el rol requerido (ID: 1430689715761451113)
-    required_role_id = 1430689715761451113
-    has_required_role = any(role.id == required_role_id for role in usuario.roles)
+    # Verificar que el usuario tenga el rol requerido (Verificado)
+    has_required_role = any(role.id == VERIFIED_ROLE_ID for role in usuario.roles)
 
     if not has_required_role:
         await interaction.response.send_message(
@@ -389,19 +801,18 @@ async def iniciar_tiempo(interaction: discord.Interaction, usuario: discord.Memb
         )
         return
 
-    # Obtener hora actual en Colombia
-    colombia_now = datetime.now(COLOMBIA_TZ)
+    # Obtener hora actual en Colombia (o en la zona horaria del servidor)
+    colombia_now = guild_partitions.current().now()
     current_hour = colombia_now.hour
     current_minute = colombia_now.minute
 
-    # NUEVA VALIDACIÓN: No permitir iniciar después de las 19:01 (7:01 PM)
-    cutoff_hour = 19
-    cutoff_minute = 1
+    # NUEVA VALIDACIÓN: No permitir iniciar después de la hora de corte (19:01 por defecto)
+    cutoff_hour, cutoff_minute = guild_partitions.current().schedule['cutoff']
     is_after_cutoff = (current_hour > cutoff_hour) or (current_hour == cutoff_hour and current_minute >= cutoff_minute)
 
     if is_after_cutoff:
         await interaction.response.send_message(
-            f"❌ No se pueden iniciar tiempos después de las 19:01 (7:01 PM) hora Colombia.\n"
+            f"❌ No se pueden iniciar tiempos después de las {cutoff_hour}:{cutoff_minute:02d} hora Colombia.\n"
             f"⏰ Hora actual: {colombia_now.strftime('%H:%M')} Colombia",
             ephemeral=True
         )
@@ -519,43 +930,48 @@ async def pausar_tiempo(interaction: discord.Interaction, usuario: discord.Membe
 
     # Obtener el tipo de rol del usuario para pasarlo a pause_tracking
     role_type = get_user_role_type(usuario)
-    success = time_tracker.pause_tracking(usuario.id, user_role_type=role_type) # Pasar el tipo de rol
-
-    if success:
-        # Obtener el tiempo total después de pausar para la notificación
-        total_time_after = time_tracker.get_total_time(usuario.id)
-        session_time = total_time_after - total_time_before
-        pause_count = time_tracker.get_pause_count(usuario.id) # Obtener el nuevo contador de pausas
 
-        formatted_total_time = time_tracker.format_time_human(total_time_after)
-        formatted_session_time = time_tracker.format_time_human(session_time) if session_time > 0 else "0 Segundos"
+    # La pausa y su aviso pendiente se escriben en el mismo guardado
+    with time_tracker.batch_save():
+        success = time_tracker.pause_tracking(usuario.id, user_role_type=role_type) # Pasar el tipo de rol
 
-        # Verificar si el usuario fue cancelado automáticamente por llegar a 3 pausas
-        user_data_updated = time_tracker.get_user_data(usuario.id)
-        was_auto_cancelled = (user_data_updated and
-                             user_data_updated.get('pause_count', 0) == 0 and
-                             not user_data_updated.get('is_paused', False) and
-                             not user_data_updated.get('is_active', False))
+        if success:
+            # Obtener el tiempo total después de pausar para la notificación
+            total_time_after = time_tracker.get_total_time(usuario.id)
+            session_time = total_time_after - total_time_before
+            pause_count = time_tracker.get_pause_count(usuario.id) # Obtener el nuevo contador de pausas
+
+            formatted_total_time = time_tracker.format_time_human(total_time_after)
+            formatted_session_time = time_tracker.format_time_human(session_time) if session_time > 0 else "0 Segundos"
+
+            # Verificar si el usuario fue cancelado automáticamente por llegar a 3 pausas
+            user_data_updated = time_tracker.get_user_data(usuario.id)
+            was_auto_cancelled = (user_data_updated and
+                                 user_data_updated.get('pause_count', 0) == 0 and
+                                 not user_data_updated.get('is_paused', False) and
+                                 not user_data_updated.get('is_active', False))
+
+            if was_auto_cancelled:
+                # Usuario cancelado automáticamente por 3 pausas
+                time_lost = user_data.get('time_lost_on_cancellation', 0) if user_data else 0
+                formatted_time_lost = time_tracker.format_time_human(time_lost) if time_lost > 0 else "0 Segundos"
+
+                # Enviar notificación SOLO al canal de cancelaciones (NO al de pausas)
+                send_auto_cancellation_notification(usuario.display_name, formatted_total_time, interaction.user.mention, 3, time_lost, user_id=usuario.id)
+            else:
+                # Enviar notificación al canal de pausas SOLO si NO fue cancelado automáticamente
+                send_pause_notification(usuario.display_name, total_time_after, interaction.user.mention, formatted_session_time, pause_count, role_type, user_id=usuario.id)
 
+    if success:
         if was_auto_cancelled:
-            # Usuario cancelado automáticamente por 3 pausas
-            time_lost = user_data.get('time_lost_on_cancellation', 0) if user_data else 0
-            formatted_time_lost = time_tracker.format_time_human(time_lost) if time_lost > 0 else "0 Segundos"
-
             await interaction.response.send_message(
                 f"🚫 **{usuario.mention} ha alcanzado el límite de 3 pausas y su tiempo ha sido cancelado automáticamente.**\n"
                 f"🕐 **Tiempo conservado:** {formatted_total_time} (solo horas completas)\n"
                 f"❌ **Tiempo perdido:** {formatted_time_lost}"
             )
-
-            # Enviar notificación SOLO al canal de cancelaciones (NO al de pausas)
-            await send_auto_cancellation_notification(usuario.display_name, formatted_total_time, interaction.user.mention, 3, time_lost)
         else:
             # Pausa normal (usuarios Gold o pausas 1/3, 2/3 para reclutas)
             await interaction.response.send_message(f"PreviewPaused El tiempo de {usuario.mention} ha sido pausado")
-
-            # Enviar notificación al canal de pausas SOLO si NO fue cancelado automáticamente
-            await send_pause_notification(usuario.display_name, total_time_after, interaction.user.mention, formatted_session_time, pause_count, role_type)
     else:
         await interaction.response.send_message(f"⚠️ No hay tiempo activo para {usuario.mention}", ephemeral=True)
 
@@ -564,14 +980,17 @@ async def pausar_tiempo(interaction: discord.Interaction, usuario: discord.Membe
 @is_admin()
 async def despausar_tiempo(interaction: discord.Interaction, usuario: discord.Member):
     paused_duration = time_tracker.get_paused_duration(usuario.id)
-    success = time_tracker.resume_tracking(usuario.id)
+    # La reanudación y su aviso pendiente se escriben en el mismo guardado
+    with time_tracker.batch_save():
+        success = time_tracker.resume_tracking(usuario.id)
+        if success:
+            total_time = time_tracker.get_total_time(usuario.id)
+            formatted_paused_duration = time_tracker.format_time_human(paused_duration) if paused_duration > 0 else "0 Segundos"
+            send_unpause_notification(usuario.display_name, total_time, interaction.user.mention, formatted_paused_duration, user_id=usuario.id)
     if success:
-        total_time = time_tracker.get_total_time(usuario.id)
-        formatted_paused_duration = time_tracker.format_time_human(paused_duration) if paused_duration > 0 else "0 Segundos"
         await interaction.response.send_message(
             f"▶️ El tiempo de {usuario.mention} ha sido despausado"
         )
-        await send_unpause_notification(usuario.display_name, total_time, interaction.user.mention, formatted_paused_duration)
     else:
         await interaction.response.send_message(f"⚠️ No se puede despausar - {usuario.mention} no tiene tiempo pausado", ephemeral=True)
 
@@ -680,74 +1099,213 @@ async def quitar_minutos_extras(interaction: discord.Interaction, usuario: disco
     else:
         await interaction.response.send_message(f"❌ Error al quitar minutos extra para {usuario.mention}", ephemeral=True)
 
+def render_times_row(user_id: str, data: dict, member, role_type: str, status: str,
+                     total_time: float, credit_mode: bool) -> str:
+    """Texto de la fila de un usuario en /ver_tiempos (sin la viñeta)"""
+    if member:
+        user_mention = member.mention
+    else:
+        user_name = data.get('name', f'Usuario {user_id}')
+        user_mention = f"**{user_name}** `(ID: {user_id})`"
+
+    formatted_time = time_tracker.format_time_human(total_time)
+
+    # En el ranking de créditos se muestran los confirmados (los que ordenan la lista)
+    if credit_mode:
+        credits = data.get('confirmed_credits', 0)
+    else:
+        credits = calculate_credits(total_time, role_type)
+    # Formatear créditos sin decimales si es entero
+    credits_display = f"{int(credits)}" if credits == int(credits) else f"{credits:.2f}"
+    credit_info = f" 💰 {credits_display} Créditos" if credits > 0 else ""
+    role_info = get_role_info_for_type(role_type) if member else ""
+    return f"{user_mention}{role_info} - ⏱️ {formatted_time}{credit_info} {status}"
+
+def render_times_lines(page_users, guild, sort_mode=None, first_position: int = 0):
+    """Líneas de una página de /ver_tiempos a partir de filas (nombre, user_id, datos)"""
+    user_list = []
+    for position, (_, user_id, data) in enumerate(page_users, start=first_position + 1):
+        try:
+            user_id_int = int(user_id)
+            member = get_guild_member(guild, user_id_int)
+
+            # Rol y estado materializados (sin recalcular por cada página)
+            role_type = status_engine.get_role_type(user_id_int)
+            status = status_engine.get_label(user_id_int)
+            total_time = time_tracker.get_total_time(user_id_int)
+            credit_mode = sort_mode == "credits"
+
+            # La fila solo se vuelve a renderizar si cambia el registro, el rol, el estado
+            # o el segundo de tiempo mostrado
+            cache_key = ("times", user_id, time_tracker.get_version(user_id), role_type, status,
+                         member is not None, credit_mode, int(total_time))
+            row = row_render_cache.get_or_render(
+                cache_key,
+                lambda: render_times_row(user_id, data, member, role_type, status, total_time, credit_mode)
+            )
+            bullet = f"**#{position}**" if sort_mode else "📌"
+            user_list.append(f"{bullet} {row}")
+
+        except Exception as e:
+            print(f"Error procesando usuario {user_id}: {e}")
+            continue
+    return user_list
+
+def render_payment_row(user_data: dict, member) -> str:
+    """Texto de la fila de un usuario en /pagas (sin la viñeta)"""
+    user_id = user_data['user_id']
+    if member:
+        user_mention = member.mention
+    else:
+        user_name = user_data.get('name', f'Usuario {user_id}')
+        user_mention = f"**{user_name}** `(ID: {user_id})`"
+
+    total_time = user_data['total_time']
+    formatted_time = time_tracker.format_time_human(total_time)
+    credits = user_data['credits']
+
+    data = user_data.get('data', {})
+    total_hours = total_time / 3600
+    role_type = user_data['role_type']
+
+    # Determinar si completó su milestone
+    is_finished = (data.get("milestone_completed", False) or
+                 (role_type == "gold" and total_hours >= 2.0) or
+                 (role_type in ["medios", "altos", "imperiales", "nobleza", "monarquia", "supremos"] and total_hours >= 1.0) or
+                 (role_type == "normal" and total_hours >= 1.0))
+
+    # Determinar estado
+    if data.get('is_active', False):
+        status = "🟢 Activo"
+    elif data.get('is_paused', False):
+        if is_finished:
+            status = "✅ Terminado"
+        else:
+            status = "⏸️ Pausado"
+    elif is_finished:
+        status = "✅ Terminado"
+    elif data.get('daily_limit_reset', False) and total_hours > 0:
+        status = "✅ Terminado" # Considerar terminado si fue reseteado y tiene tiempo
+    else:
+        status = "🔴 Inactivo"
+
+    # Formatear créditos sin decimales si es entero
+    credits_display = f"{int(credits)}" if credits == int(credits) else f"{credits:.2f}"
+    return f"{user_mention} - ⏱️ {formatted_time} - 💰 {credits_display} Créditos {status}"
+
+def remember_embed(view, embed: discord.Embed) -> bool:
+    """Guardar la huella del embed que la vista va a enviar e indicar si cambió respecto al anterior"""
+    fingerprint = embed_fingerprint(embed.to_dict())
+    changed = fingerprint != view.last_embed_fingerprint
+    view.last_embed_fingerprint = fingerprint
+    return changed
+
+def build_times_source(filter_status=None, search_term=None, sort_mode=None, ranking_size=RANKING_SIZE):
+    """Fuente paginable para /ver_tiempos según filtro de estado, búsqueda y orden
+
+    Con orden por ranking se toman los primeros ranking_size (None: todos, para exportar).
+    """
+    sorted_index = time_tracker.sorted_index
+    if not filter_status and not search_term and not sort_mode:
+        return sorted_index
+
+    # Filtro de estado: búsqueda directa en el índice de estados materializados
+    candidates = status_engine.get_ids(filter_status) if filter_status else None
+
+    # Con búsqueda activa, el índice de nombres ya devuelve los IDs ordenados por relevancia
+    if search_term:
+        user_ids = time_tracker.search_users(search_term, restrict_to=candidates)
+    else:
+        user_ids = candidates
+
+    # Rankings: los primeros del índice ordenado, restringidos al filtro/búsqueda
+    if sort_mode:
+        restrict_to = set(user_ids) if user_ids is not None else None
+        if sort_mode == "credits":
+            ranked = user_rankings.top_by_credits(ranking_size, restrict_to=restrict_to)
+        else:
+            ranked = user_rankings.top_by_time(ranking_size, restrict_to=restrict_to)
+        keys = [sorted_index.key_for(user_id) for user_id, _ in ranked]
+        return KeyListSource([key for key in keys if key is not None])
+
+    keys = [key for key in (sorted_index.key_for(user_id) for user_id in user_ids) if key is not None]
+    if not search_term:
+        keys.sort()
+    return KeyListSource(keys)
+
 # Clase para manejar la paginación
-class TimesView(discord.ui.View):
-    def __init__(self, sorted_users, guild, max_per_page=20, search_term=None, filter_status=None):
+class TimesView(GuildView):
+    def __init__(self, source, guild, max_per_page=20, search_term=None, filter_status=None, sort_mode=None):
         super().__init__(timeout=300)
-        self.sorted_users = sorted_users
+        # source: índice ordenado del tracker o KeyListSource (filtros/búsqueda/ranking), paginado por cursor
+        self.source = source
         self.guild = guild
         self.max_per_page = max_per_page
+        self.page_keys = []
         self.current_page = 0
-        self.total_pages = (len(sorted_users) + max_per_page - 1) // max_per_page if sorted_users else 1
+        self.total_pages = 1
         self.search_term = search_term
         self.filter_status = filter_status
-
-        # Actualizar estado inicial de botones
+        self.sort_mode = sort_mode
+        # Huella del último embed entregado (para no editar el mensaje si nada cambió)
+        self.last_embed_fingerprint = None
+        self.embed_changed = True
+
+        self.set_page_keys(self.source.keys_from(None, self.max_per_page))
+
+    def set_page_keys(self, keys):
+        """Fijar las claves de la página actual y recalcular numeración y botones"""
+        self.page_keys = keys
+        total_users = len(self.source)
+        self.total_pages = (total_users + self.max_per_page - 1) // self.max_per_page if total_users else 1
+        self.current_page = self.source.rank(keys[0]) // self.max_per_page if keys else 0
         self.update_buttons()
 
+    def go_next(self):
+        if self.page_keys:
+            keys = self.source.keys_after(self.page_keys[-1], self.max_per_page)
+            if keys:
+                self.set_page_keys(keys)
+
+    def go_previous(self):
+        if self.page_keys:
+            keys = self.source.keys_before(self.page_keys[0], self.max_per_page)
+            if keys:
+                self.set_page_keys(keys)
+
+    def jump_to_page(self, page_index: int):
+        first_key = self.source.key_at(page_index * self.max_per_page)
+        if first_key is not None:
+            self.set_page_keys(self.source.keys_from(first_key, self.max_per_page))
+
+    def reload_page(self):
+        """Releer la página actual desde su cursor (tolera altas y bajas de usuarios)"""
+        cursor = self.page_keys[0] if self.page_keys else None
+        keys = self.source.keys_from(cursor, self.max_per_page)
+        if not keys and len(self.source):
+            last_page = (len(self.source) - 1) // self.max_per_page
+            keys = self.source.keys_from(self.source.key_at(last_page * self.max_per_page), self.max_per_page)
+        self.set_page_keys(keys)
+
+    def get_page_users(self):
+        """Filas (nombre, user_id, datos) de la página actual"""
+        page_users = []
+        for name_lower, user_id in self.page_keys:
+            data = time_tracker.get_user_data(user_id)
+            if data is not None:
+                page_users.append((name_lower, user_id, data))
+        return page_users
+
+    async def render_embed(self):
+        """Pedir juntos los miembros de la página que faltan en caché y crear el embed"""
+        await resolve_guild_members(self.guild, [int(user_id) for _, user_id in self.page_keys],
+                                    timeout=MEMBER_RESOLVE_TIMEOUT)
+        return self.get_embed()
+
     def get_embed(self):
         """Crear embed para la página actual"""
-        start_idx = self.current_page * self.max_per_page
-        end_idx = min(start_idx + self.max_per_page, len(self.sorted_users))
-        current_users = self.sorted_users[start_idx:end_idx]
-        user_list = []
-
-        for _, user_id, data in current_users:
-            try:
-                user_id_int = int(user_id)
-                member = self.guild.get_member(user_id_int) if self.guild else None
-
-                if member:
-                    user_mention = member.mention
-                    role_type = get_user_role_type(member)
-                else:
-                    user_name = data.get('name', f'Usuario {user_id}')
-                    user_mention = f"**{user_name}** `(ID: {user_id})`"
-                    role_type = "normal"
-
-                total_time = time_tracker.get_total_time(user_id_int)
-                formatted_time = time_tracker.format_time_human(total_time)
-
-                # Determinar estado del usuario
-                total_hours = total_time / 3600
-
-                # Verificar si ha completado su tiempo máximo
-                is_finished = (data.get("milestone_completed", False) or
-                             (role_type == "gold" and total_hours >= 2.0) or
-                             (role_type == "normal" and total_hours >= 1.0))
-
-                if data.get('is_active', False):
-                    status = "🟢 Activo"
-                elif is_finished:
-                    status = "✅ Terminado"
-                elif data.get('is_paused', False):
-                    status = "⏸️ Pausado"
-                elif data.get('daily_limit_reset', False) and total_hours > 0:
-                    # Si fue reseteado y tiene tiempo histórico, mostrar como terminado
-                    status = "✅ Terminado"
-                else:
-                    status = "🔴 Inactivo"
-
-                credits = calculate_credits(total_time, role_type)
-                # Formatear créditos sin decimales si es entero
-                credits_display = f"{int(credits)}" if credits == int(credits) else f"{credits:.2f}"
-                credit_info = f" 💰 {credits_display} Créditos" if credits > 0 else ""
-                role_info = get_role_info(member) if member else ""
-                user_list.append(f"📌 {user_mention}{role_info} - ⏱️ {formatted_time}{credit_info} {status}")
-
-            except Exception as e:
-                print(f"Error procesando usuario {user_id}: {e}")
-                continue
+        first_position = self.current_page * self.max_per_page
+        user_list = render_times_lines(self.get_page_users(), self.guild, self.sort_mode, first_position)
 
         # Título con información de búsqueda y filtros
         title = "⏰ Tiempos Registrados"
@@ -755,6 +1313,8 @@ class TimesView(discord.ui.View):
             title += f" (Búsqueda: '{self.search_term}')"
         if self.filter_status:
             title += f" (Filtro: {self.filter_status})"
+        if self.sort_mode:
+            title += f" ({SORT_LABELS[self.sort_mode]})"
 
         embed = discord.Embed(
             title=title,
@@ -763,27 +1323,24 @@ class TimesView(discord.ui.View):
             timestamp=datetime.now()
         )
 
-        footer_text = f"Página {self.current_page + 1}/{self.total_pages} • Total: {len(self.sorted_users)} usuarios"
+        footer_text = f"Página {self.current_page + 1}/{self.total_pages} • Total: {len(self.source)} usuarios"
         if self.search_term:
             footer_text += f" encontrados"
 
         embed.set_footer(text=footer_text)
+        self.embed_changed = remember_embed(self, embed)
         return embed
 
     @discord.ui.button(label='◀️ Anterior', style=discord.ButtonStyle.secondary)
     async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.current_page > 0:
-            self.current_page -= 1
-        self.update_buttons()
-        embed = self.get_embed()
+        self.go_previous()
+        embed = await self.render_embed()
         await interaction.response.edit_message(embed=embed, view=self)
 
     @discord.ui.button(label='▶️ Siguiente', style=discord.ButtonStyle.secondary)
     async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if self.current_page < self.total_pages - 1:
-            self.current_page += 1
-        self.update_buttons()
-        embed = self.get_embed()
+        self.go_next()
+        embed = await self.render_embed()
         await interaction.response.edit_message(embed=embed, view=self)
 
     @discord.ui.button(label='📄 Ir a página', style=discord.ButtonStyle.primary)
@@ -801,43 +1358,21 @@ class TimesView(discord.ui.View):
         try:
             await interaction.response.defer()
 
-            # Recargar datos con timeout extendido para muchos usuarios
-            tracked_users = await asyncio.wait_for(
-                asyncio.to_thread(time_tracker.get_all_tracked_users),
-                timeout=15.0
-            )
-
-            # Aplicar filtros existentes con timeout
-            filtered_users = await asyncio.wait_for(
-                self._apply_filters(tracked_users),
-                timeout=10.0
-            )
-
-            # Actualizar datos internos
-            self.sorted_users = filtered_users
-            self.total_pages = (len(filtered_users) + self.max_per_page - 1) // self.max_per_page if filtered_users else 1
-
-            # Asegurar que la página actual sea válida
-            if self.current_page >= self.total_pages:
-                self.current_page = max(0, self.total_pages - 1)
-
-            # Rehabilitar botones de navegación si hay múltiples páginas
-            if self.total_pages > 1:
-                for item in self.children:
-                    if isinstance(item, discord.ui.Button) and item.label in ['◀️ Anterior', '▶️ Siguiente', '📄 Ir a página']:
-                        # Rehabilitar botones que podrían haberse deshabilitado incorrectamente
-                        if item.label == '📄 Ir a página':
-                            item.disabled = False
-                        elif item.label == '◀️ Anterior':
-                            item.disabled = (self.current_page == 0)
-                        elif item.label == '▶️ Siguiente':
-                            item.disabled = (self.current_page >= self.total_pages - 1)
+            # Sin filtros la fuente es el índice ordenado del tracker (siempre al día);
+            # con filtros o búsqueda se vuelve a construir la lista de claves
+            if self.filter_status or self.search_term or self.sort_mode:
+                self.source = build_times_source(self.filter_status, self.search_term, self.sort_mode)
 
-            # Actualizar botones
-            self.update_buttons()
+            # Releer la página desde su cursor
+            self.reload_page()
 
             # Obtener embed actualizado
-            embed = self.get_embed()
+            embed = await self.render_embed()
+
+            # Si el contenido es idéntico al mostrado, no gastar una edición
+            if not self.embed_changed:
+                row_render_cache.skipped_edits += 1
+                return
 
             # Actualizar el mensaje existente
             await interaction.edit_original_response(embed=embed, view=self)
@@ -861,26 +1396,13 @@ class TimesView(discord.ui.View):
         selected_filter = select.values[0]
 
         try:
-            # Recargar datos
-            tracked_users = await asyncio.wait_for(
-                asyncio.to_thread(time_tracker.get_all_tracked_users),
-                timeout=5.0
-            )
-
-            # Aplicar filtro seleccionado
+            # Aplicar filtro seleccionado y volver a la primera página
             self.filter_status = selected_filter if selected_filter != "all" else None
-            filtered_users = await self._apply_filters(tracked_users)
-
-            # Actualizar datos y resetear página
-            self.sorted_users = filtered_users
-            self.current_page = 0
-            self.total_pages = (len(filtered_users) + self.max_per_page - 1) // self.max_per_page if filtered_users else 1
-
-            # Actualizar botones según nueva paginación
-            self.update_buttons()
+            self.source = build_times_source(self.filter_status, self.search_term, self.sort_mode)
+            self.set_page_keys(self.source.keys_from(None, self.max_per_page))
 
             # Obtener embed actualizado
-            embed = self.get_embed()
+            embed = await self.render_embed()
 
             # Actualizar el mensaje existente
             await interaction.response.edit_message(embed=embed, view=self)
@@ -888,56 +1410,55 @@ class TimesView(discord.ui.View):
         except Exception as e:
             await interaction.response.send_message(f"❌ Error aplicando filtro: {e}", ephemeral=True)
 
-    async def _apply_filters(self, tracked_users):
-        """Aplicar filtros de búsqueda y estado"""
-        filtered_users = []
+    @discord.ui.select(
+        placeholder="Ordenar por...",
+        options=[
+            discord.SelectOption(label="Orden alfabético", value="name", emoji="🔤"),
+            discord.SelectOption(label=f"Top {RANKING_SIZE} por tiempo", value="time", emoji="⏱️"),
+            discord.SelectOption(label=f"Top {RANKING_SIZE} por créditos confirmados", value="credits", emoji="💰")
+        ]
+    )
+    async def sort_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        selected_sort = select.values[0]
 
-        for user_id, data in tracked_users.items():
-            user_name = data.get('name', f'Usuario {user_id}')
+        try:
+            # Los rankings salen de índices ya ordenados; volver a la primera página
+            self.sort_mode = selected_sort if selected_sort != "name" else None
+            self.source = build_times_source(self.filter_status, self.search_term, self.sort_mode)
+            self.set_page_keys(self.source.keys_from(None, self.max_per_page))
 
-            # Aplicar filtro de búsqueda
-            if self.search_term and self.search_term.lower() not in user_name.lower():
-                continue
+            embed = await self.render_embed()
+            await interaction.response.edit_message(embed=embed, view=self)
 
-            # Aplicar filtro de estado
-            if self.filter_status:
-                try:
-                    user_id_int = int(user_id)
-                    member = self.guild.get_member(user_id_int) if self.guild else None
-                    total_time = time_tracker.get_total_time(user_id_int)
-
-                    # Determinar estado actual
-                    total_hours = total_time / 3600
-                    role_type = get_user_role_type(member) if member else "normal"
-
-                    # Determinar si está terminado (ha alcanzado su límite máximo)
-                    is_finished = (data.get("milestone_completed", False) or
-                                 (role_type == "gold" and total_hours >= 2.0) or
-                                 (role_type == "normal" and total_hours >= 1.0))
-
-                    if data.get('is_active', False):
-                        status = "active"
-                    elif is_finished:
-                        status = "finished"
-                    elif data.get('is_paused', False):
-                        status = "paused"
-                    elif data.get('daily_limit_reset', False) and total_hours > 0:
-                        status = "finished" # Considerar terminado si fue reseteado y tiene tiempo
-                    else:
-                        status = "inactive"
+        except Exception as e:
+            await interaction.response.send_message(f"❌ Error aplicando orden: {e}", ephemeral=True)
 
-                    # Filtrar por estado
-                    if self.filter_status != status:
-                        continue
+    @discord.ui.button(label='📎 Exportar', style=discord.ButtonStyle.secondary, row=3)
+    async def export_table(self, interaction: discord.Interaction, button: discord.ui.Button):
+        """Tabla completa de la vista actual (filtro, búsqueda y orden incluidos) como CSV"""
+        try:
+            await interaction.response.defer(ephemeral=True)
+
+            # Foto de las claves en el orden actual; el archivo se genera sin esperas intermedias.
+            # Con orden por ranking se exportan todos los usuarios ordenados, no solo el top de la vista
+            source = build_times_source(self.filter_status, self.search_term, self.sort_mode, ranking_size=None)
+            user_ids = [user_id for _, user_id in source.keys]
+            if not user_ids:
+                await interaction.followup.send("❌ No hay usuarios para exportar", ephemeral=True)
+                return
 
-                except Exception as e:
-                    print(f"Error filtrando usuario {user_id}: {e}")
-                    continue
+            timestamp = datetime.now(COLOMBIA_TZ).strftime('%Y%m%d_%H%M')
+            times_file = build_payroll_file(user_ids, f"tiempos_{timestamp}.csv", include_status=True)
 
-            filtered_users.append((user_name.lower(), user_id, data))
+            await interaction.followup.send(
+                f"📎 Tabla exportada: {len(user_ids)} usuarios",
+                file=times_file,
+                ephemeral=True
+            )
 
-        filtered_users.sort(key=lambda x: x[0])
-        return filtered_users
+        except Exception as e:
+            print(f"Error exportando tiempos: {e}")
+            await interaction.followup.send(f"❌ Error al exportar: {e}", ephemeral=True)
 
     def update_buttons(self):
         """Actualizar estado de los botones según la página actual"""
@@ -956,7 +1477,7 @@ class TimesView(discord.ui.View):
         for item in self.children:
             item.disabled = True
 
-class PageModal(discord.ui.Modal):
+class PageModal(GuildModal):
     def __init__(self, view):
         super().__init__(title='Ir a Página')
         self.view = view
@@ -972,9 +1493,8 @@ class PageModal(discord.ui.Modal):
         try:
             page = int(self.page_number.value)
             if 1 <= page <= self.view.total_pages:
-                self.view.current_page = page - 1
-                self.view.update_buttons()
-                embed = self.view.get_embed()
+                self.view.jump_to_page(page - 1)
+                embed = await self.view.render_embed()
                 await interaction.response.edit_message(embed=embed, view=self.view)
             else:
                 await interaction.response.send_message(
@@ -984,7 +1504,7 @@ class PageModal(discord.ui.Modal):
         except ValueError:
             await interaction.response.send_message("❌ Por favor ingresa un número válido", ephemeral=True)
 
-class SearchModal(discord.ui.Modal):
+class SearchModal(GuildModal):
     def __init__(self, view):
         super().__init__(title='Buscar Usuario')
         self.view = view
@@ -997,25 +1517,13 @@ class SearchModal(discord.ui.Modal):
     )
 
     async def on_submit(self, interaction: discord.Interaction):
-        search_term = self.search_term.value.lower().strip()
+        search_term = self.search_term.value.strip()
 
-        # Obtener todos los usuarios sin filtro
         try:
-            tracked_users = await asyncio.wait_for(
-                asyncio.to_thread(time_tracker.get_all_tracked_users),
-                timeout=2.0
-            )
-
-            # Filtrar usuarios
-            filtered_users = []
-            for user_id, data in tracked_users.items():
-                user_name = data.get('name', f'Usuario {user_id}').lower()
-                if search_term in user_name:
-                    filtered_users.append((user_name, user_id, data))
-
-            filtered_users.sort(key=lambda x: x[0])
+            # Buscar en el índice de nombres (resultados ya ordenados por relevancia)
+            search_source = build_times_source(search_term=search_term, sort_mode=self.view.sort_mode)
 
-            if not filtered_users:
+            if not len(search_source):
                 await interaction.response.send_message(
                     f"❌ No se encontraron usuarios con '{self.search_term.value}' en su nombre",
                     ephemeral=True
@@ -1023,9 +1531,10 @@ class SearchModal(discord.ui.Modal):
                 return
 
             # Crear nueva vista con resultados filtrados
-            new_view = TimesView(filtered_users, self.view.guild, max_per_page=self.view.max_per_page,
-                               search_term=self.search_term.value, filter_status=self.view.filter_status)
-            embed = new_view.get_embed()
+            new_view = TimesView(search_source, self.view.guild, max_per_page=self.view.max_per_page,
+                               search_term=self.search_term.value, filter_status=self.view.filter_status,
+                               sort_mode=self.view.sort_mode)
+            embed = await new_view.render_embed()
 
             await interaction.response.edit_message(embed=embed, view=new_view)
 
@@ -1045,12 +1554,7 @@ async def ver_tiempos(interaction: discord.Interaction):
             return
 
     try:
-        tracked_users = await asyncio.wait_for(
-            asyncio.to_thread(time_tracker.get_all_tracked_users),
-            timeout=5.0
-        )
-
-        if not tracked_users:
+        if not time_tracker.data:
             try:
                 if not interaction.response.is_done():
                     await interaction.response.send_message("📊 No hay usuarios con tiempo registrado", ephemeral=False)
@@ -1060,17 +1564,9 @@ async def ver_tiempos(interaction: discord.Interaction):
                 print(f"Error enviando mensaje de sin usuarios: {e}")
             return
 
-        # Ordenar usuarios alfabéticamente por nombre
-        sorted_users = []
-        for user_id, data in tracked_users.items():
-            user_name = data.get('name', f'Usuario {user_id}')
-            sorted_users.append((user_name.lower(), user_id, data))
-
-        sorted_users.sort(key=lambda x: x[0])
-
-        # Usar paginación con filtrado mejorado y botones de actualización
-        view = TimesView(sorted_users, interaction.guild, max_per_page=20)
-        embed = view.get_embed()
+        # Paginación por cursor sobre el índice alfabético que mantiene el tracker
+        view = TimesView(build_times_source(), interaction.guild, max_per_page=20)
+        embed = await view.render_embed()
 
         if not interaction.response.is_done():
             await interaction.response.send_message(embed=embed, view=view)
@@ -1120,6 +1616,129 @@ async def reiniciar_todos_tiempos(interaction: discord.Interaction):
     else:
         await interaction.response.send_message("❌ No hay usuarios con tiempo registrado para reiniciar", ephemeral=True)
 
+# =================== TRABAJOS EN SEGUNDO PLANO ===================
+
+JOB_CHUNK_SIZE = 200          # Usuarios por bloque (el loop queda libre entre bloques)
+JOB_PROGRESS_INTERVAL = 2     # Segundos mínimos entre ediciones del mensaje de progreso
+
+# Tiers cuyo reseteo diario deja el tiempo en 0 (el resto conserva su tiempo histórico)
+ZERO_TIME_RESET_TIERS = ("altos", "imperiales", "nobleza", "monarquia", "supremos")
+
+# Pasadas de solo lectura de los trabajos, ejecutadas fuera del loop con asyncio.to_thread.
+# Copian la lista de registros de una vez (atómico con el GIL) y no modifican nada: los cambios
+# se aplican después en el loop, donde viven los índices y sus listeners.
+
+def plan_daily_limit_resets(data, user_ids, role_types):
+    """Repartir los usuarios con milestone completado según cómo se resetea su límite
+
+    Devuelve (a tiempo 0, conservando historial, conteos por grupo).
+    """
+    zero_time_ids, keep_history_ids = [], []
+    counts = {'normal': 0, 'gold': 0, 'tier': 0}
+    for user_id_str in user_ids:
+        user_data = data.get(user_id_str)
+        if user_data is None or not user_data.get('milestone_completed', False):
+            continue
+        role_type = role_types.get(user_id_str, "normal")
+        if role_type == "gold":
+            counts['gold'] += 1
+        elif role_type == "normal":
+            counts['normal'] += 1
+        else:
+            counts['tier'] += 1
+        if role_type in ZERO_TIME_RESET_TIERS:
+            zero_time_ids.append(user_id_str)
+        else:
+            keep_history_ids.append(user_id_str)
+    return zero_time_ids, keep_history_ids, counts
+
+def plan_extra_minutes_cleanup(data, delete_ids):
+    """Minutos extra de los usuarios a eliminar y usuarios restantes con minutos por limpiar"""
+    delete_ids = set(delete_ids)
+    from_deleted = 0
+    to_clear = []
+    for user_id_str, user_data in list(data.items()):
+        extra_minutes = user_data.get('extra_minutes', 0)
+        if user_id_str in delete_ids:
+            from_deleted += extra_minutes
+        elif extra_minutes > 0:
+            to_clear.append(user_id_str)
+    return from_deleted, to_clear
+
+async def apply_in_chunks(progress, items, label: str, apply_chunk):
+    """Aplicar apply_chunk(bloque) en el loop por bloques, cediendo el loop entre bloques"""
+    for chunk_start in range(0, len(items), JOB_CHUNK_SIZE):
+        apply_chunk(items[chunk_start:chunk_start + JOB_CHUNK_SIZE])
+        await progress.update(f"{label}: {min(chunk_start + JOB_CHUNK_SIZE, len(items))}/{len(items)}")
+        await asyncio.sleep(0)
+
+# Limpiezas masivas: el comando responde enseguida y el trabajo sigue en segundo plano
+job_runner = JobRunner()
+
+class JobFailed(Exception):
+    """Error esperado de un trabajo, mostrado tal cual en su mensaje de progreso"""
+
+class JobProgress:
+    """Mensaje de seguimiento de un trabajo, editado como mucho cada JOB_PROGRESS_INTERVAL segundos"""
+
+    def __init__(self, message, title: str):
+        self.message = message
+        self.title = title
+        self.last_edit = 0.0
+
+    async def update(self, text: str):
+        now = asyncio.get_running_loop().time()
+        if now - self.last_edit < JOB_PROGRESS_INTERVAL:
+            return
+        self.last_edit = now
+        try:
+            await self.message.edit(content=f"⏳ **{self.title}:** {text}")
+        except Exception as e:
+            print(f"⚠️ No se pudo actualizar el progreso de '{self.title}': {e}")
+
+    async def finish(self, embed: discord.Embed):
+        await self.message.edit(content=None, embed=embed)
+
+    async def fail(self, text: str):
+        await self.message.edit(content=f"❌ **{self.title}:** {text}")
+
+async def start_admin_job(interaction: discord.Interaction, key: str, title: str, work):
+    """Responder dentro del plazo de 3 segundos y ejecutar work(progress) en segundo plano
+
+    work devuelve el embed final; si ya hay un trabajo con la misma clave se rechaza.
+    """
+    deferred = asyncio.Event()
+
+    async def run_job():
+        await deferred.wait()
+        message = await interaction.followup.send(f"⏳ **{title}:** iniciando...", wait=True)
+        progress = JobProgress(message, title)
+        try:
+            embed = await work(progress)
+            await progress.finish(embed)
+        except JobFailed as e:
+            await progress.fail(str(e))
+        except Exception as e:
+            await progress.fail(f"Error inesperado: {e}")
+            raise
+
+    # La clave se reserva antes de cualquier await para que dos clics no lancen dos trabajos
+    # (por servidor: cada uno limpia sus propios datos)
+    task = job_runner.start(f"{interaction.guild_id}:{key}", title, run_job,
+                            requested_by=interaction.user.display_name)
+    if task is None:
+        await interaction.response.send_message(
+            f"⏳ Ya hay un trabajo de **{title}** en curso, espera a que termine", ephemeral=True
+        )
+        return
+
+    try:
+        await interaction.response.defer()
+    except Exception:
+        task.cancel()
+        raise
+    deferred.set()
+
 @bot.tree.command(name="limpiar_base_datos", description="ELIMINAR COMPLETAMENTE todos los usuarios registrados de la base de datos")
 @discord.app_commands.describe(confirmar="Escribe 'SI' para confirmar la eliminación completa")
 @is_admin()
@@ -1128,16 +1747,21 @@ async def limpiar_base_datos(interaction: discord.Interaction, confirmar: str):
         await interaction.response.send_message("❌ Operación cancelada. Debes escribir 'SI' para confirmar", ephemeral=True)
         return
 
-    tracked_users = time_tracker.get_all_tracked_users()
-    user_count = len(tracked_users)
-
-    if user_count == 0:
+    if not time_tracker.data:
         await interaction.response.send_message("❌ No hay usuarios registrados en la base de datos", ephemeral=True)
         return
 
-    success = time_tracker.clear_all_data()
+    async def work(progress):
+        user_ids = list(time_tracker.data.keys())
+        user_count = len(user_ids)
+
+        # Cada baja actualiza los índices en el loop: por bloques y con un solo guardado al final
+        with time_tracker.batch_save():
+            await apply_in_chunks(progress, user_ids, "usuarios eliminados", time_tracker.remove_users)
+            # Los registrados mientras tanto también se eliminan
+            if not time_tracker.clear_all_data():
+                raise JobFailed("Error al limpiar la base de datos")
 
-    if success:
         embed = discord.Embed(
             title="🗑️ BASE DE DATOS LIMPIADA",
             description="Todos los datos de usuarios han sido eliminados completamente",
@@ -1159,10 +1783,9 @@ async def limpiar_base_datos(interaction: discord.Interaction, confirmar: str):
             inline=False
         )
         embed.set_footer(text=f"Ejecutado por {interaction.user.display_name}")
+        return embed
 
-        await interaction.response.send_message(embed=embed)
-    else:
-        await interaction.response.send_message("❌ Error al limpiar la base de datos", ephemeral=True)
+    await start_admin_job(interaction, "limpieza_base_datos", "Limpieza de la base de datos", work)
 
 @bot.tree.command(name="limpiar_horas_maximas", description="Resetear límites diarios de TODOS los usuarios conservando créditos y tiempo histórico")
 @discord.app_commands.describe(confirmar="Escribe 'SI' para confirmar el reseteo de límites")
@@ -1173,80 +1796,67 @@ async def limpiar_horas_maximas(interaction: discord.Interaction, confirmar: str
         await interaction.response.send_message("❌ Operación cancelada. Debes escribir 'SI' para confirmar", ephemeral=True)
         return
 
-    tracked_users = time_tracker.get_all_tracked_users()
-
-    if not tracked_users:
+    if not time_tracker.data:
         await interaction.response.send_message("❌ No hay usuarios registrados en la base de datos", ephemeral=True)
         return
 
-    # Identificar usuarios que completaron sus límites
-    users_to_reset = []
-    reclutas_reset = 0
-    gold_reset = 0
-    tier_reset = 0
-
-    for user_id_str, data in tracked_users.items():
-        try:
-            user_id = int(user_id_str)
-            member = interaction.guild.get_member(user_id) if interaction.guild else None
-
-            # Verificar si completó sus horas máximas
-            if data.get('milestone_completed', False):
-                user_name = data.get('name', f'Usuario {user_id}')
-                confirmed_credits = data.get('confirmed_credits', 0)
-                total_time = time_tracker.get_total_time(user_id)
-
-                # Determinar tipo de rol
-                if member:
-                    role_type = get_user_role_type(member)
-                    if role_type == "gold":
-                        gold_reset += 1
-                    elif role_type in ROLE_TIERS:
-                        tier_reset += 1
-                    else:
-                        reclutas_reset += 1
-                else:
-                    reclutas_reset += 1
-
-                users_to_reset.append({
-                    'id': user_id_str,
-                    'name': user_name,
-                    'credits': confirmed_credits,
-                    'time': total_time
-                })
-
-        except Exception as e:
-            print(f"Error procesando usuario {user_id_str}: {e}")
-            continue
-
-    if not users_to_reset:
+    # Usuarios que completaron sus horas máximas, directamente del índice de estados
+    completed_ids = sorted(time_tracker.get_completed_user_ids())
+    if not completed_ids:
         await interaction.response.send_message(
             "❌ No se encontraron usuarios que hayan completado sus horas máximas para resetear",
             ephemeral=True
         )
         return
 
-    # Resetear límites conservando créditos
-    reset_count = 0
-    try:
-        for user_info in users_to_reset:
-            user_id_str = user_info['id']
-            confirmed_credits = user_info['credits']
-            historical_time = user_info['time']
-
-            # Determinar qué función usar según el rol
-            member = interaction.guild.get_member(int(user_id_str)) if interaction.guild else None
-            role_type = get_user_role_type(member) if member else "normal"
-
-            # Roles Altos-Supremos: resetear tiempo a 0 (conservando solo créditos)
-            if role_type in ["altos", "imperiales", "nobleza", "monarquia", "supremos"]:
-                success = time_tracker.reset_daily_limit_zero_time(user_id_str, confirmed_credits)
-            else:
-                # Otros roles (Reclutas, Gold, Medios): conservar tiempo histórico
-                success = time_tracker.reset_daily_limit_keep_history(user_id_str, confirmed_credits, historical_time)
+    async def work(progress):
+        # Roles reales antes de decidir: los que faltan en caché se piden por lotes, así un tier
+        # fuera de caché no se resetea con las reglas de Recluta
+        if interaction.guild is not None:
+            await progress.update(f"resolviendo roles de {len(completed_ids)} usuarios...")
+            unresolved = set()
+            await resolve_guild_members(interaction.guild, [int(user_id_str) for user_id_str in completed_ids],
+                                        unresolved=unresolved)
+            if unresolved:
+                raise JobFailed(f"No se pudo comprobar el rol de {len(unresolved)} usuarios fuera de caché "
+                                f"(error del gateway); no se reseteó nada, inténtalo de nuevo")
+        role_types = {user_id_str: status_engine.get_role_type(int(user_id_str)) for user_id_str in completed_ids}
+
+        # Clasificación fuera del loop
+        zero_time_ids, keep_history_ids, counts = await asyncio.to_thread(
+            plan_daily_limit_resets, time_tracker.data, completed_ids, role_types
+        )
+        reclutas_reset, gold_reset, tier_reset = counts['normal'], counts['gold'], counts['tier']
+        zero_time_set = set(zero_time_ids)
+        reset_count = 0
 
-            if success:
-                reset_count += 1
+        def reset_chunk(user_id_strs):
+            nonlocal reset_count
+            for user_id_str in user_id_strs:
+                try:
+                    # Créditos y tiempo se leen al aplicar (pueden haber cambiado desde la clasificación)
+                    data = time_tracker.data.get(user_id_str)
+                    if data is None or not data.get('milestone_completed', False):
+                        continue
+                    confirmed_credits = data.get('confirmed_credits', 0)
+
+                    # Roles Altos-Supremos: resetear tiempo a 0 (conservando solo créditos)
+                    if user_id_str in zero_time_set:
+                        success = time_tracker.reset_daily_limit_zero_time(user_id_str, confirmed_credits)
+                    else:
+                        # Otros roles (Reclutas, Gold, Medios): conservar tiempo histórico
+                        historical_time = time_tracker.get_total_time(int(user_id_str))
+                        success = time_tracker.reset_daily_limit_keep_history(user_id_str, confirmed_credits, historical_time)
+
+                    if success:
+                        reset_count += 1
+
+                except Exception as e:
+                    print(f"Error procesando usuario {user_id_str}: {e}")
+
+        # Cambios en el loop por bloques; un solo guardado al final
+        with time_tracker.batch_save():
+            await apply_in_chunks(progress, zero_time_ids + keep_history_ids, "usuarios procesados", reset_chunk)
 
         embed = discord.Embed(
             title="🔄 LÍMITES DIARIOS RESETEADOS",
@@ -1284,12 +1894,9 @@ async def limpiar_horas_maximas(interaction: discord.Interaction, confirmar: str
         )
 
         embed.set_footer(text=f"Ejecutado por {interaction.user.display_name}")
+        return embed
 
-        await interaction.response.send_message(embed=embed)
-
-    except Exception as e:
-        await interaction.response.send_message(f"❌ Error al resetear límites: {e}", ephemeral=True)
-        print(f"Error en reseteo de límites: {e}")
+    await start_admin_job(interaction, "reseteo_limites", "Reseteo de límites diarios", work)
 
 @bot.tree.command(name="limpiar_db_reclutas_gold_medios", description="Limpiar SOLO usuarios reclutas, gold y medios de la base de datos")
 @discord.app_commands.describe(confirmar="Escribe 'SI' para confirmar la eliminación de reclutas, gold y medios")
@@ -1300,91 +1907,78 @@ async def limpiar_db_reclutas_gold_medios(interaction: discord.Interaction, conf
         await interaction.response.send_message("❌ Operación cancelada. Debes escribir 'SI' para confirmar", ephemeral=True)
         return
 
-    tracked_users = time_tracker.get_all_tracked_users()
-
-    if not tracked_users:
+    if not time_tracker.data:
         await interaction.response.send_message("❌ No hay usuarios registrados en la base de datos", ephemeral=True)
         return
 
-    # Identificar usuarios a eliminar
-    users_to_delete = []
-    reclutas_deleted = 0
-    gold_deleted = 0
-    medios_deleted = 0
-    total_extra_minutes_cleaned = 0
-    extra_minutes_from_deleted = 0
-    extra_minutes_from_kept = 0
-
-    for user_id_str, data in tracked_users.items():
-        try:
-            user_id = int(user_id_str)
-            member = interaction.guild.get_member(user_id) if interaction.guild else None
-
-            if member:
-                role_type = get_user_role_type(member)
-                if role_type == "gold":
-                    users_to_delete.append(user_id_str)
-                    gold_deleted += 1
-                    # Contar minutos extras antes de eliminar
-                    extra_minutes_from_deleted += data.get('extra_minutes', 0)
-                elif role_type == "medios":
-                    users_to_delete.append(user_id_str)
-                    medios_deleted += 1
-                    extra_minutes_from_deleted += data.get('extra_minutes', 0)
-                elif role_type == "normal":
-                    users_to_delete.append(user_id_str)
-                    reclutas_deleted += 1
-                    extra_minutes_from_deleted += data.get('extra_minutes', 0)
-            else:
-                # Si no se encuentra el miembro, asumir recluta y eliminar
-                users_to_delete.append(user_id_str)
-                reclutas_deleted += 1
-                extra_minutes_from_deleted += data.get('extra_minutes', 0)
-        except Exception as e:
-            print(f"Error procesando usuario {user_id_str}: {e}")
-            continue
+    async def work(progress):
+        # Los reclutas que faltan en caché pueden ser de un rol alto aún sin cargar:
+        # pedirlos por lotes antes de decidir (los que ya no están en el servidor siguen como reclutas)
+        guild = interaction.guild
+        if guild is not None:
+            uncached = [int(user_id_str) for user_id_str in status_engine.get_ids_by_role("normal")
+                        if guild.get_member(int(user_id_str)) is None]
+            if uncached:
+                await progress.update(f"comprobando {len(uncached)} miembros fuera de caché...")
+                unresolved = set()
+                await resolve_guild_members(guild, uncached, unresolved=unresolved)
+                # Sin respuesta no se sabe su rol: no se eliminan como reclutas
+                if unresolved:
+                    raise JobFailed(f"No se pudo comprobar el rol de {len(unresolved)} usuarios fuera de caché "
+                                    f"(error del gateway); no se eliminó nada, inténtalo de nuevo")
+
+        # Identificar usuarios a eliminar directamente desde el índice de tiers
+        reclutas_ids = status_engine.get_ids_by_role("normal")
+        gold_ids = status_engine.get_ids_by_role("gold")
+        medios_ids = status_engine.get_ids_by_role("medios")
+        users_to_delete = list(reclutas_ids | gold_ids | medios_ids)
+        reclutas_deleted = len(reclutas_ids)
+        gold_deleted = len(gold_ids)
+        medios_deleted = len(medios_ids)
+
+        # Roles Altos-Supremos que completaron su milestone: se resetean a tiempo 0 (conservando créditos)
+        high_tier_ids = set()
+        for role_type in ZERO_TIME_RESET_TIERS:
+            high_tier_ids |= status_engine.get_ids_by_role(role_type)
+        users_to_reset = sorted(high_tier_ids & time_tracker.get_completed_user_ids())
+
+        # Minutos extras de los eliminados y de los que se quedan: pasada por todos fuera del loop
+        await progress.update("calculando minutos extras...")
+        extra_minutes_from_deleted, extra_minutes_to_clear = await asyncio.to_thread(
+            plan_extra_minutes_cleanup, time_tracker.data, users_to_delete
+        )
 
-    # SIEMPRE limpiar minutos extras de TODOS los usuarios (incluso si no hay usuarios para eliminar)
-    try:
+        # SIEMPRE limpiar minutos extras de TODOS los usuarios (incluso si no hay usuarios para eliminar)
         total_deleted = 0
         total_reset = 0
+        extra_minutes_from_kept = 0
 
-        # Paso 1: Eliminar usuarios reclutas, gold y medios (si hay)
-        if users_to_delete:
-            for user_id_str in users_to_delete:
-                if user_id_str in time_tracker.data:
-                    del time_tracker.data[user_id_str]
-            total_deleted = reclutas_deleted + gold_deleted + medios_deleted
-
-        # Paso 2: Limpiar minutos extras de TODOS los usuarios restantes
-        for user_id_str in list(time_tracker.data.keys()):
-            user_data = time_tracker.data[user_id_str]
-            extra_minutes = user_data.get('extra_minutes', 0)
-            if extra_minutes > 0:
-                extra_minutes_from_kept += extra_minutes
-                user_data['extra_minutes'] = 0
-
-        # Paso 3: NUEVO - Resetear límites diarios de usuarios restantes que completaron sus horas máximas
-        for user_id_str in list(time_tracker.data.keys()):
-            user_data = time_tracker.data[user_id_str]
-
-            # Solo resetear si completó su milestone
-            if user_data.get('milestone_completed', False):
-                user_id = int(user_id_str)
-                member = interaction.guild.get_member(user_id) if interaction.guild else None
-                role_type = get_user_role_type(member) if member else "normal"
+        def clear_chunk(user_id_strs):
+            nonlocal extra_minutes_from_kept
+            extra_minutes_from_kept += time_tracker.clear_extra_minutes(user_id_strs)
 
+        def reset_chunk(user_id_strs):
+            nonlocal total_reset
+            for user_id_str in user_id_strs:
+                user_data = time_tracker.data.get(user_id_str)
+                if user_data is None:
+                    continue
                 confirmed_credits = user_data.get('confirmed_credits', 0)
-                historical_time = time_tracker.get_total_time(user_id)
+                if time_tracker.reset_daily_limit_zero_time(user_id_str, confirmed_credits):
+                    total_reset += 1
 
-                # Roles Altos-Supremos: resetear tiempo a 0 (conservando solo créditos)
-                if role_type in ["altos", "imperiales", "nobleza", "monarquia", "supremos"]:
-                    success = time_tracker.reset_daily_limit_zero_time(user_id_str, confirmed_credits)
-                    if success:
-                        total_reset += 1
+        # Cambios en el loop por bloques; un solo guardado al final
+        with time_tracker.batch_save():
+            # Paso 1: Eliminar usuarios reclutas, gold y medios (si hay)
+            if users_to_delete:
+                await apply_in_chunks(progress, users_to_delete, "usuarios eliminados", time_tracker.remove_users)
+                total_deleted = reclutas_deleted + gold_deleted + medios_deleted
 
-        # Guardar cambios permanentemente
-        time_tracker.save_data()
+            # Paso 2: Limpiar minutos extras de TODOS los usuarios restantes
+            await apply_in_chunks(progress, extra_minutes_to_clear, "minutos extras limpiados", clear_chunk)
+
+            # Paso 3: Resetear límites diarios de Altos-Supremos que completaron sus horas máximas
+            await apply_in_chunks(progress, users_to_reset, "límites reseteados", reset_chunk)
 
         # Contar usuarios restantes
         remaining_users = len(time_tracker.data)
@@ -1425,11 +2019,9 @@ async def limpiar_db_reclutas_gold_medios(interaction: discord.Interaction, conf
         )
         embed.set_footer(text=f"Ejecutado por {interaction.user.display_name}")
 
-        await interaction.response.send_message(embed=embed)
+        return embed
 
-    except Exception as e:
-        await interaction.response.send_message(f"❌ Error al limpiar la base de datos: {e}", ephemeral=True)
-        print(f"Error en limpieza de reclutas/gold/medios: {e}")
+    await start_admin_job(interaction, "limpieza_reclutas_gold_medios", "Limpieza de reclutas, gold y medios", work)
 
 @bot.tree.command(name="cancelar_tiempo", description="Cancelar tiempo del usuario conservando solo horas completas")
 @discord.app_commands.describe(usuario="El usuario cuyo tiempo se cancelará (conserva horas completas)")
@@ -1449,8 +2041,14 @@ async def cancelar_tiempo(interaction: discord.Interaction, usuario: discord.Mem
         formatted_hours_time = time_tracker.format_time_human(hours_time)
         formatted_lost_time = time_tracker.format_time_human(lost_time)
 
-        # Usar la nueva función de cancelación que conserva horas
-        success = time_tracker.cancel_user_tracking_keep_hours(user_id)
+        # Usar la nueva función de cancelación que conserva horas (con su aviso en el mismo guardado)
+        with time_tracker.batch_save():
+            success = time_tracker.cancel_user_tracking_keep_hours(user_id)
+            if success:
+                if lost_time > 0:
+                    send_cancellation_notification(usuario.display_name, interaction.user.mention, formatted_total_time, formatted_hours_time, formatted_lost_time, user_id=usuario.id)
+                else:
+                    send_cancellation_notification(usuario.display_name, interaction.user.mention, formatted_total_time, formatted_hours_time, user_id=usuario.id)
         if success:
             if lost_time > 0:
                 await interaction.response.send_message(
@@ -1458,13 +2056,11 @@ async def cancelar_tiempo(interaction: discord.Interaction, usuario: discord.Mem
                     f"✅ **Tiempo conservado:** {formatted_hours_time} (horas completas)\n"
                     f"❌ **Tiempo perdido:** {formatted_lost_time}"
                 )
-                await send_cancellation_notification(usuario.display_name, interaction.user.mention, formatted_total_time, formatted_hours_time, formatted_lost_time)
             else:
                 await interaction.response.send_message(
                     f"🗑️ El tiempo de {usuario.mention} ha sido cancelado\n"
                     f"✅ **Tiempo conservado:** {formatted_hours_time}"
                 )
-                await send_cancellation_notification(usuario.display_name, interaction.user.mention, formatted_total_time, formatted_hours_time)
         else:
             await interaction.response.send_message(f"❌ Error al cancelar el tiempo para {usuario.mention}", ephemeral=True)
     else:
@@ -1505,31 +2101,15 @@ async def ver_tiempo(interaction: discord.Interaction, usuario: discord.Member):
     if extra_minutes > 0:
         embed.add_field(name="➕ Minutos Extra", value=f"{extra_minutes} minutos", inline=True)
 
-    # Determinar estado del usuario
-    total_hours = base_time / 3600
+    # SIEMPRE obtener el rol actualizado del usuario desde Discord
     role_type = get_user_role_type(usuario)
 
-    # Verificar si ha completado su tiempo máximo
-    is_finished = (user_data.get("milestone_completed", False) or
-                  (role_type == "gold" and total_hours >= 2.0) or
-                  (role_type == "normal" and total_hours >= 1.0))
-
-    if user_data.get('is_active', False):
-        status = "🟢 Activo"
-    elif is_finished:
-        status = "✅ Terminado"
-    elif user_data.get('is_paused', False):
-        status = "⏸️ Pausado"
-    elif user_data.get('daily_limit_reset', False) and total_hours > 0:
-        status = "✅ Terminado"
-    else:
-        status = "🔴 Inactivo"
+    # Estado materializado (se recalcula solo si el rol cambió)
+    status_engine.set_role(usuario.id, role_type)
+    status = status_engine.get_label(usuario.id)
 
     embed.add_field(name="📍 Estado", value=status, inline=True)
 
-    # SIEMPRE obtener el rol actualizado del usuario desde Discord
-    role_type = get_user_role_type(usuario)
-
     # Mostrar tipo de rol del usuario con TODOS los roles
     if role_type == "gold":
         embed.add_field(name="🎭 Tipo de Usuario", value="🏆 Gold - Límite: 2 horas - 6 créditos/hora", inline=True)
@@ -1590,6 +2170,13 @@ async def ver_tiempo(interaction: discord.Interaction, usuario: discord.Member):
     else:
         embed.add_field(name="💰 Créditos Confirmados", value="0 créditos (pendiente de confirmación)", inline=True)
 
+    # Créditos ganados o ajustados desde el lunes (en la zona horaria del servidor), según el ledger
+    now = guild_partitions.current().now()
+    week_credits = time_tracker.credit_ledger.total_between(get_week_start(now), now + timedelta(seconds=1),
+                                                            str(usuario.id))
+    week_display = f"{int(week_credits)}" if week_credits == int(week_credits) else f"{week_credits:.2f}"
+    embed.add_field(name="📅 Créditos esta semana", value=f"{week_display} créditos", inline=True)
+
     embed.set_thumbnail(url=usuario.avatar.url if usuario.avatar else usuario.default_avatar.url)
     embed.set_footer(text="Estadísticas actualizadas")
 
@@ -1614,11 +2201,12 @@ async def ver_pre_registrados(interaction: discord.Interaction):
             await interaction.response.send_message("📋 No hay usuarios pre-registrados actualmente", ephemeral=True)
             return
 
-        colombia_now = datetime.now(COLOMBIA_TZ)
+        colombia_now = guild_partitions.current().now()
+        start_hour, start_minute = guild_partitions.current().schedule['start']
 
         embed = discord.Embed(
             title="📋 Usuarios Pre-registrados",
-            description="Usuarios esperando el inicio automático a las 17:00 Colombia",
+            description=f"Usuarios esperando el inicio automático a las {start_hour}:{start_minute:02d} Colombia",
             color=discord.Color.blue(),
             timestamp=datetime.now()
         )
@@ -1627,7 +2215,7 @@ async def ver_pre_registrados(interaction: discord.Interaction):
         for user_id_str, data in pre_registered_users.items():
             try:
                 user_id = int(user_id_str)
-                member = interaction.guild.get_member(user_id) if interaction.guild else None
+                member = get_guild_member(interaction.guild, user_id)
 
                 if member:
                     user_mention = member.mention
@@ -1666,11 +2254,11 @@ async def ver_pre_registrados(interaction: discord.Interaction):
 
         embed.add_field(
             name="🕐 Próximo inicio",
-            value=f"{START_TIME_HOUR}:{START_TIME_MINUTE:02d} Colombia",
+            value=f"{start_hour}:{start_minute:02d} Colombia",
             inline=True
         )
 
-        embed.set_footer(text=f"Los tiempos se iniciarán automáticamente a las {START_TIME_HOUR}:{START_TIME_MINUTE:02d} Colombia")
+        embed.set_footer(text=f"Los tiempos se iniciarán automáticamente a las {start_hour}:{start_minute:02d} Colombia")
 
         await interaction.response.send_message(embed=embed)
 
@@ -1695,26 +2283,12 @@ async def dar_creditos(interaction: discord.Interaction, usuario: discord.Member
 
     # Si el usuario no existe en el sistema, crearlo
     if not user_data:
-        time_tracker.data[str(user_id)] = {
-            'name': usuario.display_name,
-            'total_time': 0,
-            'sessions': [],
-            'is_active': False,
-            'is_paused': False,
-            'pause_count': 0,
-            'notified_milestones': [],
-            'milestone_completed': False,
-            'is_pre_registered': False,
-            'confirmed_credits': 0
-        }
-        user_data = time_tracker.data[str(user_id)]
+        user_data = time_tracker.ensure_user(user_id, usuario.display_name)
 
     # Agregar créditos confirmados
     current_credits = user_data.get('confirmed_credits', 0)
     new_credits = current_credits + cantidad
-    user_data['confirmed_credits'] = new_credits
-
-    time_tracker.save_data()
+    time_tracker.set_confirmed_credits(user_id, new_credits, KIND_GRANT)
 
     # Formatear créditos sin decimales si es entero
     credits_display = f"{int(new_credits)}" if new_credits == int(new_credits) else f"{new_credits:.2f}"
@@ -1763,8 +2337,7 @@ async def quitar_creditos(interaction: discord.Interaction, usuario: discord.Mem
     credits_removed = current_credits - new_credits
 
     # Actualizar créditos
-    user_data['confirmed_credits'] = new_credits
-    time_tracker.save_data()
+    time_tracker.set_confirmed_credits(user_id, new_credits, KIND_REMOVAL)
 
     # Formatear créditos sin decimales si es entero
     credits_display = f"{int(new_credits)}" if new_credits == int(new_credits) else f"{new_credits:.2f}"
@@ -1775,6 +2348,161 @@ async def quitar_creditos(interaction: discord.Interaction, usuario: discord.Mem
         f"💰 Créditos restantes de {usuario.display_name}: {credits_display} créditos"
     )
 
+@bot.tree.command(name="recargar_config", description="Recargar la configuración de roles desde config.json")
+@is_admin()
+async def recargar_config(interaction: discord.Interaction):
+    """Recargar roles Gold y por niveles sin reiniciar el bot"""
+    if reload_role_config():
+        await interaction.response.send_message(
+            f"✅ Configuración recargada: {len(ROLE_TIERS)} niveles, roles re-resueltos para {len(time_tracker.data)} usuarios",
+            ephemeral=True
+        )
+    else:
+        await interaction.response.send_message("❌ No se pudo leer o aplicar config.json (revisa la consola)", ephemeral=True)
+
+@bot.tree.command(name="sincronizar_comandos", description="Forzar la sincronización de los comandos slash")
+@is_admin()
+async def sincronizar_comandos(interaction: discord.Interaction):
+    """Sincronizar todos los ámbitos aunque sus huellas no hayan cambiado"""
+    await interaction.response.defer(ephemeral=True)
+    results = await sync_command_tree(force=True)
+    synced = [f"• {scope}: {count} comando(s)" for scope, count in results.items() if count is not None]
+    await interaction.followup.send(
+        "🔄 Comandos sincronizados:\n" + ("\n".join(synced) if synced else "Ningún ámbito se pudo sincronizar"),
+        ephemeral=True
+    )
+
+@bot.tree.command(name="diagnostico", description="Ver estadísticas internas del bot")
+@is_admin()
+async def diagnostico(interaction: discord.Interaction):
+    """Mostrar estadísticas de cachés e índices"""
+    embed = discord.Embed(
+        title="🩺 Diagnóstico",
+        color=discord.Color.dark_grey(),
+        timestamp=datetime.now()
+    )
+
+    stats = guild_partitions.current().role_type_cache.get_stats()
+    embed.add_field(
+        name="🎭 Caché de roles",
+        value=(f"Entradas: {stats['entries']}\n"
+               f"Aciertos: {stats['hits']} / Fallos: {stats['misses']}\n"
+               f"Tasa de acierto: {stats['hit_rate']:.1%}\n"
+               f"Invalidaciones: {stats['invalidations']}"),
+        inline=True
+    )
+
+    render_stats = row_render_cache.get_stats()
+    embed.add_field(
+        name="🖼️ Caché de filas",
+        value=(f"Entradas: {render_stats['entries']}\n"
+               f"Tasa de acierto: {render_stats['hit_rate']:.1%}\n"
+               f"Ediciones evitadas: {render_stats['skipped_edits']}"),
+        inline=True
+    )
+
+    embed.add_field(
+        name="📡 Paneles en vivo",
+        value=(f"Paneles: {len(live_dashboards)}\n"
+               f"Ediciones: {dashboard_stats['edits']} (aplazadas: {dashboard_stats['deferred_edits']})\n"
+               f"Clics agrupados: {dashboard_stats['coalesced_clicks']}"),
+        inline=True
+    )
+
+    outbox_stats = notification_outbox.get_stats()
+    embed.add_field(
+        name="📨 Notificaciones",
+        value=(f"Pendientes: {outbox_stats['pending']} (guardadas: {outbox_stats['durable_pending']})\n"
+               f"Más antigua: {time_tracker.format_time_human(outbox_stats['oldest_age'])}\n"
+               f"Mensajes enviados: {outbox_stats['sent_messages']} (agrupados: {outbox_stats['coalesced']})\n"
+               f"Fallos: {outbox_stats['failures']} • Descartadas: {outbox_stats['dropped']} • "
+               f"Reenvíos evitados: {outbox_stats['replays_skipped']}"),
+        inline=True
+    )
+
+    channel_stats = channel_registry.get_stats()
+    channel_problems = "\n".join(
+        f"<#{channel_id}>: {problem}" for channel_id, problem in channel_stats['problems'].items()
+    ) or "Ninguno"
+    embed.add_field(
+        name="🔌 Canales de notificación",
+        value=(f"Resueltos: {channel_stats['resolved']}\n"
+               f"En espera: {len(channel_stats['open'])} (intentos evitados: {channel_stats['skipped_attempts']})\n"
+               f"Problemas: {channel_problems}"),
+        inline=False
+    )
+
+    lru_stats = member_lru.get_stats()
+    resolver_stats = member_resolver.get_stats()
+    rss = current_rss_mb()
+    embed.add_field(
+        name="👥 Caché de miembros",
+        value=(f"Modo: {MEMBER_CACHE_MODE}\n"
+               f"En caché de discord.py: {sum(len(guild.members) for guild in bot.guilds)}\n"
+               f"LRU: {lru_stats['entries']}/{lru_stats['max_size']} (acierto {lru_stats['hit_rate']:.1%})\n"
+               f"Peticiones por lotes: {resolver_stats['queries']} ({resolver_stats['resolved']} resueltos, "
+               f"{resolver_stats['known_missing']} fuera del servidor)\n"
+               f"Memoria residente: {f'{rss:.1f} MB' if rss is not None else 'N/D'}"),
+        inline=True
+    )
+
+    running_jobs = job_runner.get_running()
+    embed.add_field(
+        name="🛠️ Trabajos en segundo plano",
+        value=("\n".join(f"• {job['label']} ({int(job['elapsed'])}s, {job['requested_by']})" for job in running_jobs)
+               or "Ninguno en curso") + f"\nRechazados por duplicado: {job_runner.rejected}",
+        inline=False
+    )
+
+    partition_lines = []
+    for state in get_local_states():
+        guild = state.guild()
+        name = guild.name if guild else state.guild_id
+        marker = " (principal)" if state.primary else ""
+        shard = f" [shard {guild.shard_id}]" if guild and SHARDING_ENABLED else ""
+        partition_lines.append(f"• {name}{marker}{shard}: {len(state.time_tracker.data)} usuarios, "
+                               f"{state.notification_outbox.pending_count()} avisos pendientes")
+    embed.add_field(
+        name="🌐 Servidores",
+        value="\n".join(partition_lines[:10])
+              + f"\nTareas de fondo en curso: {len(guild_partitions.running_tasks())} "
+                f"(ciclos saltados por carga: {guild_partitions.skipped_runs})",
+        inline=False
+    )
+
+    if SHARDING_ENABLED:
+        shard_lines = [
+            f"• Shard {shard_id}: {len([guild for guild in bot.guilds if guild.shard_id == shard_id])} servidores, "
+            f"{latency * 1000:.0f} ms"
+            for shard_id, latency in sorted(bot.latencies)
+        ]
+        embed.add_field(
+            name="🧩 Shards",
+            value=(f"En este proceso: {len(shard_lines)} de {bot.shard_count}\n" + "\n".join(shard_lines[:10])),
+            inline=False
+        )
+
+    voice_lines = []
+    for state in get_local_states():
+        if not state.auto_voice_tracking:
+            continue
+        voice_stats = state.voice_presence.get_stats()
+        voice_lines.append(f"• {state.guild_id}: {voice_stats['in_voice']} en voz, {voice_stats['pending']} en gracia, "
+                           f"{voice_stats['events']} eventos → {voice_stats['transitions']} cambios en "
+                           f"{voice_stats['batches']} lotes ({voice_stats['debounced']} descartados por reconexión)")
+    if voice_lines:
+        embed.add_field(name="🎙️ Seguimiento por voz", value="\n".join(voice_lines[:10]), inline=False)
+
+    embed.add_field(
+        name="📊 Usuarios",
+        value=(f"Registrados: {len(time_tracker.data)}\n"
+               f"Activos: {len(time_tracker.get_active_user_ids())}\n"
+               f"Pausados: {len(time_tracker.get_paused_user_ids())}"),
+        inline=True
+    )
+
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
 @bot.tree.command(name="mi_tiempo", description="Ver tu propio tiempo registrado")
 async def mi_tiempo(interaction: discord.Interaction):
     """Comando para que los usuarios vean su propio tiempo"""
@@ -1789,8 +2517,8 @@ async def mi_tiempo(interaction: discord.Interaction):
             )
             return
 
-        # Obtener tipo de rol del usuario PRIMERO
-        member = interaction.guild.get_member(user_id) if interaction.guild else None
+        # Obtener tipo de rol del usuario PRIMERO (el miembro llega con la interacción)
+        member = interaction.user if isinstance(interaction.user, discord.Member) else None
         role_type = get_user_role_type(member) if member else "normal"
 
         total_time = time_tracker.get_total_time(user_id)
@@ -1814,24 +2542,9 @@ async def mi_tiempo(interaction: discord.Interaction):
                 inline=True
             )
 
-        # Determinar estado (usando tiempo base para verificación)
-        total_hours = total_time / 3600
-
-        # Verificar si ha completado su tiempo máximo
-        is_finished = (user_data.get("milestone_completed", False) or
-                      (role_type == "gold" and total_hours >= 2.0) or
-                      (role_type == "normal" and total_hours >= 1.0))
-
-        if user_data.get('is_active', False):
-            status = "🟢 Activo"
-        elif is_finished:
-            status = "✅ Terminado"
-        elif user_data.get('is_paused', False):
-            status = "⏸️ Pausado"
-        elif user_data.get('daily_limit_reset', False) and total_hours > 0:
-            status = "✅ Terminado" # Considerar terminado si fue reseteado y tiene tiempo
-        else:
-            status = "🔴 Inactivo"
+        # Estado materializado (se recalcula solo si el rol cambió)
+        status_engine.set_role(user_id, role_type)
+        status = status_engine.get_label(user_id)
 
         embed.add_field(name="📍 Estado", value=status, inline=True)
 
@@ -1915,7 +2628,19 @@ async def mi_tiempo(interaction: discord.Interaction):
 
 # =================== COMANDOS DE PAGO SIMPLIFICADOS ===================
 
-class PaymentMainView(discord.ui.View):
+# Tipos del menú de /pagas: nombre mostrado y tier interno
+PAYMENT_TIERS = {
+    "reclutas": {"name": "Reclutas (Sin Rol)", "tier": "normal"},
+    "gold": {"name": "Gold", "tier": "gold"},
+    "medios": {"name": "Medios", "tier": "medios"},
+    "altos": {"name": "Altos", "tier": "altos"},
+    "imperiales": {"name": "Imperiales", "tier": "imperiales"},
+    "nobleza": {"name": "Nobleza", "tier": "nobleza"},
+    "monarquia": {"name": "Monarquía", "tier": "monarquia"},
+    "supremos": {"name": "Supremos", "tier": "supremos"}
+}
+
+class PaymentMainView(GuildView):
     def __init__(self, guild):
         super().__init__(timeout=300)
         self.guild = guild
@@ -1979,48 +2704,12 @@ class PaymentMainView(discord.ui.View):
         try:
             await interaction.response.defer()
 
-            # Mapeo de tipos a nombres y filtros
-            role_configs = {
-                "reclutas": {
-                    "name": "Reclutas (Sin Rol)",
-                    "filter": lambda member, data: get_user_role_type(member) == "normal" if member else True
-                },
-                "gold": {
-                    "name": "Gold",
-                    "filter": lambda member, data: get_user_role_type(member) == "gold" if member else False
-                },
-                "medios": {
-                    "name": "Medios",
-                    "filter": lambda member, data: get_user_role_type(member) == "medios" if member else False
-                },
-                "altos": {
-                    "name": "Altos",
-                    "filter": lambda member, data: get_user_role_type(member) == "altos" if member else False
-                },
-                "imperiales": {
-                    "name": "Imperiales",
-                    "filter": lambda member, data: get_user_role_type(member) == "imperiales" if member else False
-                },
-                "nobleza": {
-                    "name": "Nobleza",
-                    "filter": lambda member, data: get_user_role_type(member) == "nobleza" if member else False
-                },
-                "monarquia": {
-                    "name": "Monarquía",
-                    "filter": lambda member, data: get_user_role_type(member) == "monarquia" if member else False
-                },
-                "supremos": {
-                    "name": "Supremos",
-                    "filter": lambda member, data: get_user_role_type(member) == "supremos" if member else False
-                }
-            }
-
-            config = role_configs.get(selected_type)
+            config = PAYMENT_TIERS.get(selected_type)
             if not config:
                 await interaction.edit_original_response(content="❌ Tipo de rol no válido")
                 return
 
-            filtered_users = get_users_by_role_filter(config["filter"], config["name"], interaction)
+            filtered_users = get_payment_users(config["tier"])
             role_name = config["name"]
 
             if not filtered_users:
@@ -2033,8 +2722,8 @@ class PaymentMainView(discord.ui.View):
                 return
 
             # Crear vista con resultados y actualizar mensaje existente
-            view = PaymentView(filtered_users, role_name, self.guild)
-            embed = view.get_embed()
+            view = PaymentView(filtered_users, role_name, self.guild, tier=config["tier"])
+            embed = await view.render_embed()
             await interaction.edit_original_response(embed=embed, view=view)
 
         except Exception as e:
@@ -2054,13 +2743,20 @@ class PaymentMainView(discord.ui.View):
         for item in self.children:
             item.disabled = True
 
-class PaymentView(discord.ui.View):
-    def __init__(self, filtered_users, role_name, guild, search_term=None):
+class PaymentView(GuildView):
+    def __init__(self, filtered_users, role_name, guild, search_term=None, tier="normal", sort_mode=None):
         super().__init__(timeout=300)
-        self.filtered_users = filtered_users
+        # base_users conserva el orden por nombre (o por relevancia si hay búsqueda)
+        self.base_users = filtered_users
         self.role_name = role_name
         self.guild = guild
         self.search_term = search_term
+        self.tier = tier
+        self.sort_mode = sort_mode
+        self.filtered_users = self.get_sorted_users()
+        # Huella del último embed entregado (para no editar el mensaje si nada cambió)
+        self.last_embed_fingerprint = None
+        self.embed_changed = True
         self.current_page = 0
         self.max_per_page = 15
         self.total_pages = (len(filtered_users) + self.max_per_page - 1) // self.max_per_page if filtered_users else 1
@@ -2070,6 +2766,30 @@ class PaymentView(discord.ui.View):
                 if isinstance(item, discord.ui.Button) and item.label in ['◀️ Anterior', '▶️ Siguiente']:
                     item.disabled = True
 
+    def get_sorted_users(self):
+        """Ordenar las filas según el modo elegido usando los rankings del tier (sin ordenar todo)"""
+        if not self.sort_mode:
+            return list(self.base_users)
+
+        by_id = {str(user_data['user_id']): user_data for user_data in self.base_users}
+        if self.sort_mode == "credits":
+            ranked = user_rankings.top_by_credits(None, tier=self.tier, restrict_to=set(by_id))
+        else:
+            ranked = user_rankings.top_by_time(None, tier=self.tier, restrict_to=set(by_id))
+
+        sorted_users = [by_id.pop(user_id) for user_id, _ in ranked]
+        # Por seguridad, cualquier fila que el ranking no tenga va al final en su orden original
+        sorted_users.extend(by_id.values())
+        return sorted_users
+
+    async def render_embed(self):
+        """Pedir juntos los miembros de la página que faltan en caché y crear el embed"""
+        start_idx = self.current_page * self.max_per_page
+        page_rows = self.filtered_users[start_idx:start_idx + self.max_per_page]
+        await resolve_guild_members(self.guild, [row['user_id'] for row in page_rows],
+                                    timeout=MEMBER_RESOLVE_TIMEOUT)
+        return self.get_embed()
+
     def get_embed(self):
         """Crear embed para la página actual"""
         start_idx = self.current_page * self.max_per_page
@@ -2083,6 +2803,8 @@ class PaymentView(discord.ui.View):
         title = f"{role_emoji} Pago - {self.role_name}"
         if self.search_term:
             title += f" (Búsqueda: '{self.search_term}')"
+        if self.sort_mode:
+            title += f" ({SORT_LABELS[self.sort_mode]})"
 
         embed = discord.Embed(
             title=title,
@@ -2095,6 +2817,7 @@ class PaymentView(discord.ui.View):
             if self.search_term:
                 embed.description += f" con el término '{self.search_term}'"
             embed.set_footer(text="No hay datos para mostrar")
+            self.embed_changed = remember_embed(self, embed)
             return embed
 
         user_list = []
@@ -2103,47 +2826,14 @@ class PaymentView(discord.ui.View):
         for user_data in current_users:
             try:
                 user_id = user_data['user_id']
-                member = self.guild.get_member(user_id) if self.guild else None
+                member = get_guild_member(self.guild, user_id)
 
-                if member:
-                    user_mention = member.mention
-                else:
-                    user_name = user_data.get('name', f'Usuario {user_id}')
-                    user_mention = f"**{user_name}** `(ID: {user_id})`"
-
-                total_time = user_data['total_time']
-                formatted_time = time_tracker.format_time_human(total_time)
-                credits = user_data['credits']
-                total_credits += credits
-
-                data = user_data.get('data', {})
-                total_hours = total_time / 3600
-                role_type = get_user_role_type(member) if member else "normal"
-
-                # Determinar si completó su milestone
-                is_finished = (data.get("milestone_completed", False) or
-                             (role_type == "gold" and total_hours >= 2.0) or
-                             (role_type in ["medios", "altos", "imperiales", "nobleza", "monarquia", "supremos"] and total_hours >= 1.0) or
-                             (role_type == "normal" and total_hours >= 1.0))
-
-                # Determinar estado
-                if data.get('is_active', False):
-                    status = "🟢 Activo"
-                elif data.get('is_paused', False):
-                    if is_finished:
-                        status = "✅ Terminado"
-                    else:
-                        status = "⏸️ Pausado"
-                elif is_finished:
-                    status = "✅ Terminado"
-                elif data.get('daily_limit_reset', False) and total_hours > 0:
-                    status = "✅ Terminado" # Considerar terminado si fue reseteado y tiene tiempo
-                else:
-                    status = "🔴 Inactivo"
+                total_credits += user_data['credits']
 
-                # Formatear créditos sin decimales si es entero
-                credits_display = f"{int(credits)}" if credits == int(credits) else f"{credits:.2f}"
-                user_list.append(f"📌 {user_mention} - ⏱️ {formatted_time} - 💰 {credits_display} Créditos {status}")
+                cache_key = ("payment", user_id, time_tracker.get_version(str(user_id)), user_data['role_type'],
+                             member is not None, int(user_data['total_time']), user_data['credits'])
+                row = row_render_cache.get_or_render(cache_key, lambda: render_payment_row(user_data, member))
+                user_list.append(f"📌 {row}")
 
             except Exception as e:
                 print(f"Error procesando usuario en pago: {e}")
@@ -2157,16 +2847,25 @@ class PaymentView(discord.ui.View):
             inline=True
         )
 
-        total_users = len(self.filtered_users)
-        total_all_credits = sum(user['credits'] for user in self.filtered_users)
+        # Sin búsqueda, los totales del tier ya están acumulados en la tabla de pagos
+        if self.search_term:
+            total_users = len(self.filtered_users)
+            total_all_credits = round(sum(user['credits'] for user in self.filtered_users), 2)
+            total_earned_credits = round(sum(user.get('earned_credits', 0) for user in self.filtered_users), 2)
+        else:
+            tier_totals = payroll_table.get_totals(self.tier)
+            total_users = tier_totals['users']
+            total_all_credits = tier_totals['credits']
+            total_earned_credits = tier_totals['earned']
 
         embed.add_field(
             name="🎯 Total General",
-            value=f"Usuarios: {total_users}\nCréditos totales: {total_all_credits}",
+            value=f"Usuarios: {total_users}\nCréditos totales: {total_all_credits}\nSegún tiempo actual: {total_earned_credits}",
             inline=True
         )
 
         embed.set_footer(text=f"Página {self.current_page + 1}/{self.total_pages} • {total_users} usuarios en total")
+        self.embed_changed = remember_embed(self, embed)
         return embed
 
     @discord.ui.button(label='◀️ Anterior', style=discord.ButtonStyle.secondary)
@@ -2174,7 +2873,7 @@ class PaymentView(discord.ui.View):
         if self.current_page > 0:
             self.current_page -= 1
         self.update_buttons()
-        embed = self.get_embed()
+        embed = await self.render_embed()
         await interaction.response.edit_message(embed=embed, view=self)
 
     @discord.ui.button(label='▶️ Siguiente', style=discord.ButtonStyle.secondary)
@@ -2182,7 +2881,7 @@ class PaymentView(discord.ui.View):
         if self.current_page < self.total_pages - 1:
             self.current_page += 1
         self.update_buttons()
-        embed = self.get_embed()
+        embed = await self.render_embed()
         await interaction.response.edit_message(embed=embed, view=self)
 
     @discord.ui.button(label='🔍 Buscar Usuario', style=discord.ButtonStyle.primary)
@@ -2195,38 +2894,16 @@ class PaymentView(discord.ui.View):
         try:
             await interaction.response.defer()
 
-            # Determinar el tipo de filtro basado en el nombre del rol
-            if "Gold" in self.role_name:
-                def filter_func(member, data):
-                    if not member:
-                        return False
-                    if GOLD_ROLE_ID:
-                        for role in member.roles:
-                            if role.id == GOLD_ROLE_ID:
-                                return True
-                    role_type = get_user_role_type(member)
-                    return role_type == "gold"
-            else:  # Reclutas
-                def filter_func(member, data):
-                    if not member:
-                        return True
-                    role_type = get_user_role_type(member)
-                    return role_type == "normal"
-
-            # Recargar datos
-            refreshed_users = get_users_by_role_filter(filter_func, self.role_name, interaction)
+            # Recargar datos del mismo tier
+            refreshed_users = get_payment_users(self.tier)
 
             # Aplicar filtro de búsqueda si existe
             if self.search_term and refreshed_users:
-                search_filtered = []
-                for user_data in refreshed_users:
-                    user_name = user_data.get('name', '').lower()
-                    if self.search_term.lower() in user_name:
-                        search_filtered.append(user_data)
-                refreshed_users = search_filtered
+                refreshed_users = search_payment_users(refreshed_users, self.search_term)
 
             # Actualizar datos internos
-            self.filtered_users = refreshed_users
+            self.base_users = refreshed_users
+            self.filtered_users = self.get_sorted_users()
             self.total_pages = (len(refreshed_users) + self.max_per_page - 1) // self.max_per_page if refreshed_users else 1
 
             # Asegurar que la página actual sea válida
@@ -2237,7 +2914,12 @@ class PaymentView(discord.ui.View):
             self.update_buttons()
 
             # Obtener embed actualizado
-            embed = self.get_embed()
+            embed = await self.render_embed()
+
+            # Si el contenido es idéntico al mostrado, no gastar una edición
+            if not self.embed_changed:
+                row_render_cache.skipped_edits += 1
+                return
 
             # Actualizar mensaje existente sin reenviar
             await interaction.edit_original_response(embed=embed, view=self)
@@ -2254,34 +2936,16 @@ class PaymentView(discord.ui.View):
         try:
             await interaction.response.defer()
 
-            # Determinar el tipo de filtro basado en el nombre del rol
-            if "Gold" in self.role_name:
-                def filter_func(member, data):
-                    if not member:
-                        return False
-                    if GOLD_ROLE_ID:
-                        for role in member.roles:
-                            if role.id == GOLD_ROLE_ID:
-                                return True
-                    role_type = get_user_role_type(member)
-                    return role_type == "gold"
-            else:  # Reclutas
-                def filter_func(member, data):
-                    if not member:
-                        return True
-                    role_type = get_user_role_type(member)
-                    return role_type == "normal"
-
             # Recargar datos sin filtro de búsqueda
-            all_users = get_users_by_role_filter(filter_func, self.role_name, interaction)
+            all_users = get_payment_users(self.tier)
 
             if not all_users:
                 await interaction.edit_original_response(content="❌ No se encontraron usuarios para mostrar")
                 return
 
             # Crear nueva vista sin filtro de búsqueda
-            new_view = PaymentView(all_users, self.role_name, self.guild)
-            embed = new_view.get_embed()
+            new_view = PaymentView(all_users, self.role_name, self.guild, tier=self.tier, sort_mode=self.sort_mode)
+            embed = await new_view.render_embed()
 
             await interaction.edit_original_response(embed=embed, view=new_view)
 
@@ -2354,6 +3018,29 @@ class PaymentView(discord.ui.View):
         except Exception as e:
             await interaction.followup.send(f"❌ Error al volver al menú: {e}", ephemeral=True)
 
+    @discord.ui.select(
+        placeholder="Ordenar por...",
+        options=[
+            discord.SelectOption(label="Orden alfabético", value="name", emoji="🔤"),
+            discord.SelectOption(label="Créditos confirmados (mayor a menor)", value="credits", emoji="💰"),
+            discord.SelectOption(label="Tiempo (mayor a menor)", value="time", emoji="⏱️")
+        ]
+    )
+    async def sort_select(self, interaction: discord.Interaction, select: discord.ui.Select):
+        selected_sort = select.values[0]
+
+        try:
+            self.sort_mode = selected_sort if selected_sort != "name" else None
+            self.filtered_users = self.get_sorted_users()
+            self.current_page = 0
+            self.update_buttons()
+
+            embed = await self.render_embed()
+            await interaction.response.edit_message(embed=embed, view=self)
+
+        except Exception as e:
+            await interaction.response.send_message(f"❌ Error aplicando orden: {e}", ephemeral=True)
+
     def update_buttons(self):
         """Actualizar estado de los botones"""
         self.children[0].disabled = (self.current_page == 0)
@@ -2364,7 +3051,7 @@ class PaymentView(discord.ui.View):
         for item in self.children:
             item.disabled = True
 
-class SearchUserModal(discord.ui.Modal):
+class SearchUserModal(GuildModal):
     def __init__(self, payment_view):
         super().__init__(title='Buscar Usuario')
         self.payment_view = payment_view
@@ -2377,13 +3064,8 @@ class SearchUserModal(discord.ui.Modal):
     )
 
     async def on_submit(self, interaction: discord.Interaction):
-        search_term = self.search_term.value.lower().strip()
-
-        matching_users = []
-        for user_data in self.payment_view.filtered_users:
-            user_name = user_data.get('name', '').lower()
-            if search_term in user_name:
-                matching_users.append(user_data)
+        search_term = self.search_term.value.strip()
+        matching_users = search_payment_users(self.payment_view.filtered_users, search_term)
 
         if not matching_users:
             await interaction.response.send_message(
@@ -2392,63 +3074,26 @@ class SearchUserModal(discord.ui.Modal):
             )
             return
 
-        new_view = PaymentView(matching_users, self.payment_view.role_name, self.payment_view.guild, search_term)
-        embed = new_view.get_embed()
+        new_view = PaymentView(matching_users, self.payment_view.role_name, self.payment_view.guild, search_term,
+                               tier=self.payment_view.tier, sort_mode=self.payment_view.sort_mode)
+        embed = await new_view.render_embed()
 
         await interaction.response.edit_message(embed=embed, view=new_view)
 
-def get_users_by_role_filter(role_filter_func, role_name: str, interaction: discord.Interaction):
-    """Función auxiliar para obtener usuarios filtrados por rol"""
-    try:
-        tracked_users = time_tracker.get_all_tracked_users()
-        filtered_users = []
-
-        for user_id_str, data in tracked_users.items():
-            try:
-                user_id = int(user_id_str)
-                member = interaction.guild.get_member(user_id) if interaction.guild else None
-
-                if not role_filter_func(member, data):
-                    continue
-
-                total_time = time_tracker.get_total_time(user_id)
-
-                # Usar créditos confirmados guardados en el archivo
-                credits = data.get('confirmed_credits', 0)
-
-                # Si el tiempo es 0 Y no tiene créditos confirmados, omitir
-                if total_time <= 0 and credits <= 0:
-                    continue
-
-                if member:
-                    role_type = get_user_role_type(member)
-                else:
-                    role_type = "normal"
-
-                user_info = {
-                    'user_id': user_id,
-                    'name': data.get('name', f'Usuario {user_id}'),
-                    'total_time': total_time,
-                    'credits': credits,
-                    'role_type': role_type,
-                    'data': data
-                }
-
-                filtered_users.append(user_info)
-
-            except Exception as e:
-                print(f"Error procesando usuario {user_id_str}: {e}")
-                continue
-
-        filtered_users.sort(key=lambda x: x['name'].lower())
-        return filtered_users
+def search_payment_users(payment_users, search_term: str):
+    """Filtrar filas de pago con el índice de nombres, en orden de relevancia"""
+    by_id = {str(user_data['user_id']): user_data for user_data in payment_users}
+    ranked_ids = time_tracker.search_users(search_term, restrict_to=set(by_id))
+    return [by_id[user_id] for user_id in ranked_ids]
 
+def get_payment_users(tier: str):
+    """Filas de pago de un tier, leídas de la tabla de pagos materializada"""
+    try:
+        return payroll_table.get_rows(tier)
     except Exception as e:
-        print(f"Error en get_users_by_role_filter: {e}")
+        print(f"Error en get_payment_users: {e}")
         return []
 
-
-
 @bot.tree.command(name="pagas", description="Ver sistema de pagos con dropdown de opciones")
 @is_admin()
 async def pagas(interaction: discord.Interaction):
@@ -2517,16 +3162,503 @@ async def pagas(interaction: discord.Interaction):
     except Exception as e:
         await interaction.response.send_message(f"❌ Error al mostrar sistema de pagos: {e}", ephemeral=True)
 
-# =================== NOTIFICACIONES ===================
+PAYROLL_CSV_HEADER = ["user_id", "nombre", "tier", "tiempo_base_segundos", "tiempo_base",
+                      "minutos_extra", "creditos_confirmados"]
 
-async def send_milestone_notification(user_name: str, member, is_external_user: bool, hours: int, total_time: float):
-    """Enviar notificación cuando un usuario completa un milestone de hora - AQUÍ SE CALCULAN Y OTORGAN LOS CRÉDITOS"""
+def iter_payroll_csv(user_ids, include_status: bool = False):
+    """Generar el CSV de pagos línea a línea (sin construir la tabla completa en memoria)
+
+    Con include_status se añade la columna de estado (la usa la exportación de /ver_tiempos).
+    """
+    line_buffer = io.StringIO()
+    writer = csv.writer(line_buffer)
+
+    def take_line():
+        line = line_buffer.getvalue()
+        line_buffer.seek(0)
+        line_buffer.truncate(0)
+        return line
+
+    writer.writerow(PAYROLL_CSV_HEADER + (["estado"] if include_status else []))
+    yield take_line()
+
+    for user_id_str in user_ids:
+        data = time_tracker.data.get(user_id_str)
+        if data is None:
+            continue
+        user_id = int(user_id_str)
+        total_seconds = int(time_tracker.get_total_time(user_id))
+        hours, remainder = divmod(total_seconds, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        row = [
+            user_id_str,
+            data.get('name', f'Usuario {user_id_str}'),
+            status_engine.get_role_type(user_id),
+            total_seconds,
+            f"{hours}:{minutes:02d}:{seconds:02d}",
+            data.get('extra_minutes', 0),
+            data.get('confirmed_credits', 0)
+        ]
+        if include_status:
+            row.append(status_engine.get_status(user_id))
+        writer.writerow(row)
+        yield take_line()
+
+def build_payroll_file(user_ids, filename: str, include_status: bool = False) -> discord.File:
+    """Volcar el CSV generado a un archivo en memoria listo para adjuntar
+
+    Se escribe de una vez, sin esperas de por medio, así que refleja un estado
+    consistente de los datos aunque sigan llegando eventos.
+    """
+    output = io.BytesIO()
+    # BOM para que Excel reconozca los acentos
+    output.write(b'\xef\xbb\xbf')
+    for line in iter_payroll_csv(user_ids, include_status):
+        output.write(line.encode('utf-8'))
+    output.seek(0)
+    return discord.File(output, filename=filename)
+
+@bot.tree.command(name="pagas_exportar", description="Exportar la nómina de pagos como archivo CSV")
+@discord.app_commands.describe(tipo="Tipo de usuarios a exportar (por defecto todos)")
+@discord.app_commands.choices(tipo=[
+    discord.app_commands.Choice(name=tier_config["name"], value=tier_key)
+    for tier_key, tier_config in PAYMENT_TIERS.items()
+])
+@is_admin()
+async def pagas_exportar(interaction: discord.Interaction, tipo: str = None):
+    """Exportar id, nombre, tier, tiempo base, minutos extra y créditos confirmados"""
     try:
-        channel = bot.get_channel(NOTIFICATION_CHANNEL_ID)
-        if not channel:
-            print(f"❌ Canal de notificaciones no encontrado: {NOTIFICATION_CHANNEL_ID}")
+        await interaction.response.defer(ephemeral=True)
+
+        # Orden alfabético tomado del índice del tracker; con tipo, solo los IDs de ese tier
+        if tipo:
+            tier_ids = status_engine.get_ids_by_role(PAYMENT_TIERS[tipo]["tier"])
+            user_ids = [user_id for _, user_id in time_tracker.sorted_index.keys if user_id in tier_ids]
+        else:
+            user_ids = [user_id for _, user_id in time_tracker.sorted_index.keys]
+
+        if not user_ids:
+            await interaction.followup.send("❌ No hay usuarios para exportar", ephemeral=True)
+            return
+
+        timestamp = datetime.now(COLOMBIA_TZ).strftime('%Y%m%d_%H%M')
+        filename = f"pagas_{tipo or 'todos'}_{timestamp}.csv"
+        payroll_file = build_payroll_file(user_ids, filename)
+
+        await interaction.followup.send(
+            f"📎 Nómina exportada: {len(user_ids)} usuarios",
+            file=payroll_file,
+            ephemeral=True
+        )
+
+    except Exception as e:
+        print(f"Error exportando pagos: {e}")
+        await interaction.followup.send(f"❌ Error al exportar pagos: {e}", ephemeral=True)
+
+# =================== PANEL EN VIVO ===================
+
+DASHBOARD_FILE = f"dashboard_state{PROCESS_FILE_SUFFIX}.json"
+DASHBOARD_INTERVAL = 30      # Segundos entre actualizaciones programadas
+DASHBOARD_EDIT_BUDGET = 5    # Ediciones máximas por ciclo entre todos los paneles (límite de Discord)
+DASHBOARD_DEBOUNCE = 5       # Segundos en los que se agrupan los clics de "Actualizar"
+DASHBOARD_PAGE_SIZE = 20
+
+# channel_id -> {'message_id', 'page', 'fingerprint'}
+live_dashboards = {}
+dashboard_task = None
+dashboard_wakeup = asyncio.Event()
+dashboard_refresh_pending = False
+dashboard_view_registered = False
+dashboard_stats = {'ticks': 0, 'edits': 0, 'deferred_edits': 0, 'coalesced_clicks': 0}
+dashboard_next_channel = 0
+
+def load_dashboards():
+    """Cargar los paneles en vivo guardados"""
+    global live_dashboards
+    try:
+        if os.path.exists(DASHBOARD_FILE):
+            with open(DASHBOARD_FILE, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            live_dashboards = {
+                int(channel_id): {'message_id': state['message_id'], 'page': state.get('page', 0), 'fingerprint': None}
+                for channel_id, state in saved.items()
+            }
+    except Exception as e:
+        print(f"Error cargando paneles en vivo: {e}")
+        live_dashboards = {}
+
+def save_dashboards():
+    """Guardar los paneles en vivo (canal, mensaje y página)"""
+    try:
+        saved = {
+            str(channel_id): {'message_id': state['message_id'], 'page': state['page']}
+            for channel_id, state in live_dashboards.items()
+        }
+        with open(DASHBOARD_FILE, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, indent=2)
+    except Exception as e:
+        print(f"Error guardando paneles en vivo: {e}")
+
+def get_dashboard_total_pages() -> int:
+    total_users = len(time_tracker.sorted_index)
+    return max(1, (total_users + DASHBOARD_PAGE_SIZE - 1) // DASHBOARD_PAGE_SIZE)
+
+def build_dashboard_embed(page: int, guild) -> discord.Embed:
+    """Embed del panel: conteos por estado y una página del listado alfabético"""
+    total_pages = get_dashboard_total_pages()
+    page = min(max(page, 0), total_pages - 1)
+
+    sorted_index = time_tracker.sorted_index
+    first_key = sorted_index.key_at(page * DASHBOARD_PAGE_SIZE)
+    keys = sorted_index.keys_from(first_key, DASHBOARD_PAGE_SIZE) if first_key is not None else []
+    page_users = []
+    for name_lower, user_id in keys:
+        data = time_tracker.get_user_data(user_id)
+        if data is not None:
+            page_users.append((name_lower, user_id, data))
+
+    user_list = render_times_lines(page_users, guild)
+
+    embed = discord.Embed(
+        title="📡 Panel en vivo - Tiempos",
+        description="\n".join(user_list) if user_list else "No hay usuarios registrados",
+        color=discord.Color.teal(),
+        timestamp=datetime.now()
+    )
+    embed.add_field(name="🟢 Activos", value=str(len(time_tracker.get_active_user_ids())), inline=True)
+    embed.add_field(name="⏸️ Pausados", value=str(len(time_tracker.get_paused_user_ids())), inline=True)
+    embed.add_field(name="📝 Pre-registrados", value=str(len(time_tracker.get_pre_registered_user_ids())), inline=True)
+    embed.set_footer(text=f"Página {page + 1}/{total_pages} • {len(sorted_index)} usuarios • "
+                          f"Se actualiza cada {DASHBOARD_INTERVAL} s")
+    return embed
+
+async def update_live_dashboards():
+    """Editar los paneles cuyo contenido cambió, calculando cada página una sola vez por ciclo"""
+    global dashboard_next_channel
+    if not live_dashboards:
+        return
+
+    dashboard_stats['ticks'] += 1
+    tick_embeds = {}
+    edits = 0
+
+    # Reparto rotativo para que ningún panel se quede sin turno cuando se agota el presupuesto
+    channel_ids = sorted(live_dashboards)
+    start = dashboard_next_channel % len(channel_ids)
+    ordered = channel_ids[start:] + channel_ids[:start]
+    # El próximo ciclo empieza por el primer panel aplazado en este
+    next_start = None
+
+    for position, channel_id in enumerate(ordered):
+        state = live_dashboards.get(channel_id)
+        if state is None:
+            continue
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            continue
+
+        guild = getattr(channel, 'guild', None)
+        memo_key = (guild.id if guild else None, state['page'])
+        if memo_key not in tick_embeds:
+            # Cada panel muestra los datos del servidor de su canal
+            with guild_partitions.use(guild.id if guild else None):
+                embed = build_dashboard_embed(state['page'], guild)
+            tick_embeds[memo_key] = (embed, embed_fingerprint(embed.to_dict()))
+        embed, fingerprint = tick_embeds[memo_key]
+
+        if fingerprint == state['fingerprint']:
+            continue
+
+        if edits >= DASHBOARD_EDIT_BUDGET:
+            # Queda pendiente (la huella no cambia) y empieza el próximo ciclo
+            dashboard_stats['deferred_edits'] += 1
+            if next_start is None:
+                next_start = start + position
+            continue
+
+        try:
+            await channel.get_partial_message(state['message_id']).edit(embed=embed, view=DashboardView())
+            state['fingerprint'] = fingerprint
+            edits += 1
+            dashboard_stats['edits'] += 1
+        except discord.NotFound:
+            print(f"⚠️ Mensaje del panel en vivo eliminado en el canal {channel_id}, panel desactivado")
+            live_dashboards.pop(channel_id, None)
+            save_dashboards()
+        except Exception as e:
+            print(f"Error actualizando panel en vivo en {channel_id}: {e}")
+
+    if next_start is not None:
+        dashboard_next_channel = next_start
+
+def request_dashboard_refresh() -> bool:
+    """Pedir una actualización; los clics dentro de la ventana se agrupan en una sola
+
+    Devuelve False si el clic se agrupó con una actualización ya programada.
+    """
+    global dashboard_refresh_pending
+    if dashboard_refresh_pending:
+        dashboard_stats['coalesced_clicks'] += 1
+        return False
+
+    dashboard_refresh_pending = True
+
+    def fire():
+        global dashboard_refresh_pending
+        dashboard_refresh_pending = False
+        dashboard_wakeup.set()
+
+    asyncio.get_running_loop().call_later(DASHBOARD_DEBOUNCE, fire)
+    return True
+
+async def live_dashboard_loop():
+    """Actualizar los paneles en vivo con cadencia fija (o antes si se pidió con el botón)"""
+    await bot.wait_until_ready()
+    while True:
+        try:
+            try:
+                await asyncio.wait_for(dashboard_wakeup.wait(), timeout=DASHBOARD_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            dashboard_wakeup.clear()
+            await update_live_dashboards()
+        except Exception as e:
+            print(f"Error en panel en vivo: {e}")
+            await asyncio.sleep(DASHBOARD_INTERVAL)
+
+class DashboardView(GuildView):
+    """Botones persistentes del panel en vivo (compartidos por todos los que lo miran)"""
+
+    def __init__(self):
+        super().__init__(timeout=None)
+
+    async def change_page(self, interaction: discord.Interaction, delta: int):
+        state = live_dashboards.get(interaction.channel_id)
+        if state is None or state['message_id'] != interaction.message.id:
+            await interaction.response.send_message("❌ Este panel ya no está activo", ephemeral=True)
             return
 
+        total_pages = get_dashboard_total_pages()
+        state['page'] = min(max(state['page'] + delta, 0), total_pages - 1)
+        save_dashboards()
+
+        embed = build_dashboard_embed(state['page'], interaction.guild)
+        state['fingerprint'] = embed_fingerprint(embed.to_dict())
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label='◀️ Anterior', style=discord.ButtonStyle.secondary, custom_id='dashboard:previous')
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.change_page(interaction, -1)
+
+    @discord.ui.button(label='▶️ Siguiente', style=discord.ButtonStyle.secondary, custom_id='dashboard:next')
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.change_page(interaction, 1)
+
+    @discord.ui.button(label='🔄 Actualizar', style=discord.ButtonStyle.success, custom_id='dashboard:refresh')
+    async def refresh_dashboard(self, interaction: discord.Interaction, button: discord.ui.Button):
+        # El panel se actualiza para todos al cerrar la ventana de agrupación
+        await interaction.response.defer()
+        request_dashboard_refresh()
+
+@bot.tree.command(name="panel_tiempos", description="Crear o quitar el panel en vivo de tiempos en este canal")
+@discord.app_commands.describe(accion="Iniciar o detener el panel en este canal")
+@discord.app_commands.choices(accion=[
+    discord.app_commands.Choice(name="Iniciar", value="iniciar"),
+    discord.app_commands.Choice(name="Detener", value="detener")
+])
+@is_admin()
+async def panel_tiempos(interaction: discord.Interaction, accion: str = "iniciar"):
+    """Panel compartido que el bot edita periódicamente en lugar de que cada admin refresque"""
+    channel = interaction.channel
+    if accion == "detener":
+        if live_dashboards.pop(channel.id, None) is None:
+            await interaction.response.send_message("❌ No hay panel en vivo en este canal", ephemeral=True)
+            return
+        save_dashboards()
+        await interaction.response.send_message("🛑 Panel en vivo detenido en este canal", ephemeral=True)
+        return
+
+    try:
+        await interaction.response.defer(ephemeral=True)
+
+        embed = build_dashboard_embed(0, interaction.guild)
+        message = await channel.send(embed=embed, view=DashboardView())
+        try:
+            await message.pin()
+        except Exception as e:
+            print(f"⚠️ No se pudo fijar el panel en vivo: {e}")
+
+        live_dashboards[channel.id] = {
+            'message_id': message.id,
+            'page': 0,
+            'fingerprint': embed_fingerprint(embed.to_dict())
+        }
+        save_dashboards()
+
+        await interaction.followup.send(
+            f"📡 Panel en vivo creado: se actualiza cada {DASHBOARD_INTERVAL} segundos",
+            ephemeral=True
+        )
+
+    except Exception as e:
+        print(f"Error creando panel en vivo: {e}")
+        await interaction.followup.send(f"❌ Error creando el panel en vivo: {e}", ephemeral=True)
+
+# =================== NOTIFICACIONES ===================
+
+# Canales resueltos al conectar; un canal que falla queda en espera en vez de reintentarse sin parar
+channel_registry = ChannelRegistry()
+
+def parse_schedule_time(value: str) -> tuple:
+    """'HH:MM' -> (hora, minuto)"""
+    hour, minute = value.split(':')
+    return int(hour), int(minute)
+
+class GuildState:
+    """Datos, índices y configuración de un servidor
+
+    La configuración es la general de config.json con guilds -> <id> encima; los canales
+    de notificación no se heredan del servidor principal (cada servidor indica los suyos).
+    """
+
+    def __init__(self, guild_id, primary: bool, base_config: dict):
+        self.guild_id = guild_id
+        self.primary = primary
+        suffix = "" if primary else f"_{guild_id}"
+        self.time_tracker = TimeTracker(f"user_times{suffix}.json", f"attendance_data{suffix}.json",
+                                        f"credit_ledger{suffix}.jsonl", f"notification_journal{suffix}.jsonl")
+        # Entradas y salidas de los canales de voz, aplicadas por lotes tras el periodo de gracia
+        self.voice_presence = VoicePresenceBatcher(lambda changes: apply_voice_changes(self, changes))
+        self.apply_config(base_config)
+
+        # Caché de tipo de rol por miembro (se invalida con cambios de roles o de configuración)
+        self.role_type_cache = RoleTypeCache(lambda member: self.tier_matcher.resolve(member))
+        # Estado de visualización materializado por usuario
+        self.status_engine = StatusEngine(self.time_tracker, self.lookup_role)
+        # Rankings de tiempo y créditos (global y por tier) mantenidos en cada cambio
+        self.user_rankings = UserRankings(self.time_tracker, self.status_engine)
+        # Tabla de pagos por tier (filas y totales) mantenida en cada cambio
+        self.payroll_table = PayrollTable(self.time_tracker, self.status_engine, self.credit_engine)
+        # Filas ya renderizadas de /ver_tiempos y /pagas
+        self.row_render_cache = RenderCache()
+        # Los avisos se encolan y un emisor por canal los envía (agrupando ráfagas y reintentando),
+        # así un canal lento o limitado no frena los milestones ni los comandos
+        notification_file_store = NotificationFileStore(f"pending_notifications{suffix}.json")
+        self.notification_outbox = NotificationOutbox(get_notification_channel, store=self.time_tracker,
+                                                      breaker=channel_registry,
+                                                      fallback_store=notification_file_store)
+        # Los avisos sin entregar de usuarios eliminados pasan a la lista del servidor
+        self.time_tracker.notification_fallback = notification_file_store
+        # Modo tracked: traer a la caché a los usuarios registrados que aún no están
+        self.time_tracker.add_change_listener(
+            lambda user_id_str, user_data: on_tracked_user_changed(self, user_id_str, user_data)
+        )
+        # tarea programada -> minuto en que ya se ejecutó (para no repetirla en el mismo minuto)
+        self.last_runs = {}
+
+    def apply_config(self, base_config: dict) -> None:
+        """Compilar roles, canales y horario del servidor desde la configuración"""
+        guild_config = {key: value for key, value in base_config.items() if key != 'guilds'}
+        if not self.primary:
+            guild_config.pop('notification_channels', None)
+        overrides = base_config.get('guilds', {}).get(str(self.guild_id), {})
+        config = merge_config(guild_config, overrides)
+
+        # Resolución de tiers precompilada y reglas de créditos (se recompilan al recargar).
+        # Se compilan antes de asignar nada: si fallan, el servidor sigue con la configuración anterior
+        role_tiers = config.get('role_tiers') or {}
+        gold_role_id = config.get('gold_role_id') or GOLD_ROLE_ID
+        tier_matcher = TierMatcher(role_tiers, [gold_role_id, 1382198935971430440])
+        credit_engine = CreditEngine(role_tiers)
+
+        self.config = config
+        self.role_tiers = role_tiers
+        self.gold_role_id = gold_role_id
+        self.tier_matcher = tier_matcher
+        self.credit_engine = credit_engine
+
+        default_channels = DEFAULT_NOTIFICATION_CHANNELS if self.primary else {}
+        channels = self.config.get('notification_channels', {})
+        self.notification_channels = {kind: channels.get(kind, default_channels.get(kind)) for kind in NOTIFICATION_KINDS}
+
+        schedule = merge_config(DEFAULT_SCHEDULE, self.config.get('schedule', {}))
+        self.timezone = ZoneInfo(schedule['timezone'])
+        self.schedule = {name: parse_schedule_time(schedule[name]) for name in ('start', 'stop', 'reset', 'cutoff')}
+
+        time_tracking = self.config.get('time_tracking', {})
+        self.auto_voice_tracking = bool(time_tracking.get('auto_voice_tracking', False))
+        self.voice_channel_ids = {int(channel_id) for channel_id in time_tracking.get('voice_channel_ids', [])}
+        self.voice_presence.grace_seconds = time_tracking.get('voice_grace_seconds', 15)
+        self.voice_presence.batch_interval = time_tracking.get('voice_batch_seconds', 2)
+
+    def reload_config(self, base_config: dict) -> None:
+        self.apply_config(base_config)
+        self.payroll_table.credit_rules = self.credit_engine
+        self.refresh_roles()
+        self.payroll_table.rebuild()
+        # Las filas renderizadas dependen de los créditos por hora y los nombres de tier
+        self.row_render_cache.clear()
+
+    def guild(self):
+        """Objeto del servidor (el primero conectado si el principal aún no tiene ID)"""
+        if self.guild_id is not None:
+            return bot.get_guild(self.guild_id)
+        return bot.guilds[0] if bot.guilds else None
+
+    def lookup_role(self, user_id: int) -> str:
+        """Tipo de rol de un usuario por ID en este servidor"""
+        member = get_guild_member(self.guild(), user_id)
+        return self.role_type_cache.get(member) if member else "normal"
+
+    def refresh_roles(self) -> None:
+        """Vaciar la caché de roles y volver a resolver el tier de los usuarios registrados"""
+        self.role_type_cache.clear()
+        for user_id_str in list(self.time_tracker.data.keys()):
+            user_id = int(user_id_str)
+            self.status_engine.set_role(user_id, self.lookup_role(user_id))
+        print(f"🔄 Roles re-resueltos para {len(self.time_tracker.data)} usuarios del servidor {self.guild_id}")
+
+    def rebuild(self) -> None:
+        """Materializar estados, rankings y pagos (con los roles ya disponibles)"""
+        self.status_engine.rebuild()
+        self.user_rankings.rebuild()
+        self.payroll_table.rebuild()
+
+    def now(self) -> datetime:
+        return datetime.now(self.timezone)
+
+    def claim_scheduled_run(self, name: str) -> bool:
+        """True una sola vez en el minuto programado de la tarea para este servidor"""
+        local_now = self.now()
+        if (local_now.hour, local_now.minute) != self.schedule[name]:
+            return False
+        run_key = local_now.strftime('%Y-%m-%d %H:%M')
+        if self.last_runs.get(name) == run_key:
+            return False
+        self.last_runs[name] = run_key
+        return True
+
+def queue_user_notification(channel_id, message: str, lane: int, user_id=None) -> None:
+    """Encolar un aviso de movimiento y guardarlo en el registro del usuario si aún existe
+
+    Los comandos lo llaman dentro del batch_save de la transición, así el cambio de estado
+    y el aviso pendiente salen en una sola escritura.
+    """
+    if channel_id is None:
+        print("⚠️ Aviso sin canal de notificaciones configurado en este servidor, no se envía")
+        return
+    owner = str(user_id) if user_id else None
+    if notification_outbox.enqueue(channel_id, message, lane, owner=owner):
+        time_tracker.save_data()
+
+async def send_milestone_notification(user_name: str, member, is_external_user: bool, hours: int, total_time: float):
+    """Enviar notificación cuando un usuario completa un milestone de hora - AQUÍ SE CALCULAN Y OTORGAN LOS CRÉDITOS
+
+    El milestone ya marcado, los créditos y el aviso pendiente se guardan en un solo guardado,
+    así un reinicio no puede dejar créditos confirmados sin anunciar.
+    """
+    saved = False
+    try:
         # Determinar tipo de rol
         role_type = "normal"
         if member:
@@ -2537,15 +3669,6 @@ async def send_milestone_notification(user_name: str, member, is_external_user:
         milestone_time_seconds = hours * 3600  # Tiempo correspondiente al milestone (1h, 2h, etc.)
         credits = calculate_credits(milestone_time_seconds, role_type, user_id=member.id if member else None)
 
-        # GUARDAR CRÉDITOS CONFIRMADOS SOLO AL ENVIAR LA NOTIFICACIÓN
-        if member:
-            user_id = member.id
-            user_data = time_tracker.get_user_data(user_id)
-            if user_data:
-                # Actualizar créditos confirmados
-                user_data['confirmed_credits'] = credits
-                time_tracker.save_data()
-
         # Crear mención del usuario si es posible
         user_mention = member.mention if member else f"**{user_name}**"
 
@@ -2577,98 +3700,76 @@ async def send_milestone_notification(user_name: str, member, is_external_user:
             message = f"{user_mention} ha completado **{hours} hora{'s' if hours != 1 else ''}** ( {credits_display} Créditos / {role_display} )"
 
         # ENVIAR CONFIRMACIÓN - momento en que se otorgan oficialmente los créditos
-        await channel.send(message)
+        owner = str(member.id) if member and time_tracker.get_user_data(member.id) else None
+        channel_id = get_notification_channel_id('milestones')
+        if channel_id is not None:
+            notification_outbox.enqueue(channel_id, message, LANE_MILESTONE, owner=owner)
+        else:
+            print(f"⚠️ Milestone de {user_name} sin canal de notificaciones configurado en este servidor")
+
+        # GUARDAR CRÉDITOS CONFIRMADOS JUNTO CON EL AVISO (set_confirmed_credits guarda todo)
+        if owner:
+            time_tracker.set_confirmed_credits(member.id, credits, KIND_MILESTONE)
+            saved = True
 
     except Exception as e:
         print(f"❌ Error enviando notificación de milestone para {user_name}: {e}")
+    finally:
+        if not saved:
+            time_tracker.save_data()
 
-async def send_auto_cancellation_notification(user_name: str, total_time: str, cancelled_by: str, pause_count: int, time_lost: float = 0):
+def send_auto_cancellation_notification(user_name: str, total_time: str, cancelled_by: str, pause_count: int, time_lost: float = 0, user_id: int = None):
     """Enviar notificación cuando un usuario es cancelado automáticamente por 3 pausas"""
-    max_retries = 3
-
-    for attempt in range(max_retries):
-        try:
-            channel = bot.get_channel(CANCELLATION_NOTIFICATION_CHANNEL_ID)
-            if not channel:
-                print(f"❌ Canal de cancelaciones no encontrado: {CANCELLATION_NOTIFICATION_CHANNEL_ID}")
-                return
-
-            formatted_time_lost = time_tracker.format_time_human(time_lost) if time_lost > 0 else "0 Segundos"
-            message = f"🚫 **Tiempo Cancelado Automáticamente**\n**{user_name}** ha sido cancelado automáticamente por exceder el límite de pausas\n**Tiempo conservado:** {total_time} (solo horas completas)\n**Tiempo perdido:** {formatted_time_lost}\n**Pausas alcanzadas:** {pause_count}/3\n**Última pausa ejecutada por:** {cancelled_by}"
-
-            await asyncio.wait_for(channel.send(message), timeout=10.0)
-            print(f"✅ Notificación de cancelación automática enviada para {user_name} al canal {CANCELLATION_NOTIFICATION_CHANNEL_ID}")
-            return
-
-        except asyncio.TimeoutError:
-            print(f"⚠️ Timeout enviando notificación de cancelación automática para {user_name} (intento {attempt + 1}/{max_retries})")
-        except Exception as e:
-            print(f"⚠️ Error enviando notificación de cancelación automática para {user_name} (intento {attempt + 1}): {e}")
+    try:
+        formatted_time_lost = time_tracker.format_time_human(time_lost) if time_lost > 0 else "0 Segundos"
+        message = f"🚫 **Tiempo Cancelado Automáticamente**\n**{user_name}** ha sido cancelado automáticamente por exceder el límite de pausas\n**Tiempo conservado:** {total_time} (solo horas completas)\n**Tiempo perdido:** {formatted_time_lost}\n**Pausas alcanzadas:** {pause_count}/3\n**Última pausa ejecutada por:** {cancelled_by}"
 
-        if attempt < max_retries - 1:
-            await asyncio.sleep(2 ** attempt)
+        # La cola se encarga de los reintentos con espera
+        queue_user_notification(get_notification_channel_id('cancellations'), message, LANE_MOVEMENT, user_id)
+        print(f"✅ Notificación de cancelación automática encolada para {user_name}")
 
-    print(f"❌ CRÍTICO: No se pudo enviar notificación de cancelación automática para {user_name} después de {max_retries} intentos")
+    except Exception as e:
+        print(f"❌ Error encolando notificación de cancelación automática para {user_name}: {e}")
 
-async def send_cancellation_notification(user_name: str, cancelled_by: str, total_time: str = "", conserved_time: str = "", lost_time: str = ""):
+def send_cancellation_notification(user_name: str, cancelled_by: str, total_time: str = "", conserved_time: str = "", lost_time: str = "", user_id: int = None):
     """Enviar notificación cuando un usuario es cancelado"""
-    channel = bot.get_channel(CANCELLATION_NOTIFICATION_CHANNEL_ID)
-    if channel:
-        try:
-            if conserved_time and lost_time:
-                message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado\n**Tiempo total:** {total_time}\n**Tiempo conservado:** {conserved_time} (horas completas)\n**Tiempo perdido:** {lost_time}\n**Cancelado por:** {cancelled_by}"
-            elif conserved_time:
-                message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado\n**Tiempo conservado:** {conserved_time}\n**Cancelado por:** {cancelled_by}"
-            elif total_time:
-                message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado\n**Tiempo cancelado:** {total_time}\n**Cancelado por:** {cancelled_by}"
-            else:
-                message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado por {cancelled_by}"
-            await channel.send(message)
-            print(f"✅ Notificación de cancelación enviada para {user_name}")
-        except Exception as e:
-            print(f"❌ Error enviando notificación de cancelación: {e}")
+    try:
+        if conserved_time and lost_time:
+            message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado\n**Tiempo total:** {total_time}\n**Tiempo conservado:** {conserved_time} (horas completas)\n**Tiempo perdido:** {lost_time}\n**Cancelado por:** {cancelled_by}"
+        elif conserved_time:
+            message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado\n**Tiempo conservado:** {conserved_time}\n**Cancelado por:** {cancelled_by}"
+        elif total_time:
+            message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado\n**Tiempo cancelado:** {total_time}\n**Cancelado por:** {cancelled_by}"
+        else:
+            message = f"🗑️ El seguimiento de tiempo de **{user_name}** ha sido cancelado por {cancelled_by}"
+        queue_user_notification(get_notification_channel_id('cancellations'), message, LANE_MOVEMENT, user_id)
+        print(f"✅ Notificación de cancelación encolada para {user_name}")
+    except Exception as e:
+        print(f"❌ Error encolando notificación de cancelación: {e}")
 
-async def send_pause_notification(user_name: str, total_time: float, paused_by: str, session_time: str = "", pause_count: int = 0, role_type: str = "normal"):
+def send_pause_notification(user_name: str, total_time: float, paused_by: str, session_time: str = "", pause_count: int = 0, role_type: str = "normal", user_id: int = None):
     """Enviar notificación cuando un usuario es pausado"""
-    max_retries = 3
-
-    for attempt in range(max_retries):
-        try:
-            channel = bot.get_channel(PAUSE_NOTIFICATION_CHANNEL_ID)
-            if not channel:
-                print(f"❌ Canal de pausas no encontrado: {PAUSE_NOTIFICATION_CHANNEL_ID}")
-                return
-
-            formatted_total_time = time_tracker.format_time_human(total_time)
-
-            # Mensaje uniforme para TODOS los usuarios (incluido Gold)
-            if session_time and session_time != "0 Segundos":
-                message = f"⏸️ El tiempo de **{user_name}** ha sido pausado\n**Tiempo de sesión pausado:** {session_time}\n**Tiempo total acumulado:** {formatted_total_time}\n**Pausado por:** {paused_by}\n📊 **{user_name}** lleva {pause_count}/3 pausas"
-            else:
-                message = f"⏸️ El tiempo de **{user_name}** ha sido pausado por {paused_by}\n**Tiempo total acumulado:** {formatted_total_time}\n📊 **{user_name}** lleva {pause_count}/3 pausas"
+    try:
+        formatted_total_time = time_tracker.format_time_human(total_time)
 
-            # Agregar advertencia cuando llegue a 2/3 pausas
-            if pause_count == 2:
-                message += f"\n⚠️ **ADVERTENCIA:** Si se pausa **{user_name}** una vez más, se eliminarán los minutos acumulados y solo se conservarán las horas completas."
+        # Mensaje uniforme para TODOS los usuarios (incluido Gold)
+        if session_time and session_time != "0 Segundos":
+            message = f"⏸️ El tiempo de **{user_name}** ha sido pausado\n**Tiempo de sesión pausado:** {session_time}\n**Tiempo total acumulado:** {formatted_total_time}\n**Pausado por:** {paused_by}\n📊 **{user_name}** lleva {pause_count}/3 pausas"
+        else:
+            message = f"⏸️ El tiempo de **{user_name}** ha sido pausado por {paused_by}\n**Tiempo total acumulado:** {formatted_total_time}\n📊 **{user_name}** lleva {pause_count}/3 pausas"
 
-            await channel.send(message)
-            return
+        # Agregar advertencia cuando llegue a 2/3 pausas
+        if pause_count == 2:
+            message += f"\n⚠️ **ADVERTENCIA:** Si se pausa **{user_name}** una vez más, se eliminarán los minutos acumulados y solo se conservarán las horas completas."
 
-        except asyncio.TimeoutError:
-            print(f"⚠️ Timeout enviando notificación de pausa para {user_name} (intento {attempt + 1}/{max_retries})")
-        except Exception as e:
-            print(f"⚠️ Error enviando notificación de pausa para {user_name} (intento {attempt + 1}): {e}")
+        queue_user_notification(get_notification_channel_id('pauses'), message, LANE_MOVEMENT, user_id)
 
-        if attempt < max_retries - 1:
-            await asyncio.sleep(2 ** attempt)
+    except Exception as e:
+        print(f"⚠️ Error encolando notificación de pausa para {user_name}: {e}")
 
-async def send_unpause_notification(user_name: str, total_time: float, unpaused_by: str, paused_duration: str = ""):
+def send_unpause_notification(user_name: str, total_time: float, unpaused_by: str, paused_duration: str = "", user_id: int = None):
     """Enviar notificación cuando un usuario es despausado"""
     try:
-        channel = bot.get_channel(PAUSE_NOTIFICATION_CHANNEL_ID)
-        if not channel:
-            return
-
         formatted_total_time = time_tracker.format_time_human(total_time)
 
         if paused_duration:
@@ -2676,12 +3777,10 @@ async def send_unpause_notification(user_name: str, total_time: float, unpaused_
         else:
             message = f"⏸️ El tiempo de **{user_name}** ha sido despausado por {unpaused_by}"
 
-        await asyncio.wait_for(channel.send(message), timeout=15.0)
+        queue_user_notification(get_notification_channel_id('pauses'), message, LANE_MOVEMENT, user_id)
 
-    except asyncio.TimeoutError:
-        print(f"⚠️ Timeout enviando notificación de despausa para {user_name}")
     except Exception as e:
-        print(f"⚠️ Error enviando notificación de despausa para {user_name}: {e}")
+        print(f"⚠️ Error encolando notificación de despausa para {user_name}: {e}")
 
 async def check_time_milestone_for_tier_users(user_id: int, user_name: str, member, user_data: dict, role_type: str):
     """Lógica para usuarios de roles por niveles - 2 horas máximas con parada automática en 1h"""
@@ -2707,9 +3806,8 @@ async def check_time_milestone_for_tier_users(user_id: int, user_name: str, memb
         if base_time >= milestone_1h_with_extra and 3600 not in notified_milestones:
             notified_milestones.append(3600)
             user_data['notified_milestones'] = notified_milestones
-            time_tracker.save_data()
 
-            # Enviar notificación de 1 hora
+            # Enviar notificación de 1 hora (guarda el milestone junto con los créditos y el aviso)
             await send_milestone_notification(user_name, member, False, 1, base_time)
 
             # DETENER automáticamente al completar 1 hora (pueden reiniciar para la segunda hora)
@@ -2720,17 +3818,13 @@ async def check_time_milestone_for_tier_users(user_id: int, user_name: str, memb
         if base_time >= milestone_2h_with_extra and 7200 not in notified_milestones:
             notified_milestones.append(7200)
             user_data['notified_milestones'] = notified_milestones
-            time_tracker.save_data()
 
-            # Enviar notificación de 2 horas
+            # Enviar notificación de 2 horas (guarda el milestone junto con los créditos y el aviso)
             await send_milestone_notification(user_name, member, False, 2, base_time)
 
             # Detener y marcar como completado (ya cumplió sus 2 horas máximas)
             time_tracker.stop_tracking(user_id)
-            user_data_refresh = time_tracker.get_user_data(user_id)
-            if user_data_refresh:
-                user_data_refresh['milestone_completed'] = True
-                time_tracker.save_data()
+            time_tracker.mark_milestone_completed(user_id)
 
     except Exception as e:
         print(f"❌ Error en check_time_milestone_for_tier_users para {user_name}: {e}")
@@ -2758,7 +3852,6 @@ async def check_time_milestone_for_gold_users(user_id: int, user_name: str, memb
         if base_time >= milestone_1h_with_extra and 3600 not in notified_milestones:
             notified_milestones.append(3600)
             user_data['notified_milestones'] = notified_milestones
-            time_tracker.save_data()
             await send_milestone_notification(user_name, member, False, 1, base_time)
 
         # Verificar milestone de 2 horas
@@ -2766,15 +3859,11 @@ async def check_time_milestone_for_gold_users(user_id: int, user_name: str, memb
         if base_time >= milestone_2h_with_extra and 7200 not in notified_milestones:
             notified_milestones.append(7200)
             user_data['notified_milestones'] = notified_milestones
-            time_tracker.save_data()
             await send_milestone_notification(user_name, member, False, 2, base_time)
 
             # Detener al completar 2 horas + minutos extra
             time_tracker.stop_tracking(user_id)
-            user_data_refresh = time_tracker.get_user_data(user_id)
-            if user_data_refresh:
-                user_data_refresh['milestone_completed'] = True
-                time_tracker.save_data()
+            time_tracker.mark_milestone_completed(user_id)
 
     except Exception as e:
         print(f"❌ Error en check_time_milestone_for_gold_users para {user_name}: {e}")
@@ -2805,17 +3894,13 @@ async def check_time_milestone_for_normal_users(user_id: int, user_name: str, me
             # Marcar como notificado
             notified_milestones.append(3600)
             user_data['notified_milestones'] = notified_milestones
-            time_tracker.save_data()
 
-            # Enviar notificación (solo cuando alcance el tiempo total requerido)
+            # Enviar notificación (solo cuando alcance el tiempo total requerido; guarda el milestone con el aviso)
             await send_milestone_notification(user_name, member, False, 1, base_time)
 
             # Detener automáticamente al completar 1 hora + minutos extra
             time_tracker.stop_tracking(user_id)
-            user_data_refresh = time_tracker.get_user_data(user_id)
-            if user_data_refresh:
-                user_data_refresh['milestone_completed'] = True
-                time_tracker.save_data()
+            time_tracker.mark_milestone_completed(user_id)
 
     except Exception as e:
         print(f"❌ Error en check_time_milestone_for_normal_users para {user_name}: {e}")
@@ -2834,9 +3919,9 @@ async def check_time_milestone(user_id: int, user_name: str):
         guild = None
         member = None
         try:
-            guild = bot.guilds[0] if bot.guilds else None
+            guild = current_guild()
             if guild:
-                member = guild.get_member(user_id)
+                member = await fetch_guild_member(guild, user_id)
         except Exception as e:
             print(f"⚠️ Error obteniendo miembro del servidor para {user_name}: {e}")
 
@@ -2862,6 +3947,65 @@ async def check_time_milestone(user_id: int, user_name: str):
         import traceback
         traceback.print_exc()
 
+async def check_guild_milestones():
+    """Verificar milestones de los usuarios activos del servidor en curso"""
+    try:
+        # Solo usuarios activos, tomados del índice de estado (sin recorrer todos)
+        active_ids = time_tracker.get_active_user_ids() - time_tracker.get_paused_user_ids()
+        active_users = list(time_tracker.get_users_by_ids(active_ids).items())
+
+        # Límite aumentado pero con mejor control
+        max_active_users = 120
+        active_users = active_users[:max_active_users]
+
+        if not active_users:
+            return
+
+        # Usar semáforo para controlar concurrencia
+        semaphore = asyncio.Semaphore(6)  # Máximo 6 operaciones concurrentes
+
+        async def process_user_milestone(user_id_str, data):
+            async with semaphore:
+                try:
+                    user_id = int(user_id_str)
+                    user_name = data.get('name', f'Usuario {user_id}')
+
+                    await asyncio.wait_for(
+                        check_time_milestone(user_id, user_name),
+                        timeout=20.0
+                    )
+                except asyncio.TimeoutError:
+                    print(f"⚠️ Timeout verificando milestone para {user_id_str}")
+                except Exception as e:
+                    print(f"⚠️ Error verificando milestone para {user_id_str}: {e}")
+
+        # Procesar en lotes controlados
+        batch_size = 15
+        for i in range(0, len(active_users), batch_size):
+            batch = active_users[i:i + batch_size]
+
+            tasks = [
+                process_user_milestone(user_id_str, data)
+                for user_id_str, data in batch
+            ]
+
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*tasks, return_exceptions=True),
+                    timeout=45.0
+                )
+            except asyncio.TimeoutError:
+                print(f"⚠️ Timeout en lote {i//batch_size + 1} de milestones")
+
+            # Pausa entre lotes para no sobrecargar
+            if i + batch_size < len(active_users):
+                await asyncio.sleep(0.3)
+
+    except asyncio.TimeoutError:
+        print("⚠️ Timeout obteniendo usuarios activos")
+    except Exception as e:
+        print(f"⚠️ Error obteniendo usuarios activos: {e}")
+
 async def periodic_milestone_check():
     """Verificar milestones periódicamente para usuarios activos con optimización de recursos"""
     milestone_check_count = 0
@@ -2886,72 +4030,9 @@ async def periodic_milestone_check():
             if current_time - last_check_time < 10:
                 continue
 
-            try:
-                tracked_users = await asyncio.wait_for(
-                    asyncio.to_thread(time_tracker.get_all_tracked_users),
-                    timeout=30.0
-                )
-
-                # Filtrar solo usuarios activos
-                active_users = [
-                    (user_id_str, data) for user_id_str, data in tracked_users.items()
-                    if data.get('is_active', False) and not data.get('is_paused', False)
-                ]
-
-                # Límite aumentado pero con mejor control
-                max_active_users = 120
-                active_users = active_users[:max_active_users]
-
-                if not active_users:
-                    last_check_time = current_time
-                    continue
-
-                # Usar semáforo para controlar concurrencia
-                semaphore = asyncio.Semaphore(6)  # Máximo 6 operaciones concurrentes
-
-                async def process_user_milestone(user_id_str, data):
-                    async with semaphore:
-                        try:
-                            user_id = int(user_id_str)
-                            user_name = data.get('name', f'Usuario {user_id}')
-
-                            await asyncio.wait_for(
-                                check_time_milestone(user_id, user_name),
-                                timeout=20.0
-                            )
-                        except asyncio.TimeoutError:
-                            print(f"⚠️ Timeout verificando milestone para {user_id_str}")
-                        except Exception as e:
-                            print(f"⚠️ Error verificando milestone para {user_id_str}: {e}")
-
-                # Procesar en lotes controlados
-                batch_size = 15
-                for i in range(0, len(active_users), batch_size):
-                    batch = active_users[i:i + batch_size]
-
-                    tasks = [
-                        process_user_milestone(user_id_str, data)
-                        for user_id_str, data in batch
-                    ]
-
-                    try:
-                        await asyncio.wait_for(
-                            asyncio.gather(*tasks, return_exceptions=True),
-                            timeout=45.0
-                        )
-                    except asyncio.TimeoutError:
-                        print(f"⚠️ Timeout en lote {i//batch_size + 1} de milestones")
-
-                    # Pausa entre lotes para no sobrecargar
-                    if i + batch_size < len(active_users):
-                        await asyncio.sleep(0.3)
-
-                last_check_time = current_time
-
-            except asyncio.TimeoutError:
-                print("⚠️ Timeout obteniendo usuarios activos")
-            except Exception as e:
-                print(f"⚠️ Error obteniendo usuarios activos: {e}")
+            # Cada servidor en su propia tarea: uno con muchos activos no retrasa a los demás
+            guild_partitions.spawn_each("milestones", get_partition_guild_ids(), check_guild_milestones)
+            last_check_time = current_time
 
             error_count = 0
 
@@ -2967,153 +4048,136 @@ async def periodic_milestone_check():
                 sleep_time = min(20 * (2 ** error_count), 120)
                 await asyncio.sleep(sleep_time)
 
-async def auto_start_at_1pm():
-    """Verificar y iniciar automáticamente tiempos a las 17:00 Colombia"""
-    while True:
-        try:
-            await asyncio.sleep(30)  # Verificar cada 30 segundos
+async def start_pre_registered_users():
+    """Iniciar los tiempos de los pre-registrados del servidor en curso"""
+    start_hour, start_minute = guild_partitions.current().schedule['start']
+    print(f"🕐 Son las {start_hour}:{start_minute:02d} Colombia - Iniciando tiempos automáticamente...")
 
-            colombia_now = datetime.now(COLOMBIA_TZ)
-            current_hour = colombia_now.hour
-            current_minute = colombia_now.minute
-
-            # Verificar si son exactamente las 17:00 (solo en el minuto exacto)
-            if current_hour == START_TIME_HOUR and current_minute == START_TIME_MINUTE:
-                print(f"🕐 Son las {START_TIME_HOUR}:{START_TIME_MINUTE:02d} Colombia - Iniciando tiempos automáticamente...")
-
-                # Obtener usuarios pre-registrados
-                pre_registered_users = time_tracker.get_pre_registered_users()
-
-                if pre_registered_users:
-                    started_users = []
-
-                    for user_id_str, data in pre_registered_users.items():
-                        user_id = int(user_id_str)
-                        user_name = data.get('name', f'Usuario {user_id}')
-
-                        # Obtener información del admin que hizo el pre-registro
-                        initiator_info = time_tracker.get_pre_register_initiator(user_id)
-
-                        # Iniciar tiempo automáticamente
-                        success = time_tracker.start_tracking_from_pre_register(user_id)
-                        if success:
-                            # Intentar obtener el objeto del miembro para la mención
-                            member = None
-                            try:
-                                if bot.guilds:
-                                    guild = bot.guilds[0]
-                                    member = guild.get_member(user_id)
-                            except Exception as e:
-                                print(f"⚠️ Error obteniendo miembro para notificación: {e}")
-
-                            # Usar mención si es posible, sino usar nombre
-                            if member:
-                                user_reference = member.mention
-                            else:
-                                user_reference = f"**{user_name}**"
-
-                            if initiator_info:
-                                admin_name = initiator_info.get('admin_name', 'Admin desconocido')
-                                started_users.append(f"• {user_reference} - Pre-registrado por: {admin_name}")
-                            else:
-                                started_users.append(f"• {user_reference} - Pre-registrado por: Admin desconocido")
-
-                    if started_users:
-                        # Notificación automática deshabilitada
-                        # await send_auto_start_notification(started_users, colombia_now)
-                        print(f"✅ Iniciados automáticamente {len(started_users)} usuarios a las 17:00 Colombia (sin notificación)")
-
-                # Esperar 70 segundos para evitar múltiples ejecuciones
-                await asyncio.sleep(70)
+    # Obtener usuarios pre-registrados
+    pre_registered_users = time_tracker.get_pre_registered_users()
 
-        except Exception as e:
-            print(f"❌ Error en auto-inicio a las 17:00 Colombia: {e}")
-            await asyncio.sleep(30)
+    if pre_registered_users:
+        started_users = []
+        guild = current_guild()
 
-async def auto_stop_at_2225():
-    """Detener automáticamente todos los tiempos a las 20:01 (8:01 PM) hora Colombia"""
-    while True:
-        try:
-            await asyncio.sleep(30)  # Verificar cada 30 segundos
+        for user_id_str, data in pre_registered_users.items():
+            user_id = int(user_id_str)
+            user_name = data.get('name', f'Usuario {user_id}')
 
-            colombia_now = datetime.now(COLOMBIA_TZ)
-            current_hour = colombia_now.hour
-            current_minute = colombia_now.minute
+            # Obtener información del admin que hizo el pre-registro
+            initiator_info = time_tracker.get_pre_register_initiator(user_id)
 
-            # Verificar si son exactamente las 20:01 (8:01 PM)
-            if current_hour == 20 and current_minute == 1:
-                print(f"🛑 Son las 20:01 Colombia - Deteniendo todos los tiempos automáticamente...")
+            # Iniciar tiempo automáticamente
+            success = time_tracker.start_tracking_from_pre_register(user_id)
+            if success:
+                # Intentar obtener el objeto del miembro para la mención
+                member = None
+                try:
+                    if guild:
+                        member = await fetch_guild_member(guild, user_id)
+                except Exception as e:
+                    print(f"⚠️ Error obteniendo miembro para notificación: {e}")
 
-                # Obtener todos los usuarios con tiempo activo
-                tracked_users = time_tracker.get_all_tracked_users()
-                stopped_count = 0
+                # Usar mención si es posible, sino usar nombre
+                if member:
+                    user_reference = member.mention
+                else:
+                    user_reference = f"**{user_name}**"
 
-                for user_id_str, data in tracked_users.items():
-                    if data.get('is_active', False) or data.get('is_paused', False):
-                        user_id = int(user_id_str)
+                if initiator_info:
+                    admin_name = initiator_info.get('admin_name', 'Admin desconocido')
+                    started_users.append(f"• {user_reference} - Pre-registrado por: {admin_name}")
+                else:
+                    started_users.append(f"• {user_reference} - Pre-registrado por: Admin desconocido")
 
-                        # Detener el tiempo
-                        success = time_tracker.stop_tracking(user_id)
-                        if success:
-                            stopped_count += 1
-                            user_name = data.get('name', f'Usuario {user_id}')
-                            print(f"  ✅ Detenido tiempo de {user_name}")
+        if started_users:
+            # Notificación automática deshabilitada
+            # await send_auto_start_notification(started_users, colombia_now)
+            print(f"✅ Iniciados automáticamente {len(started_users)} usuarios a las {start_hour}:{start_minute:02d} Colombia (sin notificación)")
 
-                if stopped_count > 0:
-                    print(f"✅ Detenidos automáticamente {stopped_count} usuarios a las 20:01 Colombia")
+    # Los que ya esperaban en los canales de voz configurados empiezan ahora
+    sync_voice_presence(guild_partitions.current(), force=True)
 
-                # Esperar 70 segundos para evitar múltiples ejecuciones
-                await asyncio.sleep(70)
+async def stop_running_users():
+    """Detener los tiempos activos o pausados del servidor en curso"""
+    stop_hour, stop_minute = guild_partitions.current().schedule['stop']
+    print(f"🛑 Son las {stop_hour}:{stop_minute:02d} Colombia - Deteniendo todos los tiempos automáticamente...")
 
-        except Exception as e:
-            print(f"❌ Error en detención automática a las 20:01 Colombia: {e}")
-            await asyncio.sleep(30)
+    # Obtener solo los usuarios con tiempo activo o pausado
+    running_ids = time_tracker.get_active_user_ids() | time_tracker.get_paused_user_ids()
+    running_users = time_tracker.get_users_by_ids(running_ids)
+    stopped_count = 0
 
-async def auto_reset_daily_limits():
-    """Resetear límites diarios a las 00:00 Colombia conservando créditos"""
-    while True:
-        try:
-            await asyncio.sleep(30)  # Verificar cada 30 segundos
+    for user_id_str, data in running_users.items():
+        user_id = int(user_id_str)
 
-            colombia_now = datetime.now(COLOMBIA_TZ)
-            current_hour = colombia_now.hour
-            current_minute = colombia_now.minute
+        # Detener el tiempo
+        success = time_tracker.stop_tracking(user_id)
+        if success:
+            stopped_count += 1
+            user_name = data.get('name', f'Usuario {user_id}')
+            print(f"  ✅ Detenido tiempo de {user_name}")
 
-            # Verificar si son exactamente las 00:00 (medianoche)
-            if current_hour == 0 and current_minute == 0:
-                print(f"🔄 Medianoche Colombia - Reseteando límites diarios...")
+    if stopped_count > 0:
+        print(f"✅ Detenidos automáticamente {stopped_count} usuarios a las {stop_hour}:{stop_minute:02d} Colombia")
 
-                tracked_users = time_tracker.get_all_tracked_users()
-                reset_count = 0
+async def reset_completed_daily_limits():
+    """Resetear los límites diarios del servidor en curso conservando créditos"""
+    print(f"🔄 Medianoche Colombia - Reseteando límites diarios...")
 
-                for user_id_str, data in tracked_users.items():
-                    # Solo resetear usuarios que completaron su milestone
-                    if data.get('milestone_completed', False):
-                        user_id = int(user_id_str)
-                        user_name = data.get('name', f'Usuario {user_id}')
+    # Solo resetear usuarios que completaron su milestone
+    completed_users = time_tracker.get_users_by_ids(time_tracker.get_completed_user_ids())
+    reset_count = 0
 
-                        # Conservar créditos confirmados
-                        confirmed_credits = data.get('confirmed_credits', 0)
+    for user_id_str, data in completed_users.items():
+        user_id = int(user_id_str)
+        user_name = data.get('name', f'Usuario {user_id}')
 
-                        # Resetear tiempo pero conservar créditos
-                        success = time_tracker.reset_daily_time_keep_credits(user_id, confirmed_credits)
-                        if success:
-                            reset_count += 1
-                            print(f"  ✅ Reseteado límite diario de {user_name} (créditos conservados: {confirmed_credits})")
+        # Conservar créditos confirmados
+        confirmed_credits = data.get('confirmed_credits', 0)
 
-                if reset_count > 0:
-                    print(f"✅ Reseteados límites de {reset_count} usuarios a las 00:00 Colombia")
+        # Resetear tiempo pero conservar créditos
+        success = time_tracker.reset_daily_time_keep_credits(user_id, confirmed_credits)
+        if success:
+            reset_count += 1
+            print(f"  ✅ Reseteado límite diario de {user_name} (créditos conservados: {confirmed_credits})")
 
-                # Esperar 70 segundos para evitar múltiples ejecuciones
-                await asyncio.sleep(70)
+    if reset_count > 0:
+        print(f"✅ Reseteados límites de {reset_count} usuarios a las 00:00 Colombia")
 
+async def run_scheduled_task(name: str, work):
+    """Cada 30 segundos, lanzar work() en los servidores que llegaron a su hora programada
+
+    El horario es el de cada servidor (config.json -> schedule) y cada uno corre en su propia tarea.
+    """
+    while True:
+        try:
+            await asyncio.sleep(30)  # Verificar cada 30 segundos
+            due_guild_ids = [
+                state.guild_id for state in guild_partitions.all()
+                if state.guild_id in get_partition_guild_ids() and state.claim_scheduled_run(name)
+            ]
+            if due_guild_ids:
+                guild_partitions.spawn_each(name, due_guild_ids, work)
         except Exception as e:
-            print(f"❌ Error en reseteo automático a las 00:00 Colombia: {e}")
+            print(f"❌ Error en tarea programada '{name}': {e}")
             await asyncio.sleep(30)
 
+async def auto_start_at_1pm():
+    """Verificar e iniciar automáticamente los pre-registrados (17:00 Colombia por defecto)"""
+    await run_scheduled_task('start', start_pre_registered_users)
+
+async def auto_stop_at_2225():
+    """Detener automáticamente todos los tiempos (20:01 Colombia por defecto)"""
+    await run_scheduled_task('stop', stop_running_users)
+
+async def auto_reset_daily_limits():
+    """Resetear límites diarios conservando créditos (00:00 Colombia por defecto)"""
+    await run_scheduled_task('reset', reset_completed_daily_limits)
+
 async def start_periodic_checks():
     """Iniciar las verificaciones periódicas"""
-    global milestone_check_task, auto_start_task, auto_stop_task, auto_reset_task
+    global milestone_check_task, auto_start_task, auto_stop_task, auto_reset_task, dashboard_task
 
     if milestone_check_task is None:
         milestone_check_task = bot.loop.create_task(periodic_milestone_check())
@@ -3121,21 +4185,141 @@ async def start_periodic_checks():
 
     if auto_start_task is None:
         auto_start_task = bot.loop.create_task(auto_start_at_1pm())
-        print('✅ Task de inicio automático a las 17:00 Colombia iniciado')
+        print('✅ Task de inicio automático iniciado (17:00 Colombia o el horario de cada servidor)')
 
     if 'auto_stop_task' not in globals() or auto_stop_task is None:
         auto_stop_task = bot.loop.create_task(auto_stop_at_2225())
-        print('✅ Task de detención automática a las 20:01 Colombia iniciado')
+        print('✅ Task de detención automática iniciado (20:01 Colombia o el horario de cada servidor)')
 
     if 'auto_reset_task' not in globals() or auto_reset_task is None:
         auto_reset_task = bot.loop.create_task(auto_reset_daily_limits())
-        print('✅ Task de reseteo automático a las 00:00 Colombia iniciado')
+        print('✅ Task de reseteo automático iniciado (00:00 Colombia o el horario de cada servidor)')
+
+    if dashboard_task is None:
+        dashboard_task = bot.loop.create_task(live_dashboard_loop())
+        print(f'✅ Task de paneles en vivo iniciado (cada {DASHBOARD_INTERVAL} s)')
 
 @bot.event
 async def on_connect():
     """Evento que se ejecuta cuando el bot se conecta"""
     await start_periodic_checks()
 
+@bot.event
+async def on_shard_ready(shard_id: int):
+    guild_count = len([guild for guild in bot.guilds if guild.shard_id == shard_id])
+    print(f"🧩 Shard {shard_id} listo con {guild_count} servidor(es)")
+
+@bot.event
+async def on_shard_disconnect(shard_id: int):
+    print(f"⚠️ Shard {shard_id} desconectado (sus servidores esperan a que vuelva; los demás siguen)")
+
+@bot.event
+async def on_shard_resumed(shard_id: int):
+    print(f"🔄 Shard {shard_id} reanudado")
+
+# =================== SEGUIMIENTO POR VOZ ===================
+
+def is_tracked_voice_channel(state, channel) -> bool:
+    return channel is not None and channel.id in state.voice_channel_ids
+
+def can_auto_start(member, user_data) -> bool:
+    """Mismas reglas que /iniciar_tiempo: rol Verificado y sin haber completado el máximo del día"""
+    if not any(role.id == VERIFIED_ROLE_ID for role in member.roles):
+        return False
+    if not user_data:
+        return True
+    if user_data.get('milestone_completed', False):
+        return False
+    max_hours = 1.0 if get_user_role_type(member) == "normal" else 2.0
+    return time_tracker.get_total_time(member.id) / 3600 < max_hours
+
+@bot.event
+async def on_voice_state_update(member, before, after):
+    """Anotar entradas y salidas de los canales de voz configurados (se aplican por lotes)"""
+    if member.bot:
+        return
+    # Quien no estaba en caché llega con sus roles en el evento: guardarlo si está registrado o tiene tier
+    pin_member(member)
+    state = guild_partitions.get(member.guild.id)
+    if not state.auto_voice_tracking:
+        return
+    was_in_channel = is_tracked_voice_channel(state, before.channel)
+    is_in_channel = is_tracked_voice_channel(state, after.channel)
+    # Cambiar de canal dentro de los configurados, silenciarse, etc. no cambia nada
+    if was_in_channel == is_in_channel:
+        return
+    with guild_partitions.use(member.guild.id):
+        state.voice_presence.record(member.id, is_in_channel)
+
+def sync_voice_presence(state, force: bool = False) -> int:
+    """Anotar como presentes a los que ya están en los canales de voz configurados
+
+    Al conectar (no hubo eventos mientras el bot estaba caído) y, con force, a la hora de inicio
+    para los que entraron antes y esperaban. Las sesiones iniciadas por voz de quienes ya no están
+    en los canales (salieron con el bot caído) se anotan como salidas. Devuelve cuántos usuarios
+    se anotaron como presentes.
+    """
+    guild = state.guild()
+    if guild is None or not state.auto_voice_tracking:
+        return 0
+    # Por los estados de voz y no por channel.members: en modo tracked los miembros fuera de
+    # caché no aparecen en channel.members (apply_voice_changes los pide al aplicar)
+    user_ids = [
+        user_id
+        for channel_id in state.voice_channel_ids
+        for user_id in getattr(guild.get_channel(channel_id), 'voice_states', {})
+        if user_id != bot.user.id and not getattr(guild.get_member(user_id), 'bot', False)
+    ]
+    present = set(user_ids)
+    tracker = state.time_tracker
+    left_ids = [
+        int(user_id_str) for user_id_str in tracker.state_index['is_active']
+        if int(user_id_str) not in present and tracker.data[user_id_str].get('start_source') == "voice"
+    ]
+    with guild_partitions.use(state.guild_id):
+        state.voice_presence.record_many(user_ids, True, force=force)
+        # force: la presencia aplicada por defecto ya es "fuera del canal"
+        state.voice_presence.record_many(left_ids, False, force=True)
+    if left_ids:
+        print(f"🎙️ {len(left_ids)} sesiones iniciadas por voz sin el usuario en los canales del servidor {state.guild_id}")
+    return len(user_ids)
+
+async def apply_voice_changes(state, changes: dict) -> None:
+    """Aplicar un lote de entradas (True) y salidas (False) de los canales de voz de un servidor
+
+    Entrar inicia el tiempo entre la hora de inicio y la de corte, o reanuda una pausa por voz
+    antes de la hora de detención; salir pausa sin contar para el límite de 3 pausas. Las pausas
+    puestas por un admin no se reanudan al entrar. Todo el lote se guarda en una sola escritura
+    y no se envían avisos al canal de pausas (serían uno por cada desconexión).
+    """
+    tracker = state.time_tracker
+    members = await resolve_guild_members(state.guild(), list(changes))
+    local_now = state.now()
+    current_time = (local_now.hour, local_now.minute)
+    can_start = state.schedule['start'] <= current_time < state.schedule['cutoff']
+    can_resume = current_time < state.schedule['stop']
+
+    started = resumed = paused = 0
+    with tracker.batch_save():
+        for user_id, in_channel in changes.items():
+            member = members.get(user_id)
+            user_data = tracker.get_user_data(user_id)
+            if in_channel:
+                if user_data and user_data.get('is_paused', False):
+                    if can_resume and user_data.get('pause_source') == "voice" and tracker.resume_tracking(user_id, source="voice"):
+                        resumed += 1
+                elif member and not member.bot and can_start and can_auto_start(member, user_data):
+                    if tracker.start_tracking(user_id, member.display_name, source="voice"):
+                        started += 1
+            elif user_data and user_data.get('is_active', False):
+                role_type = get_user_role_type(member) if member else state.lookup_role(user_id)
+                if tracker.pause_tracking(user_id, user_role_type=role_type, source="voice"):
+                    paused += 1
+
+    if started or resumed or paused:
+        print(f"🎙️ Voz en {state.guild_id}: {started} iniciados, {resumed} reanudados, {paused} pausados "
+              f"({len(changes)} cambios en un lote)")
+
 # =================== MANEJO DE ERRORES ===================
 
 @bot.tree.error
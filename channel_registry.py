@@ -0,0 +1,85 @@
+import time
+from typing import Dict, Any, Callable, Iterable, Optional
+
+# Códigos HTTP que no se arreglan reintentando (canal borrado o sin permisos)
+PERMANENT_STATUSES = (403, 404)
+
+
+class ChannelRegistry:
+    """Canales de notificación resueltos una vez y un cortacircuitos por canal
+
+    Los canales se validan al conectar y al recibir eventos de canales; los envíos leen
+    la caché en lugar de buscar el canal cada vez. Un canal que falla varias veces seguidas
+    (o una sola vez si el fallo es permanente: no existe o no hay permisos) queda abierto
+    durante un tiempo de espera y no se intenta hasta que pase.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.channels: Dict[int, Any] = {}
+        # channel_id -> motivo por el que el canal no es utilizable
+        self.problems: Dict[int, str] = {}
+        # channel_id -> {'failures', 'open_until', 'reason'}
+        self.breakers: Dict[int, Dict[str, Any]] = {}
+        self.skipped_attempts = 0
+
+    def resolve(self, channel_ids: Iterable[int], get_channel: Callable[[int], Any],
+                check_channel: Callable[[Any], Optional[str]]) -> Dict[int, Optional[str]]:
+        """Resolver y validar los canales; devuelve channel_id -> problema (None si está bien)"""
+        results = {}
+        for channel_id in channel_ids:
+            channel = get_channel(channel_id)
+            problem = "no encontrado" if channel is None else check_channel(channel)
+            if problem is None:
+                self.channels[channel_id] = channel
+                self.problems.pop(channel_id, None)
+                self.breakers.pop(channel_id, None)
+            else:
+                self.channels.pop(channel_id, None)
+                self.problems[channel_id] = problem
+                self._open(channel_id, problem)
+            results[channel_id] = problem
+        return results
+
+    def get(self, channel_id: int) -> Optional[Any]:
+        """Canal cacheado (None si no se pudo resolver)"""
+        return self.channels.get(channel_id)
+
+    def _open(self, channel_id: int, reason: str) -> None:
+        breaker = self.breakers.setdefault(channel_id, {'failures': 0, 'open_until': 0.0, 'reason': None})
+        breaker['open_until'] = time.time() + self.cooldown
+        breaker['reason'] = reason
+
+    def retry_after(self, channel_id: int) -> float:
+        """Segundos que faltan para poder volver a intentar el canal (0 si está cerrado)"""
+        breaker = self.breakers.get(channel_id)
+        if breaker is None:
+            return 0.0
+        remaining = breaker['open_until'] - time.time()
+        if remaining > 0:
+            self.skipped_attempts += 1
+            return remaining
+        return 0.0
+
+    def record_success(self, channel_id: int) -> None:
+        self.breakers.pop(channel_id, None)
+
+    def record_failure(self, channel_id: int, error: Exception) -> None:
+        """Contar un fallo y abrir el circuito si es permanente o se repite demasiado"""
+        breaker = self.breakers.setdefault(channel_id, {'failures': 0, 'open_until': 0.0, 'reason': None})
+        breaker['failures'] += 1
+        permanent = isinstance(error, LookupError) or getattr(error, 'status', None) in PERMANENT_STATUSES
+        if permanent or breaker['failures'] >= self.failure_threshold:
+            self._open(channel_id, str(error) or type(error).__name__)
+            print(f"🔌 Canal {channel_id} en espera {self.cooldown:g}s tras {breaker['failures']} fallo(s): {breaker['reason']}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Canales resueltos, con problemas y con el circuito abierto"""
+        now = time.time()
+        return {
+            'resolved': len(self.channels),
+            'problems': dict(self.problems),
+            'open': [channel_id for channel_id, breaker in self.breakers.items() if breaker['open_until'] > now],
+            'skipped_attempts': self.skipped_attempts
+        }
@@ -0,0 +1,49 @@
+import hashlib
+import json
+import os
+from typing import Dict, Any, Optional
+
+
+def tree_fingerprint(tree, guild: Optional[Any] = None) -> str:
+    """Huella de las definiciones de comandos de un ámbito (global o un servidor)"""
+    definitions = []
+    for command in tree.get_commands(guild=guild):
+        try:
+            definitions.append(command.to_dict(tree))
+        except TypeError:
+            # discord.py anteriores a 2.4: to_dict() sin argumentos
+            definitions.append(command.to_dict())
+    definitions.sort(key=lambda definition: (definition.get('type', 1), definition['name']))
+    content = json.dumps(definitions, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class CommandSyncState:
+    """Última huella sincronizada por ámbito, guardada en disco entre reinicios"""
+
+    def __init__(self, state_file: str = "command_sync_state.json"):
+        self.state_file = state_file
+        self.fingerprints: Dict[str, str] = self.load()
+
+    def load(self) -> Dict[str, str]:
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error cargando estado de sincronización de comandos: {e}")
+        return {}
+
+    def save(self) -> None:
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(self.fingerprints, f, indent=2)
+        except Exception as e:
+            print(f"Error guardando estado de sincronización de comandos: {e}")
+
+    def needs_sync(self, scope: str, fingerprint: str) -> bool:
+        return self.fingerprints.get(scope) != fingerprint
+
+    def mark_synced(self, scope: str, fingerprint: str) -> None:
+        self.fingerprints[scope] = fingerprint
+        self.save()
@@ -0,0 +1,98 @@
+from typing import Dict, Any, List, Sequence, Union
+
+Number = Union[int, float]
+
+# Tiers que cobran por hora completa según credits_per_hour de la configuración
+PER_HOUR_TIERS = ["altos", "imperiales", "nobleza", "monarquia", "supremos"]
+
+# Horas precalculadas por tier; por encima se aplica la regla directamente
+TABLE_HOURS = 168
+
+
+def _medios_credits(total_hours: int) -> Number:
+    if total_hours >= 2:
+        return 10  # 2 horas = 10 créditos
+    elif total_hours >= 1:
+        return 5   # 1 hora = 5 créditos
+    return 0
+
+
+def _credits_per_hour(tier_name: str, tier_config: Any) -> Number:
+    """credits_per_hour de un tier; si falta o no es un número cuenta como 0 (como antes)"""
+    value = tier_config.get('credits_per_hour') if isinstance(tier_config, dict) else None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        print(f"⚠️ credits_per_hour inválido para {tier_name}: {value!r}, se usa 0")
+        return 0
+
+
+def _per_hour_credits(total_hours: int, credits_per_hour: Number) -> Number:
+    credits = total_hours * credits_per_hour
+
+    # Entero si el redondeo está a menos de 0.01, si no con 2 decimales
+    rounded_credits = round(credits)
+    if rounded_credits == credits or abs(credits - rounded_credits) < 0.01:
+        return int(rounded_credits)
+    return round(credits, 2)
+
+
+def _gold_credits(total_hours: int) -> Number:
+    return total_hours * 6
+
+
+def _recluta_credits(total_hours: int) -> Number:
+    return 4 if total_hours >= 1 else 0
+
+
+class CreditEngine:
+    """Reglas de créditos compiladas en tablas por tier (horas completas -> créditos)"""
+
+    def __init__(self, role_tiers: Dict[str, Any]):
+        self.rules = {
+            "medios": _medios_credits,
+            "gold": _gold_credits,
+            "normal": _recluta_credits
+        }
+        for tier_name in PER_HOUR_TIERS:
+            credits_per_hour = _credits_per_hour(tier_name, role_tiers.get(tier_name))
+            self.rules[tier_name] = lambda hours, rate=credits_per_hour: _per_hour_credits(hours, rate)
+
+        self.tables: Dict[str, List[Number]] = {
+            tier_name: [rule(hours) for hours in range(TABLE_HOURS + 1)]
+            for tier_name, rule in self.rules.items()
+        }
+
+    def credits_for_hours(self, total_hours: int, role_type: str) -> Number:
+        """Créditos para un número de horas completas (tiers desconocidos cobran como recluta)"""
+        table = self.tables.get(role_type)
+        if table is None:
+            role_type = "normal"
+            table = self.tables["normal"]
+        if total_hours <= TABLE_HOURS:
+            return table[total_hours]
+        return self.rules[role_type](total_hours)
+
+    def credits(self, total_seconds: Number, role_type: str = "normal") -> Number:
+        """Créditos por el tiempo base (solo horas completas)"""
+        if not isinstance(total_seconds, (int, float)) or total_seconds < 0:
+            return 0
+        return self.credits_for_hours(int(total_seconds // 3600), role_type)
+
+    def bulk_credits(self, seconds: Sequence[Number], role_types: Sequence[str]) -> List[Number]:
+        """Créditos de muchos usuarios en una sola pasada (mismos resultados que credits)"""
+        tables = self.tables
+        recluta_table = tables["normal"]
+        results = []
+        for total_seconds, role_type in zip(seconds, role_types):
+            if not isinstance(total_seconds, (int, float)) or total_seconds < 0:
+                results.append(0)
+                continue
+            total_hours = int(total_seconds // 3600)
+            if total_hours <= TABLE_HOURS:
+                results.append(tables.get(role_type, recluta_table)[total_hours])
+            else:
+                results.append(self.credits_for_hours(total_hours, role_type))
+        return results
@@ -0,0 +1,136 @@
+import bisect
+import json
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable
+
+# Tipos de movimiento de créditos
+KIND_MILESTONE = "milestone"
+KIND_GRANT = "grant"
+KIND_REMOVAL = "removal"
+KIND_RESET = "reset"
+# Usuario eliminado: su saldo pasa a 0
+KIND_DELETE = "delete"
+# Ajuste al cargar cuando el saldo guardado no coincide con el último del ledger (p. ej. tras un corte)
+KIND_RECONCILE = "reconcile"
+
+# Movimientos que cuentan como créditos ganados o ajustados (los reseteos solo arrastran saldo)
+EARNING_KINDS = (KIND_MILESTONE, KIND_GRANT, KIND_REMOVAL)
+
+
+class CreditLedger:
+    """Registro append-only (JSONL) de movimientos de créditos, indexado por fecha y por usuario
+
+    El saldo vigente sigue guardándose en el registro del usuario (confirmed_credits);
+    el ledger conserva el historial y permite totales por periodo con búsquedas binarias.
+    """
+
+    def __init__(self, ledger_file: str = "credit_ledger.jsonl"):
+        self.ledger_file = ledger_file
+        # Columnas paralelas en orden de registro (fechas no decrecientes, en epoch)
+        self.times: List[float] = []
+        self.user_ids: List[str] = []
+        self.kinds: List[str] = []
+        self.deltas: List[float] = []
+        self.balances: List[float] = []
+        # user_id -> posiciones de sus movimientos y sus fechas (ambas crecientes)
+        self.user_positions: Dict[str, List[int]] = {}
+        self.user_times: Dict[str, List[float]] = {}
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def _index(self, moment: float, user_id_str: str, kind: str, delta: float, balance: float) -> None:
+        self.user_positions.setdefault(user_id_str, []).append(len(self.times))
+        self.user_times.setdefault(user_id_str, []).append(moment)
+        self.times.append(moment)
+        self.user_ids.append(user_id_str)
+        self.kinds.append(kind)
+        self.deltas.append(delta)
+        self.balances.append(balance)
+
+    def load(self) -> None:
+        """Cargar el ledger existente"""
+        if not os.path.exists(self.ledger_file):
+            return
+        try:
+            with open(self.ledger_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    moment = datetime.fromisoformat(event['ts']).timestamp()
+                    if self.times and moment < self.times[-1]:
+                        moment = self.times[-1]
+                    self._index(moment, event['user_id'], event['kind'], event['delta'], event['balance'])
+        except Exception as e:
+            print(f"Error cargando ledger de créditos: {e}")
+
+    def append(self, user_id_str: str, kind: str, delta: float, balance: float,
+               when: Optional[datetime] = None) -> None:
+        """Registrar un movimiento (se escribe al final del archivo, nunca se reescribe)"""
+        when = when or datetime.now()
+        moment = when.timestamp()
+        # Mantener el orden aunque el reloj retroceda
+        if self.times and moment < self.times[-1]:
+            moment = self.times[-1]
+
+        event = {
+            'ts': when.isoformat(timespec='microseconds'),
+            'user_id': user_id_str,
+            'kind': kind,
+            'delta': delta,
+            'balance': balance
+        }
+        try:
+            with open(self.ledger_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(event, ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"Error guardando movimiento de créditos: {e}")
+
+        self._index(moment, user_id_str, kind, delta, balance)
+
+    def last_balance(self, user_id_str: str) -> Optional[float]:
+        """Saldo tras el último movimiento de un usuario (None si no tiene ninguno)"""
+        positions = self.user_positions.get(user_id_str)
+        return self.balances[positions[-1]] if positions else None
+
+    def _range(self, start: datetime, end: datetime) -> range:
+        low = bisect.bisect_left(self.times, start.timestamp())
+        high = bisect.bisect_left(self.times, end.timestamp())
+        return range(low, high)
+
+    def total_between(self, start: datetime, end: datetime, user_id_str: Optional[str] = None,
+                      kinds: Iterable[str] = EARNING_KINDS) -> float:
+        """Suma de movimientos en [start, end), de un usuario o de todos"""
+        kinds = set(kinds)
+        if user_id_str is None:
+            positions: Iterable[int] = self._range(start, end)
+        else:
+            user_positions = self.user_positions.get(user_id_str, [])
+            user_times = self.user_times.get(user_id_str, [])
+            low = bisect.bisect_left(user_times, start.timestamp())
+            high = bisect.bisect_left(user_times, end.timestamp())
+            positions = user_positions[low:high]
+
+        total = 0
+        for pos in positions:
+            if self.kinds[pos] in kinds:
+                total += self.deltas[pos]
+        return round(total, 2)
+
+    def events_for_user(self, user_id_str: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Últimos movimientos de un usuario, del más reciente al más antiguo"""
+        positions = self.user_positions.get(user_id_str, [])
+        if limit is not None:
+            positions = positions[-limit:]
+        return [
+            {
+                'ts': datetime.fromtimestamp(self.times[pos]),
+                'kind': self.kinds[pos],
+                'delta': self.deltas[pos],
+                'balance': self.balances[pos]
+            }
+            for pos in reversed(positions)
+        ]
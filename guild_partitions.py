@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import copy
+from contextlib import contextmanager
+from typing import Dict, Any, Awaitable, Callable, Iterable, Iterator, List, Optional, Tuple
+
+# Servidor al que pertenece el trabajo en curso (interacción, evento o tarea de fondo).
+# Cada interacción y cada tarea de asyncio tiene su propia copia, así que fijarlo no afecta a otras.
+current_guild_id: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar('current_guild_id', default=None)
+
+
+def merge_config(base: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[str, Any]:
+    """Copia de base con overrides aplicados encima (los diccionarios anidados se combinan)"""
+    merged = copy.deepcopy(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+class GuildPartitions:
+    """Estado separado por servidor (datos, índices y configuración)
+
+    El servidor principal conserva los archivos de siempre; cada servidor adicional tiene
+    los suyos. El estado del servidor en curso se elige con current_guild_id, que se fija
+    al recibir una interacción o un evento y al lanzar las tareas de fondo de cada servidor.
+    Sin servidor (p. ej. antes de conectar) se usa el principal.
+    """
+
+    def __init__(self, factory: Callable[[Optional[int], bool], Any], primary_guild_id: Optional[int] = None):
+        # factory(guild_id, es_principal) -> estado del servidor
+        self.factory = factory
+        self.primary_guild_id = primary_guild_id
+        self.primary_state = None
+        self.states: Dict[int, Any] = {}
+        # (nombre, guild_id) -> tarea de fondo en curso de ese servidor
+        self.tasks: Dict[Tuple[str, Optional[int]], asyncio.Task] = {}
+        self.skipped_runs = 0
+
+    def primary(self) -> Any:
+        if self.primary_state is None:
+            self.primary_state = self.factory(self.primary_guild_id, True)
+            if self.primary_guild_id is not None:
+                self.states[self.primary_guild_id] = self.primary_state
+        return self.primary_state
+
+    def bind_primary(self, guild_id: int) -> None:
+        """Fijar el ID del servidor principal si config.json no lo indica"""
+        if self.primary_guild_id is not None:
+            return
+        self.primary_guild_id = guild_id
+        state = self.primary()
+        state.guild_id = guild_id
+        self.states[guild_id] = state
+
+    def get(self, guild_id: Optional[int]) -> Any:
+        """Estado de un servidor (se crea la primera vez que se pide)"""
+        if guild_id is None or guild_id == self.primary_guild_id:
+            return self.primary()
+        state = self.states.get(guild_id)
+        if state is None:
+            state = self.factory(guild_id, False)
+            self.states[guild_id] = state
+        return state
+
+    def current(self) -> Any:
+        return self.get(current_guild_id.get())
+
+    def all(self) -> List[Any]:
+        """Estados creados (el principal primero)"""
+        others = [state for state in self.states.values() if state is not self.primary_state]
+        return [self.primary()] + others
+
+    def enter(self, guild_id: Optional[int]) -> None:
+        """Fijar el servidor para el resto de la tarea actual (una interacción)"""
+        current_guild_id.set(guild_id)
+
+    @contextmanager
+    def use(self, guild_id: Optional[int]) -> Iterator[Any]:
+        """Fijar el servidor dentro del bloque; las tareas creadas dentro lo heredan"""
+        token = current_guild_id.set(guild_id)
+        try:
+            yield self.get(guild_id)
+        finally:
+            current_guild_id.reset(token)
+
+    def spawn_each(self, name: str, guild_ids: Iterable[Optional[int]],
+                   work: Callable[[], Awaitable[Any]]) -> int:
+        """Lanzar work() en una tarea por servidor, cada una con su servidor fijado
+
+        Un servidor cuya ejecución anterior aún no terminó se salta en este ciclo,
+        así uno con mucha carga no retrasa a los demás. Devuelve las tareas lanzadas.
+        """
+        started = 0
+        for guild_id in guild_ids:
+            key = (name, guild_id)
+            previous = self.tasks.get(key)
+            if previous is not None and not previous.done():
+                self.skipped_runs += 1
+                continue
+            with self.use(guild_id):
+                self.tasks[key] = asyncio.get_running_loop().create_task(self._run(name, guild_id, work))
+            started += 1
+        return started
+
+    async def _run(self, name: str, guild_id: Optional[int], work: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            await work()
+        except Exception as e:
+            print(f"❌ Error en {name} del servidor {guild_id}: {e}")
+
+    def running_tasks(self) -> List[Tuple[str, Optional[int]]]:
+        return [key for key, task in self.tasks.items() if not task.done()]
+
+
+class PartitionProxy:
+    """Acceso al atributo de un estado por servidor como si fuera un objeto global
+
+    time_tracker.get_user_data(...) usa el tracker del servidor en curso.
+    """
+
+    def __init__(self, partitions: GuildPartitions, attribute: str):
+        object.__setattr__(self, '_partitions', partitions)
+        object.__setattr__(self, '_attribute', attribute)
+
+    def _target(self) -> Any:
+        return getattr(self._partitions.current(), self._attribute)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._target(), name, value)
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._target()
+
+    def __getitem__(self, key: Any) -> Any:
+        return self._target()[key]
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __len__(self) -> int:
+        return len(self._target())
+
+    def __repr__(self) -> str:
+        return f"<{self._attribute} del servidor {current_guild_id.get()}>"
@@ -0,0 +1,65 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Any, Awaitable, Callable, Deque, List, Optional
+
+
+class JobRunner:
+    """Trabajos largos de administración en segundo plano, uno en curso por clave
+
+    El comando responde (defer) de inmediato y el trabajo sigue en una tarea aparte;
+    si ya hay uno con la misma clave, el nuevo se rechaza en lugar de ejecutarse dos veces.
+    """
+
+    def __init__(self, history_size: int = 20):
+        # clave -> {'task', 'label', 'started_at', 'requested_by'}
+        self.running: Dict[str, Dict[str, Any]] = {}
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.rejected = 0
+
+    def is_running(self, key: str) -> bool:
+        return key in self.running
+
+    def start(self, key: str, label: str, job: Callable[[], Awaitable[Any]],
+              requested_by: Optional[str] = None) -> Optional[asyncio.Task]:
+        """Lanzar el trabajo si no hay otro con la misma clave; devuelve None si se rechazó"""
+        if key in self.running:
+            self.rejected += 1
+            return None
+
+        task = asyncio.get_running_loop().create_task(self._run(key, job))
+        self.running[key] = {
+            'task': task,
+            'label': label,
+            'started_at': time.time(),
+            'requested_by': requested_by
+        }
+        return task
+
+    async def _run(self, key: str, job: Callable[[], Awaitable[Any]]) -> None:
+        status = "ok"
+        try:
+            await job()
+        except Exception as e:
+            status = f"error: {e}"
+            print(f"❌ Error en trabajo en segundo plano '{key}': {e}")
+        finally:
+            info = self.running.pop(key, {})
+            started_at = info.get('started_at', time.time())
+            self.history.append({
+                'key': key,
+                'label': info.get('label', key),
+                'requested_by': info.get('requested_by'),
+                'status': status,
+                'duration': time.time() - started_at,
+                'finished_at': time.time()
+            })
+
+    def get_running(self) -> List[Dict[str, Any]]:
+        """Trabajos en curso con sus segundos transcurridos"""
+        now = time.time()
+        return [
+            {'key': key, 'label': info['label'], 'elapsed': now - info['started_at'],
+             'requested_by': info['requested_by']}
+            for key, info in self.running.items()
+        ]
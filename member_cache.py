@@ -0,0 +1,203 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple
+
+# Modos de caché de miembros (config.json -> member_cache.mode)
+MODE_FULL = "full"        # discord.py guarda todos los miembros del servidor (comportamiento clásico)
+MODE_TRACKED = "tracked"  # solo los usuarios registrados en el tracker; el resto bajo demanda
+MEMBER_CACHE_MODES = (MODE_FULL, MODE_TRACKED)
+
+
+def current_rss_mb() -> Optional[float]:
+    """Memoria residente del proceso en MB (None si no se puede leer)"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # Pico de memoria residente (KB en Linux)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    except Exception:
+        return None
+
+
+class MemberLRU:
+    """Miembros obtenidos bajo demanda, con tamaño máximo y caducidad
+
+    Los miembros que no están en la caché de discord.py no reciben eventos de actualización,
+    así que cada entrada caduca a los ttl segundos y se vuelve a pedir si hace falta.
+    """
+
+    def __init__(self, max_size: int = 2000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        # (guild_id, user_id) -> (momento en que se guardó, miembro)
+        self.entries: "OrderedDict[Tuple[int, int], Tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, guild_id: int, user_id: int) -> Optional[Any]:
+        key = (guild_id, user_id)
+        entry = self.entries.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, member) -> None:
+        key = (member.guild.id, member.id)
+        self.entries[key] = (time.monotonic(), member)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def discard(self, guild_id: int, user_id: int) -> None:
+        self.entries.pop((guild_id, user_id), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0
+        }
+
+
+class MemberResolver:
+    """Resolución por lotes de miembros que no están en caché
+
+    Junta los IDs que faltan y los pide al gateway de 100 en 100 (query_members por user_ids),
+    sin una llamada REST por usuario. Los usuarios registrados quedan en la caché de discord.py
+    (para recibir sus eventos); el resto va a la LRU. Los IDs que el servidor no devuelve
+    (ya no son miembros) se recuerdan un tiempo para no volver a pedirlos.
+    """
+
+    BATCH_SIZE = 100
+
+    def __init__(self, lru: MemberLRU, is_tracked: Callable[[Any, int], bool], missing_ttl: float = 600.0):
+        self.lru = lru
+        # is_tracked(guild, user_id): si el usuario va a la caché de discord.py (p. ej. registrado
+        # en el tracker de ese servidor) en lugar de a la LRU
+        self.is_tracked = is_tracked
+        self.missing_ttl = missing_ttl
+        # (guild_id, user_id) -> momento en que el servidor no lo devolvió
+        self.missing: Dict[Tuple[int, int], float] = {}
+        # (guild_id, user_id) -> futuro de la petición en curso que lo incluye
+        self.inflight: Dict[Tuple[int, int], asyncio.Future] = {}
+        self.queries = 0
+        self.resolved = 0
+
+    def get(self, guild, user_id: int) -> Optional[Any]:
+        """Miembro ya disponible (caché de discord.py o LRU), sin pedir nada"""
+        member = guild.get_member(user_id)
+        if member is None:
+            member = self.lru.get(guild.id, user_id)
+        return member
+
+    def forget_missing(self, guild_id: int, user_id: int) -> None:
+        """Olvidar que el servidor no devolvió a un usuario (p. ej. porque acaba de entrar)"""
+        self.missing.pop((guild_id, user_id), None)
+
+    def is_known_missing(self, guild_id: int, user_id: int) -> bool:
+        missing_at = self.missing.get((guild_id, user_id))
+        if missing_at is None:
+            return False
+        if time.monotonic() - missing_at > self.missing_ttl:
+            del self.missing[(guild_id, user_id)]
+            return False
+        return True
+
+    async def resolve_many(self, guild, user_ids: Iterable[int], timeout: Optional[float] = None,
+                           unresolved: Optional[Set[int]] = None) -> Dict[int, Any]:
+        """Miembros de los IDs dados, pidiendo por lotes solo los que faltan
+
+        Con timeout, devuelve lo que haya al vencer; las peticiones siguen y llenan la caché.
+        En unresolved se añaden los IDs sin respuesta (la petición falló o no terminó a tiempo):
+        no se sabe si siguen en el servidor, a diferencia de los que el servidor no devolvió.
+        """
+        user_ids = list(user_ids)
+        found: Dict[int, Any] = {}
+        to_fetch: List[int] = []
+        waits: List[asyncio.Future] = []
+        for user_id in dict.fromkeys(user_ids):
+            member = self.get(guild, user_id)
+            if member is not None:
+                found[user_id] = member
+            elif (guild.id, user_id) in self.inflight:
+                waits.append(self.inflight[(guild.id, user_id)])
+            elif not self.is_known_missing(guild.id, user_id):
+                to_fetch.append(user_id)
+
+        loop = asyncio.get_running_loop()
+        for batch_start in range(0, len(to_fetch), self.BATCH_SIZE):
+            batch = to_fetch[batch_start:batch_start + self.BATCH_SIZE]
+            future = loop.create_task(self._query(guild, batch))
+            for user_id in batch:
+                self.inflight[(guild.id, user_id)] = future
+            waits.append(future)
+
+        if waits:
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.gather(*set(waits))), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        for user_id in user_ids:
+            if user_id not in found:
+                member = self.get(guild, user_id)
+                if member is not None:
+                    found[user_id] = member
+                elif unresolved is not None and not self.is_known_missing(guild.id, user_id):
+                    unresolved.add(user_id)
+        return found
+
+    async def _query(self, guild, batch: List[int]) -> None:
+        try:
+            tracked = [user_id for user_id in batch if self.is_tracked(guild, user_id)]
+            others = [user_id for user_id in batch if not self.is_tracked(guild, user_id)]
+            returned = set()
+            for user_ids, cache in ((tracked, True), (others, False)):
+                if not user_ids:
+                    continue
+                self.queries += 1
+                members = await guild.query_members(user_ids=user_ids, limit=len(user_ids), cache=cache)
+                for member in members:
+                    returned.add(member.id)
+                    if not cache:
+                        self.lru.put(member)
+                self.resolved += len(members)
+
+            now = time.monotonic()
+            for user_id in batch:
+                if user_id not in returned:
+                    self.missing[(guild.id, user_id)] = now
+        except Exception as e:
+            print(f"⚠️ Error pidiendo {len(batch)} miembros al servidor {guild.id}: {e}")
+        finally:
+            for user_id in batch:
+                self.inflight.pop((guild.id, user_id), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'queries': self.queries,
+            'resolved': self.resolved,
+            'known_missing': len(self.missing),
+            'inflight': len(self.inflight)
+        }
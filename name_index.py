@@ -0,0 +1,237 @@
+import bisect
+import heapq
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple, Iterable
+
+
+def normalize_name(name: str) -> str:
+    """Normalizar un nombre para búsqueda: sin tildes, sin mayúsculas y con espacios simples"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    without_marks = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(without_marks.casefold().split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameSearchIndex:
+    """Índice en memoria de nombres de usuario (prefijos + trigramas), actualizable por usuario"""
+
+    # Rangos de relevancia: exacto, prefijo del nombre, prefijo de palabra, contiene
+    RANK_EXACT = 0
+    RANK_PREFIX = 1
+    RANK_WORD_PREFIX = 2
+    RANK_SUBSTRING = 3
+
+    def __init__(self):
+        self.names: Dict[str, str] = {}
+        self.trigrams: Dict[str, Set[str]] = {}
+        # Lista ordenada de (palabra normalizada, user_id) para búsquedas por prefijo
+        self.words: List[Tuple[str, str]] = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def update(self, user_id_str: str, name: Optional[str]) -> None:
+        """Insertar, renombrar o eliminar (name=None) un usuario del índice"""
+        new_norm = normalize_name(name) if name is not None else None
+        old_norm = self.names.get(user_id_str)
+        if old_norm == new_norm:
+            return
+
+        if old_norm is not None:
+            for gram in _trigrams(old_norm):
+                ids = self.trigrams.get(gram)
+                if ids is not None:
+                    ids.discard(user_id_str)
+                    if not ids:
+                        del self.trigrams[gram]
+            for word in set(old_norm.split()):
+                pos = bisect.bisect_left(self.words, (word, user_id_str))
+                if pos < len(self.words) and self.words[pos] == (word, user_id_str):
+                    del self.words[pos]
+            del self.names[user_id_str]
+
+        if new_norm is not None:
+            self.names[user_id_str] = new_norm
+            for gram in _trigrams(new_norm):
+                self.trigrams.setdefault(gram, set()).add(user_id_str)
+            for word in set(new_norm.split()):
+                bisect.insort(self.words, (word, user_id_str))
+
+    def remove(self, user_id_str: str) -> None:
+        self.update(user_id_str, None)
+
+    def rebuild(self, names: Iterable[Tuple[str, str]]) -> None:
+        """Reconstruir el índice completo desde pares (user_id, nombre)"""
+        self.names = {}
+        self.trigrams = {}
+        words = []
+        for user_id_str, name in names:
+            norm = normalize_name(name)
+            self.names[user_id_str] = norm
+            for gram in _trigrams(norm):
+                self.trigrams.setdefault(gram, set()).add(user_id_str)
+            for word in set(norm.split()):
+                words.append((word, user_id_str))
+        words.sort()
+        self.words = words
+
+    def _prefix_candidates(self, query: str) -> Set[str]:
+        """IDs con alguna palabra que empieza por la consulta"""
+        first_word = query.split()[0]
+        candidates = set()
+        pos = bisect.bisect_left(self.words, (first_word,))
+        while pos < len(self.words) and self.words[pos][0].startswith(first_word):
+            candidates.add(self.words[pos][1])
+            pos += 1
+        return candidates
+
+    def _rank(self, name: str, query: str) -> Optional[int]:
+        if name == query:
+            return self.RANK_EXACT
+        if name.startswith(query):
+            return self.RANK_PREFIX
+        if (' ' + name).find(' ' + query) != -1:
+            return self.RANK_WORD_PREFIX
+        if query in name:
+            return self.RANK_SUBSTRING
+        return None
+
+    def search(self, query: str, limit: Optional[int] = None,
+               restrict_to: Optional[Set[str]] = None) -> List[str]:
+        """Buscar usuarios cuyo nombre contiene la consulta, ordenados por relevancia y nombre
+
+        Las consultas de 3 o más caracteres usan trigramas (coincidencia en cualquier parte
+        del nombre); las más cortas solo encuentran nombres con alguna palabra que empieza así.
+        """
+        norm_query = normalize_name(query)
+        if not norm_query:
+            return []
+
+        if len(norm_query) >= 3:
+            postings = []
+            for gram in _trigrams(norm_query):
+                ids = self.trigrams.get(gram)
+                if not ids:
+                    return []
+                postings.append(ids)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for ids in postings[1:]:
+                candidates &= ids
+                if not candidates:
+                    return []
+        else:
+            candidates = self._prefix_candidates(norm_query)
+
+        if restrict_to is not None:
+            candidates &= restrict_to
+
+        ranked = []
+        for user_id_str in candidates:
+            name = self.names[user_id_str]
+            rank = self._rank(name, norm_query)
+            if rank is not None:
+                ranked.append((rank, name, user_id_str))
+
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [user_id_str for _, _, user_id_str in ranked]
+
+
+class SortedNameIndex:
+    """Usuarios ordenados por nombre como claves (nombre en minúsculas, user_id), con paginación por cursor"""
+
+    def __init__(self):
+        self.keys: List[Tuple[str, str]] = []
+        self.key_by_id: Dict[str, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def update(self, user_id_str: str, name: Optional[str]) -> None:
+        """Insertar, renombrar o eliminar (name=None) un usuario manteniendo el orden"""
+        new_key = (name.lower(), user_id_str) if name is not None else None
+        old_key = self.key_by_id.get(user_id_str)
+        if old_key == new_key:
+            return
+
+        if old_key is not None:
+            pos = bisect.bisect_left(self.keys, old_key)
+            if pos < len(self.keys) and self.keys[pos] == old_key:
+                del self.keys[pos]
+            del self.key_by_id[user_id_str]
+
+        if new_key is not None:
+            bisect.insort(self.keys, new_key)
+            self.key_by_id[user_id_str] = new_key
+
+    def remove(self, user_id_str: str) -> None:
+        self.update(user_id_str, None)
+
+    def rebuild(self, names: Iterable[Tuple[str, str]]) -> None:
+        """Reconstruir el orden completo desde pares (user_id, nombre)"""
+        self.key_by_id = {user_id_str: (name.lower(), user_id_str) for user_id_str, name in names}
+        self.keys = sorted(self.key_by_id.values())
+
+    def key_for(self, user_id_str: str) -> Optional[Tuple[str, str]]:
+        return self.key_by_id.get(user_id_str)
+
+    def rank(self, key: Tuple[str, str]) -> int:
+        """Posición que ocupa (u ocuparía) una clave"""
+        return bisect.bisect_left(self.keys, key)
+
+    def key_at(self, position: int) -> Optional[Tuple[str, str]]:
+        if 0 <= position < len(self.keys):
+            return self.keys[position]
+        return None
+
+    def keys_from(self, cursor: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        """Claves desde el cursor (incluido) en adelante"""
+        start = self.rank(cursor) if cursor is not None else 0
+        return self.keys[start:start + limit]
+
+    def keys_after(self, cursor: Tuple[str, str], limit: int) -> List[Tuple[str, str]]:
+        """Claves estrictamente posteriores al cursor"""
+        start = bisect.bisect_right(self.keys, cursor)
+        return self.keys[start:start + limit]
+
+    def keys_before(self, cursor: Tuple[str, str], limit: int) -> List[Tuple[str, str]]:
+        """Claves estrictamente anteriores al cursor"""
+        end = self.rank(cursor)
+        return self.keys[max(0, end - limit):end]
+
+
+class KeyListSource:
+    """Lista fija de claves (p. ej. resultado de un filtro o búsqueda) con la misma interfaz de paginación"""
+
+    def __init__(self, keys: List[Tuple[str, str]]):
+        self.keys = list(keys)
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def rank(self, key: Tuple[str, str]) -> int:
+        return self.positions.get(key, len(self.keys))
+
+    def key_at(self, position: int) -> Optional[Tuple[str, str]]:
+        if 0 <= position < len(self.keys):
+            return self.keys[position]
+        return None
+
+    def keys_from(self, cursor: Optional[Tuple[str, str]], limit: int) -> List[Tuple[str, str]]:
+        start = self.rank(cursor) if cursor is not None else 0
+        return self.keys[start:start + limit]
+
+    def keys_after(self, cursor: Tuple[str, str], limit: int) -> List[Tuple[str, str]]:
+        start = self.rank(cursor) + 1
+        return self.keys[start:start + limit]
+
+    def keys_before(self, cursor: Tuple[str, str], limit: int) -> List[Tuple[str, str]]:
+        end = self.rank(cursor)
+        return self.keys[max(0, end - limit):end]
@@ -0,0 +1,442 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, Deque, List, Optional, Set, Tuple
+
+# Carriles de prioridad: los milestones (créditos) salen antes que los movimientos
+LANE_MILESTONE = 0
+LANE_MOVEMENT = 1
+LANES = (LANE_MILESTONE, LANE_MOVEMENT)
+
+# Límite de caracteres de un mensaje de Discord
+MAX_MESSAGE_LENGTH = 2000
+
+
+def split_message(content: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Partir un texto demasiado largo en trozos que Discord acepte (preferentemente por líneas)"""
+    chunks = []
+    while len(content) > limit:
+        cut = content.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(content[:cut])
+        content = content[cut:].lstrip("\n")
+    if content:
+        chunks.append(content)
+    return chunks
+
+
+def batch_nonce(batch: List[Dict[str, Any]]) -> str:
+    """Clave de idempotencia del mensaje: la misma para el mismo lote de avisos"""
+    if len(batch) == 1:
+        return batch[0]['id']
+    joined = ",".join(entry['id'] for entry in batch)
+    return hashlib.sha1(joined.encode('utf-8')).hexdigest()[:20]
+
+
+class NotificationJournal:
+    """Marcas de lote y entregas de los avisos guardados en el tracker (JSONL append-only)
+
+    Enviar un aviso no reescribe user_times.json: cada marca o entrega es una línea al final
+    de este archivo. Al cargar se aplican a los avisos de los registros y, tras el siguiente
+    guardado normal del tracker (que ya las incluye), el archivo se vacía.
+    """
+
+    def __init__(self, journal_file: str = "notification_journal.jsonl"):
+        self.journal_file = journal_file
+        self.lines = 0
+
+    def replay(self) -> Tuple[Dict[str, Dict[str, Any]], Set[str]]:
+        """Marcas de lote por ID de aviso y IDs ya entregados, según el archivo"""
+        marks: Dict[str, Dict[str, Any]] = {}
+        delivered: Set[str] = set()
+        if not os.path.exists(self.journal_file):
+            return marks, delivered
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    self.lines += 1
+                    if record.get('delivered'):
+                        delivered.add(record['id'])
+                    else:
+                        marks[record['id']] = {'batch': record['batch'], 'attempted_at': record['attempted_at']}
+        except Exception as e:
+            # Una línea cortada por un apagado: se usa lo leído hasta ahí
+            print(f"Error cargando journal de avisos: {e}")
+        return marks, delivered
+
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        try:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.lines += len(records)
+        except Exception as e:
+            print(f"Error escribiendo journal de avisos: {e}")
+
+    def compact(self) -> None:
+        """Vaciar el archivo (llamar solo después de guardar los datos que ya incluyen sus líneas)"""
+        if not self.lines:
+            return
+        try:
+            open(self.journal_file, 'w', encoding='utf-8').close()
+            self.lines = 0
+        except Exception as e:
+            print(f"Error vaciando journal de avisos: {e}")
+
+
+class NotificationFileStore:
+    """Avisos guardados que no pertenecen a ningún usuario registrado (lista pequeña por servidor)
+
+    Misma interfaz que el tracker para los avisos pendientes; cada cambio se escribe al momento.
+    También recibe los avisos sin entregar de los usuarios que se eliminan del tracker.
+    """
+
+    def __init__(self, data_file: str = "pending_notifications.json"):
+        self.data_file = data_file
+        self.entries: List[Dict[str, Any]] = self.load()
+
+    def load(self) -> List[Dict[str, Any]]:
+        try:
+            if os.path.exists(self.data_file):
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error cargando avisos pendientes del servidor: {e}")
+        return []
+
+    def save_data(self) -> None:
+        try:
+            with open(self.data_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+        except Exception as e:
+            print(f"Error guardando avisos pendientes del servidor: {e}")
+
+    def add_pending_notification(self, owner: Optional[str], entry: Dict[str, Any]) -> bool:
+        self.entries.append(entry)
+        self.save_data()
+        return True
+
+    def adopt_pending_notifications(self, entries: List[Dict[str, Any]]) -> int:
+        """Quedarse con avisos de usuarios eliminados antes de entregarlos (un solo guardado)"""
+        for entry in entries:
+            entry['owner'] = None
+            self.entries.append(entry)
+        if entries:
+            self.save_data()
+        return len(entries)
+
+    def mark_pending_notifications(self, entries: List[Dict[str, Any]]) -> None:
+        """Las marcas de lote ya están en los avisos: basta con escribir la lista"""
+        self.save_data()
+
+    def remove_pending_notifications(self, entries) -> int:
+        entry_ids = {entry['id'] for entry in entries}
+        kept = [entry for entry in self.entries if entry['id'] not in entry_ids]
+        removed = len(self.entries) - len(kept)
+        if removed:
+            self.entries = kept
+            self.save_data()
+        return removed
+
+    def get_pending_notifications(self) -> List[Dict[str, Any]]:
+        return list(self.entries)
+
+
+class NotificationOutbox:
+    """Cola de notificaciones por canal con agrupación de ráfagas y reintentos
+
+    Los productores encolan y vuelven de inmediato; un emisor por canal vacía la cola,
+    junta los avisos pendientes del mismo carril en mensajes de hasta 2000 caracteres
+    y reintenta con espera exponencial si el envío falla.
+
+    Con un store (el tracker), los avisos de un usuario se guardan en su registro junto con
+    el cambio que los origina y solo se borran al entregarse; los que no tienen usuario van al
+    fallback_store del servidor. Tras un reinicio se vuelven a encolar. Las marcas de lote y
+    las entregas no reescriben el tracker (van a su journal).
+
+    Antes del primer envío, el lote (qué avisos van juntos) y su nonce quedan guardados en los
+    avisos, así un reintento o un reinicio repite exactamente el mismo mensaje. Discord descarta
+    el duplicado por nonce solo durante unos minutos, por eso un lote que ya se intentó se busca
+    primero en el historial del canal y no se reenvía si el mensaje ya está publicado.
+    """
+
+    def __init__(self, get_channel: Callable[[int], Any], store: Optional[Any] = None,
+                 breaker: Optional[Any] = None, send_timeout: float = 15.0, max_attempts: int = 5,
+                 base_backoff: float = 1.0, max_backoff: float = 60.0,
+                 fallback_store: Optional[Any] = None, history_check_limit: int = 100):
+        self.get_channel = get_channel
+        # Objetos con add_pending_notification, mark_pending_notifications,
+        # remove_pending_notifications y get_pending_notifications (el tracker y la lista del servidor)
+        self.store = store
+        self.fallback_store = fallback_store
+        self.history_check_limit = history_check_limit
+        # Objeto con retry_after, record_success y record_failure por canal
+        self.breaker = breaker
+        self.send_timeout = send_timeout
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        # channel_id -> carril -> avisos pendientes
+        self.queues: Dict[int, Dict[int, Deque[Dict[str, Any]]]] = {}
+        self.workers: Dict[int, asyncio.Task] = {}
+
+        self.enqueued = 0
+        self.sent_messages = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.dropped = 0
+        self.restored = 0
+        self.replays_skipped = 0
+
+    def _channel_queues(self, channel_id: int) -> Dict[int, Deque[Dict[str, Any]]]:
+        queues = self.queues.get(channel_id)
+        if queues is None:
+            queues = {lane: deque() for lane in LANES}
+            self.queues[channel_id] = queues
+        return queues
+
+    def enqueue(self, channel_id: int, content: str, lane: int = LANE_MOVEMENT,
+                owner: Optional[str] = None) -> bool:
+        """Encolar un aviso para un canal (debe llamarse dentro del loop del bot)
+
+        Con owner, el aviso se adjunta al registro de ese usuario; devuelve True si quedó
+        adjunto, y entonces el llamador debe guardar (normalmente ya lo hace con el cambio).
+        Si no, se guarda en la lista del servidor (owner None), que se escribe al momento.
+        """
+        entry = {
+            'id': secrets.token_hex(10),
+            'channel_id': channel_id,
+            'lane': lane,
+            'content': content,
+            'created_at': time.time(),
+            'attempts': 0
+        }
+        durable = False
+        if owner is not None and self.store is not None:
+            entry['owner'] = owner
+            durable = self.store.add_pending_notification(owner, entry)
+            if not durable:
+                del entry['owner']
+        if not durable and self.fallback_store is not None:
+            entry['owner'] = None
+            self.fallback_store.add_pending_notification(None, entry)
+
+        self._channel_queues(channel_id)[lane].append(entry)
+        self.enqueued += 1
+        self._ensure_worker(channel_id)
+        return durable
+
+    def _persist(self, entries: List[Dict[str, Any]]) -> None:
+        """Guardar la marca de lote de los avisos guardados antes de enviarlos"""
+        user_entries = [entry for entry in entries if entry.get('owner') is not None]
+        guild_entries = [entry for entry in entries if entry.get('owner') is None]
+        if user_entries and self.store is not None:
+            self.store.mark_pending_notifications(user_entries)
+        if guild_entries and self.fallback_store is not None:
+            self.fallback_store.mark_pending_notifications(guild_entries)
+
+    def _release(self, entries: List[Dict[str, Any]]) -> None:
+        """Borrar de su store los avisos guardados ya entregados"""
+        user_entries = [entry for entry in entries if entry.get('owner') is not None]
+        guild_entries = [entry for entry in entries if entry.get('owner') is None]
+        if user_entries and self.store is not None:
+            self.store.remove_pending_notifications(user_entries)
+        if guild_entries and self.fallback_store is not None:
+            self.fallback_store.remove_pending_notifications(guild_entries)
+
+    def restore(self) -> int:
+        """Volver a encolar los avisos guardados sin entregar (al arrancar)
+
+        Los avisos de un lote ya intentado vuelven juntos, en la posición del primero,
+        para repetir el mismo mensaje con el mismo nonce.
+        """
+        pending = {}
+        duplicates = []
+        for store in (self.store, self.fallback_store):
+            if store is not None:
+                for entry in store.get_pending_notifications():
+                    if entry['id'] in pending:
+                        duplicates.append(entry)
+                    else:
+                        pending[entry['id']] = entry
+        # El mismo aviso en los dos si el proceso se cortó mientras pasaba de un usuario
+        # eliminado a la lista del servidor: el usuario sigue registrado, vale su copia
+        if duplicates and self.fallback_store is not None:
+            self.fallback_store.remove_pending_notifications(duplicates)
+        pending = sorted(pending.values(), key=lambda entry: entry.get('created_at', 0))
+
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        ordered: List[List[Dict[str, Any]]] = []
+        for entry in pending:
+            batch_key = entry.get('batch')
+            if batch_key is None:
+                ordered.append([entry])
+            elif batch_key in groups:
+                groups[batch_key].append(entry)
+            else:
+                groups[batch_key] = [entry]
+                ordered.append(groups[batch_key])
+
+        for group in ordered:
+            for entry in group:
+                entry['attempts'] = 0
+                self._channel_queues(entry['channel_id'])[entry.get('lane', LANE_MOVEMENT)].append(entry)
+                self._ensure_worker(entry['channel_id'])
+        self.restored += len(pending)
+        return len(pending)
+
+    def _ensure_worker(self, channel_id: int) -> None:
+        worker = self.workers.get(channel_id)
+        if worker is None or worker.done():
+            self.workers[channel_id] = asyncio.get_running_loop().create_task(self._drain(channel_id))
+
+    def pending_count(self, channel_id: Optional[int] = None) -> int:
+        """Avisos pendientes de un canal o de todos"""
+        channel_ids = [channel_id] if channel_id is not None else list(self.queues)
+        return sum(len(queue) for cid in channel_ids for queue in self.queues.get(cid, {}).values())
+
+    def _pending_entries(self):
+        for queues in self.queues.values():
+            for queue in queues.values():
+                yield from queue
+
+    def _take_batch(self, queues: Dict[int, Deque[Dict[str, Any]]]):
+        """Sacar del carril de mayor prioridad los avisos que caben en un mensaje
+
+        Un lote ya formado (con marca de lote) sale tal cual, sin añadirle otros avisos.
+        """
+        for lane in LANES:
+            queue = queues[lane]
+            if not queue:
+                continue
+            batch = [queue.popleft()]
+            batch_key = batch[0].get('batch')
+            if batch_key is not None:
+                while queue and queue[0].get('batch') == batch_key:
+                    batch.append(queue.popleft())
+                return lane, batch
+            length = len(batch[0]['content'])
+            while (queue and queue[0].get('batch') is None
+                   and length + 1 + len(queue[0]['content']) <= MAX_MESSAGE_LENGTH):
+                entry = queue.popleft()
+                length += 1 + len(entry['content'])
+                batch.append(entry)
+            return lane, batch
+        return None, []
+
+    async def _drain(self, channel_id: int) -> None:
+        queues = self._channel_queues(channel_id)
+        while True:
+            # Canal en espera por fallos previos: no gastar intentos hasta que pase el tiempo
+            if self.breaker is not None:
+                wait = self.breaker.retry_after(channel_id)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+            lane, batch = self._take_batch(queues)
+            if not batch:
+                return
+
+            content = "\n".join(entry['content'] for entry in batch)
+            durable_entries = [entry for entry in batch if 'owner' in entry]
+            attempted_at = batch[0].get('attempted_at')
+            if batch[0].get('batch') is None:
+                # Fijar el lote y su nonce (guardados) antes del primer envío
+                batch_key = batch_nonce(batch)
+                for entry in batch:
+                    entry['batch'] = batch_key
+                    entry['attempted_at'] = time.time()
+                if durable_entries:
+                    self._persist(durable_entries)
+            nonce = batch[0]['batch']
+            try:
+                if attempted_at is not None and await self._already_delivered(channel_id, content, attempted_at):
+                    self.replays_skipped += 1
+                else:
+                    await self._send(channel_id, content, nonce)
+                    self.sent_messages += 1
+                    self.coalesced += len(batch) - 1
+                if self.breaker is not None:
+                    self.breaker.record_success(channel_id)
+                if durable_entries:
+                    self._release(durable_entries)
+            except Exception as e:
+                self.failures += 1
+                if self.breaker is not None:
+                    self.breaker.record_failure(channel_id, e)
+                attempts = max(entry['attempts'] for entry in batch) + 1
+                # Los avisos guardados no se descartan nunca: siguen reintentando con la espera máxima
+                durable = any('owner' in entry for entry in batch)
+                if attempts >= self.max_attempts and not durable:
+                    self.dropped += len(batch)
+                    print(f"❌ CRÍTICO: {len(batch)} notificaciones descartadas para el canal {channel_id} "
+                          f"después de {attempts} intentos: {e}")
+                    continue
+
+                # Devolver el lote al frente de su carril, en el mismo orden, y esperar antes de reintentar
+                for entry in reversed(batch):
+                    entry['attempts'] = attempts
+                    queues[lane].appendleft(entry)
+                delay = min(self.max_backoff, self.base_backoff * (2 ** (attempts - 1)))
+                print(f"⚠️ Error enviando notificaciones al canal {channel_id} "
+                      f"(intento {attempts}), reintento en {delay:g}s: {e}")
+                await asyncio.sleep(delay)
+
+    async def _already_delivered(self, channel_id: int, content: str, attempted_at: float) -> bool:
+        """Si el bot ya publicó este mensaje en el canal desde el primer intento del lote"""
+        channel = self.get_channel(channel_id)
+        guild = getattr(channel, 'guild', None)
+        if channel is None or guild is None or guild.me is None:
+            return False
+        first_chunk = split_message(content)[0]
+        after = datetime.fromtimestamp(attempted_at - 5, tz=timezone.utc)
+
+        async def search() -> bool:
+            async for message in channel.history(limit=self.history_check_limit, after=after):
+                if message.author.id == guild.me.id and message.content == first_chunk:
+                    return True
+            return False
+
+        try:
+            return await asyncio.wait_for(search(), timeout=self.send_timeout)
+        except Exception as e:
+            # Sin historial (permisos, error de red): se reenvía, mejor duplicado que perdido
+            print(f"⚠️ No se pudo revisar el historial del canal {channel_id}: {e}")
+            return False
+
+    async def _send(self, channel_id: int, content: str, nonce: str) -> None:
+        channel = self.get_channel(channel_id)
+        if channel is None:
+            raise LookupError(f"canal {channel_id} no encontrado")
+        # discord.py envía enforce_nonce junto con el nonce, así Discord ignora el reenvío
+        for index, chunk in enumerate(split_message(content)):
+            chunk_nonce = nonce if index == 0 else f"{nonce}{index}"
+            await asyncio.wait_for(channel.send(chunk, nonce=chunk_nonce), timeout=self.send_timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de la cola de notificaciones"""
+        now = time.time()
+        created = [entry['created_at'] for entry in self._pending_entries()]
+        return {
+            'pending': len(created),
+            'durable_pending': sum(1 for entry in self._pending_entries() if 'owner' in entry),
+            'oldest_age': (now - min(created)) if created else 0,
+            'restored': self.restored,
+            'enqueued': self.enqueued,
+            'sent_messages': self.sent_messages,
+            'coalesced': self.coalesced,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'replays_skipped': self.replays_skipped
+        }
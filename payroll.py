@@ -0,0 +1,124 @@
+from typing import Dict, Any, List, Optional
+
+from name_index import SortedNameIndex
+
+
+class PayrollTable:
+    """Filas de pago por tier con totales acumulados, actualizadas en cada cambio de usuario o de rol
+
+    Cada fila guarda el tiempo acumulado guardado; el tiempo en curso de los usuarios activos
+    se suma al leer, igual que los créditos que le corresponden.
+    """
+
+    def __init__(self, tracker, status_engine, credit_rules):
+        self.tracker = tracker
+        self.status_engine = status_engine
+        # Objeto con credits(segundos, tier) y bulk_credits(segundos, tiers)
+        self.credit_rules = credit_rules
+
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.row_tier: Dict[str, str] = {}
+        self.order: Dict[str, SortedNameIndex] = {}
+        self.totals: Dict[str, Dict[str, float]] = {}
+
+        tracker.add_change_listener(self.on_user_changed)
+        status_engine.add_role_listener(self.on_role_changed)
+
+    def _tier_totals(self, tier: str) -> Dict[str, float]:
+        return self.totals.setdefault(tier, {'users': 0, 'credits': 0, 'earned': 0})
+
+    def _remove_row(self, user_id_str: str) -> None:
+        row = self.rows.pop(user_id_str, None)
+        if row is None:
+            return
+        tier = self.row_tier.pop(user_id_str)
+        totals = self._tier_totals(tier)
+        totals['users'] -= 1
+        totals['credits'] -= row['credits']
+        totals['earned'] -= row['earned_credits']
+        self.order[tier].remove(user_id_str)
+
+    def _add_row(self, user_id_str: str, user_data: Dict[str, Any], tier: str,
+                 earned_credits: Optional[float] = None) -> None:
+        total_time = user_data.get('total_time', 0)
+        credits = user_data.get('confirmed_credits', 0)
+
+        # Igual que antes: sin tiempo ni créditos no aparece (salvo que esté sumando tiempo ahora)
+        if total_time <= 0 and credits <= 0 and not user_data.get('is_active', False):
+            return
+
+        if earned_credits is None:
+            earned_credits = self.credit_rules.credits(total_time, tier)
+
+        name = user_data.get('name', f'Usuario {user_id_str}')
+        self.rows[user_id_str] = {
+            'user_id': int(user_id_str),
+            'name': name,
+            'total_time': total_time,
+            'credits': credits,
+            'earned_credits': earned_credits,
+            'role_type': tier,
+            'data': user_data
+        }
+        self.row_tier[user_id_str] = tier
+        totals = self._tier_totals(tier)
+        totals['users'] += 1
+        totals['credits'] += credits
+        totals['earned'] += earned_credits
+        self.order.setdefault(tier, SortedNameIndex()).update(user_id_str, name)
+
+    def on_user_changed(self, user_id_str: str, user_data: Optional[Dict[str, Any]]) -> None:
+        """Listener del tracker: rehacer solo la fila del usuario modificado"""
+        self._remove_row(user_id_str)
+        if user_data is not None:
+            self._add_row(user_id_str, user_data, self.status_engine.get_role_type(int(user_id_str)))
+
+    def on_role_changed(self, user_id_str: str, role_type: str) -> None:
+        """Listener del motor de estados: mover la fila a su nuevo tier"""
+        user_data = self.tracker.data.get(user_id_str)
+        self._remove_row(user_id_str)
+        if user_data is not None:
+            self._add_row(user_id_str, user_data, role_type)
+
+    def rebuild(self) -> None:
+        """Reconstruir todas las filas (al conectar o al recargar las reglas de créditos)"""
+        self.rows = {}
+        self.row_tier = {}
+        self.order = {}
+        self.totals = {}
+
+        items = list(self.tracker.data.items())
+        tiers = [self.status_engine.get_role_type(int(user_id_str)) for user_id_str, _ in items]
+        earned = self.credit_rules.bulk_credits([user_data.get('total_time', 0) for _, user_data in items], tiers)
+        for (user_id_str, user_data), tier, earned_credits in zip(items, tiers, earned):
+            self._add_row(user_id_str, user_data, tier, earned_credits)
+
+    def _live_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Copia de la fila con el tiempo en curso si el usuario está activo"""
+        if not row['data'].get('is_active', False):
+            return row
+        live_time = self.tracker.get_total_time(row['user_id'])
+        live_row = dict(row)
+        live_row['total_time'] = live_time
+        live_row['earned_credits'] = self.credit_rules.credits(live_time, row['role_type'])
+        return live_row
+
+    def get_rows(self, tier: str) -> List[Dict[str, Any]]:
+        """Filas de un tier ordenadas por nombre"""
+        order = self.order.get(tier)
+        if order is None:
+            return []
+        return [self._live_row(self.rows[user_id_str]) for _, user_id_str in order.keys]
+
+    def get_totals(self, tier: str) -> Dict[str, float]:
+        """Totales del tier (usuarios, créditos confirmados y créditos según el tiempo actual)"""
+        totals = dict(self._tier_totals(tier))
+        earned = totals['earned']
+        active_ids = self.tracker.get_active_user_ids()
+        for user_id_str in active_ids:
+            if self.row_tier.get(user_id_str) == tier:
+                row = self.rows[user_id_str]
+                earned += self._live_row(row)['earned_credits'] - row['earned_credits']
+        totals['credits'] = round(totals['credits'], 2)
+        totals['earned'] = round(earned, 2)
+        return totals
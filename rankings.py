@@ -0,0 +1,148 @@
+import bisect
+from typing import Dict, List, Optional, Set, Tuple, Iterable, Iterator, Any
+
+
+class RankingIndex:
+    """Usuarios ordenados de mayor a menor por un valor, en global y por grupo (tier)"""
+
+    def __init__(self):
+        # user_id -> (valor, grupo)
+        self.entries: Dict[str, Tuple[float, str]] = {}
+        # Claves (-valor, user_id) en orden ascendente = mayor valor primero
+        self.keys: List[Tuple[float, str]] = []
+        self.group_keys: Dict[str, List[Tuple[float, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @staticmethod
+    def _discard(keys: List[Tuple[float, str]], key: Tuple[float, str]) -> None:
+        pos = bisect.bisect_left(keys, key)
+        if pos < len(keys) and keys[pos] == key:
+            del keys[pos]
+
+    def update(self, user_id_str: str, value: float, group: str) -> None:
+        """Insertar o mover un usuario (nuevo valor o nuevo grupo)"""
+        old = self.entries.get(user_id_str)
+        if old == (value, group):
+            return
+        if old is not None:
+            self.remove(user_id_str)
+
+        key = (-value, user_id_str)
+        self.entries[user_id_str] = (value, group)
+        bisect.insort(self.keys, key)
+        bisect.insort(self.group_keys.setdefault(group, []), key)
+
+    def remove(self, user_id_str: str) -> None:
+        old = self.entries.pop(user_id_str, None)
+        if old is None:
+            return
+        value, group = old
+        key = (-value, user_id_str)
+        self._discard(self.keys, key)
+        group_keys = self.group_keys.get(group)
+        if group_keys is not None:
+            self._discard(group_keys, key)
+            if not group_keys:
+                del self.group_keys[group]
+
+    def rebuild(self, items: Iterable[Tuple[str, float, str]]) -> None:
+        """Reconstruir desde tuplas (user_id, valor, grupo)"""
+        self.entries = {}
+        self.group_keys = {}
+        for user_id_str, value, group in items:
+            self.entries[user_id_str] = (value, group)
+            self.group_keys.setdefault(group, []).append((-value, user_id_str))
+        for group_keys in self.group_keys.values():
+            group_keys.sort()
+        self.keys = sorted(key for group_keys in self.group_keys.values() for key in group_keys)
+
+    def iter_ranked(self, group: Optional[str] = None) -> Iterator[Tuple[str, float]]:
+        """Recorrer (user_id, valor) de mayor a menor, opcionalmente dentro de un grupo"""
+        keys = self.keys if group is None else self.group_keys.get(group, [])
+        for neg_value, user_id_str in keys:
+            yield user_id_str, -neg_value
+
+    def top(self, k: Optional[int], group: Optional[str] = None,
+            restrict_to: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Los k primeros (todos si k es None), parando en cuanto se completan"""
+        result = []
+        if k is not None and k <= 0:
+            return result
+        for user_id_str, value in self.iter_ranked(group):
+            if restrict_to is not None and user_id_str not in restrict_to:
+                continue
+            result.append((user_id_str, value))
+            if k is not None and len(result) >= k:
+                break
+        return result
+
+
+class UserRankings:
+    """Rankings de tiempo y créditos confirmados, mantenidos con los cambios del tracker y de roles"""
+
+    def __init__(self, tracker, status_engine):
+        self.tracker = tracker
+        self.status_engine = status_engine
+        # Tiempo acumulado guardado (la sesión en curso de los activos se suma al consultar)
+        self.time = RankingIndex()
+        self.credits = RankingIndex()
+
+        tracker.add_change_listener(self.on_user_changed)
+        status_engine.add_role_listener(self.on_role_changed)
+
+    def _update(self, user_id_str: str, user_data: Dict[str, Any], group: str) -> None:
+        self.time.update(user_id_str, user_data.get('total_time', 0), group)
+        self.credits.update(user_id_str, user_data.get('confirmed_credits', 0), group)
+
+    def on_user_changed(self, user_id_str: str, user_data: Optional[Dict[str, Any]]) -> None:
+        """Listener del tracker: mover solo al usuario modificado"""
+        if user_data is None:
+            self.time.remove(user_id_str)
+            self.credits.remove(user_id_str)
+            return
+        self._update(user_id_str, user_data, self.status_engine.get_role_type(int(user_id_str)))
+
+    def on_role_changed(self, user_id_str: str, role_type: str) -> None:
+        """Listener del motor de estados: cambiar al usuario de tier"""
+        user_data = self.tracker.data.get(user_id_str)
+        if user_data is not None:
+            self._update(user_id_str, user_data, role_type)
+
+    def rebuild(self) -> None:
+        """Reconstruir ambos rankings (después de resolver los roles al conectar)"""
+        time_items = []
+        credit_items = []
+        for user_id_str, user_data in self.tracker.data.items():
+            group = self.status_engine.get_role_type(int(user_id_str))
+            time_items.append((user_id_str, user_data.get('total_time', 0), group))
+            credit_items.append((user_id_str, user_data.get('confirmed_credits', 0), group))
+        self.time.rebuild(time_items)
+        self.credits.rebuild(credit_items)
+
+    def top_by_time(self, k: Optional[int], tier: Optional[str] = None,
+                    restrict_to: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Top k por tiempo total incluyendo la sesión en curso de los usuarios activos
+
+        El tiempo en vivo de un activo solo puede crecer respecto al guardado, así que basta
+        con tomar k + (activos del ámbito) del ranking guardado y recalcular esos activos.
+        """
+        active = {
+            user_id_str for user_id_str in self.tracker.get_active_user_ids()
+            if user_id_str in self.time.entries
+            and (tier is None or self.time.entries[user_id_str][1] == tier)
+            and (restrict_to is None or user_id_str in restrict_to)
+        }
+        limit = None if k is None else k + len(active)
+        candidates = dict(self.time.top(limit, tier, restrict_to))
+        for user_id_str in active:
+            candidates[user_id_str] = self.tracker.get_total_time(int(user_id_str))
+
+        ranked = sorted(candidates.items(), key=lambda item: (-item[1], item[0]))
+        return ranked if k is None else ranked[:k]
+
+    def top_by_credits(self, k: Optional[int], tier: Optional[str] = None,
+                       restrict_to: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Top k por créditos confirmados"""
+        return self.credits.top(k, tier, restrict_to)
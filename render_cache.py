@@ -0,0 +1,59 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable
+
+
+class RenderCache:
+    """Caché LRU de filas de texto ya renderizadas
+
+    La clave debe incluir todo lo que cambia el texto (versión del registro del usuario, rol,
+    segundo de tiempo mostrado, créditos...): una clave nueva simplemente no está en la caché
+    y las antiguas se descartan por antigüedad. Lo que queda fuera de la clave (p. ej. la
+    configuración del servidor) obliga a vaciarla con clear() cuando cambia.
+    """
+
+    def __init__(self, max_entries: int = 5000):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.skipped_edits = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_or_render(self, key: Hashable, render: Callable[[], str]) -> str:
+        """Devolver la fila cacheada o renderizarla y guardarla"""
+        line = self.entries.get(key)
+        if line is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return line
+
+        self.misses += 1
+        line = render()
+        self.entries[key] = line
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return line
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'skipped_edits': self.skipped_edits
+        }
+
+
+def embed_fingerprint(embed_data: Dict[str, Any]) -> str:
+    """Huella del contenido de un embed (sin la marca de tiempo, que cambia en cada render)"""
+    content = {key: value for key, value in embed_data.items() if key != 'timestamp'}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
@@ -0,0 +1,50 @@
+from typing import Dict, Any, Callable, FrozenSet, Tuple
+
+
+class RoleTypeCache:
+    """Caché del tipo de rol resuelto por miembro, válido mientras no cambie su conjunto de roles"""
+
+    def __init__(self, resolver: Callable[[Any], str]):
+        self.resolver = resolver
+        # member_id -> (huella de roles, tipo de rol)
+        self.entries: Dict[int, Tuple[FrozenSet[int], str]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, member) -> str:
+        """Tipo de rol del miembro, resolviéndolo solo si cambió su conjunto de roles"""
+        fingerprint = frozenset(role.id for role in member.roles)
+        entry = self.entries.get(member.id)
+        if entry is not None and entry[0] == fingerprint:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        role_type = self.resolver(member)
+        self.entries[member.id] = (fingerprint, role_type)
+        return role_type
+
+    def invalidate(self, member_id: int) -> None:
+        """Olvidar el rol de un miembro (cambio de roles)"""
+        if self.entries.pop(member_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        """Olvidar todos los roles (roles del servidor editados o configuración recargada)"""
+        self.invalidations += len(self.entries)
+        self.entries = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0
+        }
@@ -0,0 +1,155 @@
+from typing import Dict, Any, Optional, Set, Callable, List
+
+# Estados de visualización de un usuario
+STATUS_ACTIVE = "active"
+STATUS_FINISHED = "finished"
+STATUS_PAUSED = "paused"
+STATUS_INACTIVE = "inactive"
+
+STATUS_LABELS = {
+    STATUS_ACTIVE: "🟢 Activo",
+    STATUS_FINISHED: "✅ Terminado",
+    STATUS_PAUSED: "⏸️ Pausado",
+    STATUS_INACTIVE: "🔴 Inactivo"
+}
+
+
+def compute_status(user_data: Dict[str, Any], role_type: str, total_time: float) -> str:
+    """Determinar el estado de un usuario (regla única usada por todas las vistas)"""
+    total_hours = total_time / 3600
+
+    # Verificar si ha completado su tiempo máximo
+    is_finished = (user_data.get("milestone_completed", False) or
+                   (role_type == "gold" and total_hours >= 2.0) or
+                   (role_type == "normal" and total_hours >= 1.0))
+
+    if user_data.get('is_active', False):
+        return STATUS_ACTIVE
+    elif is_finished:
+        return STATUS_FINISHED
+    elif user_data.get('is_paused', False):
+        return STATUS_PAUSED
+    elif user_data.get('daily_limit_reset', False) and total_hours > 0:
+        # Si fue reseteado y tiene tiempo histórico, mostrar como terminado
+        return STATUS_FINISHED
+    else:
+        return STATUS_INACTIVE
+
+
+class StatusEngine:
+    """Estado materializado por usuario, actualizado en cada transición del tracker o cambio de rol"""
+
+    def __init__(self, tracker, role_lookup: Callable[[int], str]):
+        self.tracker = tracker
+        self.role_lookup = role_lookup
+        self.status: Dict[str, str] = {}
+        self.roles: Dict[str, str] = {}
+        self.by_status: Dict[str, Set[str]] = {status: set() for status in STATUS_LABELS}
+        # Índice inverso tier -> IDs de usuarios registrados con ese tier
+        self.by_role: Dict[str, Set[str]] = {}
+        # Callbacks (user_id_str, role_type) avisados cuando cambia el rol de un usuario ya resuelto
+        self._role_listeners: List[Callable[[str, str], None]] = []
+
+        tracker.add_change_listener(self.on_user_changed)
+
+    def add_role_listener(self, callback: Callable[[str, str], None]) -> None:
+        """Registrar un callback que se llama cuando cambia el rol de un usuario"""
+        self._role_listeners.append(callback)
+
+    def _set_status(self, user_id_str: str, new_status: Optional[str]) -> None:
+        old_status = self.status.get(user_id_str)
+        if old_status == new_status:
+            return
+        if old_status is not None:
+            self.by_status[old_status].discard(user_id_str)
+        if new_status is None:
+            self.status.pop(user_id_str, None)
+        else:
+            self.status[user_id_str] = new_status
+            self.by_status[new_status].add(user_id_str)
+
+    def _set_role(self, user_id_str: str, role_type: Optional[str]) -> None:
+        old_role = self.roles.get(user_id_str)
+        if old_role == role_type:
+            return
+        if old_role is not None:
+            ids = self.by_role.get(old_role)
+            if ids is not None:
+                ids.discard(user_id_str)
+                if not ids:
+                    del self.by_role[old_role]
+        if role_type is None:
+            self.roles.pop(user_id_str, None)
+        else:
+            self.roles[user_id_str] = role_type
+            self.by_role.setdefault(role_type, set()).add(user_id_str)
+
+    def _recompute(self, user_id_str: str, user_data: Optional[Dict[str, Any]]) -> None:
+        if user_data is None:
+            self._set_status(user_id_str, None)
+            self._set_role(user_id_str, None)
+            return
+
+        if user_id_str not in self.roles:
+            self._set_role(user_id_str, self.role_lookup(int(user_id_str)))
+
+        total_time = self.tracker.get_total_time(int(user_id_str))
+        self._set_status(user_id_str, compute_status(user_data, self.roles[user_id_str], total_time))
+
+    def on_user_changed(self, user_id_str: str, user_data: Optional[Dict[str, Any]]) -> None:
+        """Listener del tracker: recalcular solo el usuario modificado"""
+        self._recompute(user_id_str, user_data)
+
+    def set_role(self, user_id: int, role_type: str) -> None:
+        """Registrar el rol actual de un usuario y recalcular su estado si cambió"""
+        user_id_str = str(user_id)
+        user_data = self.tracker.get_user_data(user_id)
+        if user_data is None:
+            return
+        if self.roles.get(user_id_str) == role_type and user_id_str in self.status:
+            return
+        role_changed = self.roles.get(user_id_str) != role_type
+        self._set_role(user_id_str, role_type)
+        self._recompute(user_id_str, user_data)
+
+        if role_changed:
+            for callback in self._role_listeners:
+                try:
+                    callback(user_id_str, role_type)
+                except Exception as e:
+                    print(f"Error notificando cambio de rol de {user_id_str}: {e}")
+
+    def rebuild(self) -> None:
+        """Recalcular roles y estados de todos los usuarios (al conectar con el servidor)"""
+        self.status = {}
+        self.roles = {}
+        self.by_role = {}
+        self.by_status = {status: set() for status in STATUS_LABELS}
+        for user_id_str, user_data in self.tracker.data.items():
+            self._recompute(user_id_str, user_data)
+
+    def get_status(self, user_id: int) -> str:
+        """Estado materializado de un usuario"""
+        user_id_str = str(user_id)
+        if user_id_str not in self.status:
+            self._recompute(user_id_str, self.tracker.get_user_data(user_id))
+        return self.status.get(user_id_str, STATUS_INACTIVE)
+
+    def get_label(self, user_id: int) -> str:
+        """Texto del estado para mostrar en embeds"""
+        return STATUS_LABELS[self.get_status(user_id)]
+
+    def get_role_type(self, user_id: int) -> str:
+        """Rol resuelto la última vez que cambió el usuario"""
+        user_id_str = str(user_id)
+        if user_id_str not in self.roles:
+            self.get_status(user_id)
+        return self.roles.get(user_id_str, "normal")
+
+    def get_ids(self, status: str) -> Set[str]:
+        """IDs de usuarios en un estado"""
+        return set(self.by_status.get(status, set()))
+
+    def get_ids_by_role(self, role_type: str) -> Set[str]:
+        """IDs de usuarios registrados con un tier"""
+        return set(self.by_role.get(role_type, set()))
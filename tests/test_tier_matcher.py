@@ -0,0 +1,144 @@
+import json
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tier_matcher import TierMatcher
+
+GOLD_ROLE_ID = 1430689715761451116
+EXTRA_GOLD_ROLE_ID = 1382198935971430440
+
+
+def baseline_role_type(member, ROLE_TIERS):
+    """Copia de get_user_role_type antes del matcher precompilado (oráculo de la prueba)"""
+    if not member:
+        return "normal"
+
+    role_priority = ["supremos", "monarquia", "nobleza", "imperiales", "altos"]
+
+    for tier_name in role_priority:
+        tier_config = ROLE_TIERS.get(tier_name, {})
+        tier_role_id = tier_config.get('role_id')
+        if tier_role_id and isinstance(tier_role_id, int):
+            for role in member.roles:
+                if role.id == tier_role_id:
+                    return tier_name
+
+    tier_names = {
+        "medios": ["medios", "medio", "[⚔️]  medios", "[⚔️] medios"],
+        "altos": ["altos", "alto", "[⚔️]  altos", "[⚔️] altos"],
+        "imperiales": ["imperiales", "imperial", "[👑]  imperiales", "[👑] imperiales"],
+        "nobleza": ["nobleza", "[🏰]  nobleza", "[🏰] nobleza"],
+        "monarquia": ["monarquia", "monarquía", "[💎]  monarquia", "[💎] monarquía"],
+        "supremos": ["supremos", "supremo", "[⭐]  supremos", "[⭐] supremos"]
+    }
+
+    for tier_name in role_priority:
+        if tier_name in tier_names:
+            for role in member.roles:
+                role_name_lower = role.name.lower().strip()
+                for valid_name in tier_names[tier_name]:
+                    if valid_name.lower() in role_name_lower:
+                        return tier_name
+
+    gold_role_ids = [GOLD_ROLE_ID, EXTRA_GOLD_ROLE_ID]
+    for role in member.roles:
+        if role.id in gold_role_ids:
+            return "gold"
+
+    gold_names = ["gold", "[🟡]  gold", "[🟡] gold", "🟡 gold", "[🟡]gold", "🟡gold"]
+    for role in member.roles:
+        role_name_lower = role.name.lower().strip()
+        role_name_cleaned = ' '.join(role_name_lower.split())
+        for valid_name in gold_names:
+            valid_name_cleaned = ' '.join(valid_name.lower().split())
+            if valid_name_cleaned in role_name_cleaned or role_name_cleaned in valid_name_cleaned:
+                return "gold"
+
+    for tier_name in ["medios"]:
+        tier_config = ROLE_TIERS.get(tier_name, {})
+        tier_role_id = tier_config.get('role_id')
+        if tier_role_id and isinstance(tier_role_id, int):
+            for role in member.roles:
+                if role.id == tier_role_id:
+                    return tier_name
+
+        tier_names_medios = {
+            "medios": ["medios", "medio", "[⚔️]  medios", "[⚔️] medios"]
+        }
+        if tier_name in tier_names_medios:
+            for role in member.roles:
+                role_name_lower = role.name.lower().strip()
+                for valid_name in tier_names_medios[tier_name]:
+                    if valid_name.lower() in role_name_lower:
+                        return tier_name
+
+    return "normal"
+
+
+def load_role_tiers():
+    with open(os.path.join(ROOT, 'config.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)['role_tiers']
+
+
+NAME_POOL = [
+    "", " ", "@everyone", "Verificado", "Recluta", "Staff", "Gold", "GOLD", "[🟡] Gold", "🟡gold",
+    "go", "ld", "Golden Boys", "Medios", "[⚔️] Medios", "Medio", "Altos", "ALTO", "[⚔️]  Altos",
+    "Imperial", "[👑] Imperiales", "Nobleza", "[🏰]  Nobleza", "Monarquía", "monarquia", "[💎] Monarquía",
+    "Supremo", "[⭐] Supremos", "  supremos  ", "Intermedios", "Saltos", "Nobleza y Altos",
+    "Ex-Supremo", "gold medios", "  ", "\tgold", "mod", "🟡", "[🟡]",
+]
+
+
+def random_role_name(rng):
+    if rng.random() < 0.7:
+        name = rng.choice(NAME_POOL)
+    else:
+        name = "".join(rng.choice("abcdeglmnorstuv []🟡") for _ in range(rng.randint(0, 10)))
+    if rng.random() < 0.2:
+        name = name.upper()
+    if rng.random() < 0.1:
+        name = f"  {name}  "
+    return name
+
+
+def random_member(rng, role_ids):
+    roles = [
+        SimpleNamespace(id=rng.choice(role_ids), name=random_role_name(rng))
+        for _ in range(rng.randint(0, 6))
+    ]
+    return SimpleNamespace(roles=roles)
+
+
+def check_random_members(role_tiers, cases, seed):
+    rng = random.Random(seed)
+    matcher = TierMatcher(role_tiers, [GOLD_ROLE_ID, EXTRA_GOLD_ROLE_ID])
+    configured_ids = [tier.get('role_id') for tier in role_tiers.values() if tier.get('role_id')]
+    role_ids = configured_ids + [GOLD_ROLE_ID, EXTRA_GOLD_ROLE_ID] + [rng.randint(1, 10 ** 18) for _ in range(10)]
+    for _ in range(cases):
+        member = random_member(rng, role_ids)
+        expected = baseline_role_type(member, role_tiers)
+        assert matcher.resolve(member) == expected, [(role.id, role.name) for role in member.roles]
+
+
+def test_matches_baseline_on_random_role_sets():
+    check_random_members(load_role_tiers(), cases=20000, seed=32)
+
+
+def test_matches_baseline_with_partial_tier_config():
+    role_tiers = load_role_tiers()
+    # Niveles sin role_id (o con un valor no entero) solo se resuelven por nombre
+    role_tiers['nobleza'] = {k: v for k, v in role_tiers['nobleza'].items() if k != 'role_id'}
+    role_tiers['altos'] = dict(role_tiers['altos'], role_id=str(role_tiers['altos']['role_id']))
+    del role_tiers['medios']
+    check_random_members(role_tiers, cases=5000, seed=320)
+
+
+def test_no_member_is_normal():
+    matcher = TierMatcher(load_role_tiers(), [GOLD_ROLE_ID, EXTRA_GOLD_ROLE_ID])
+    assert matcher.resolve(None) == "normal"
+    assert matcher.resolve(SimpleNamespace(roles=[])) == "normal"
@@ -0,0 +1,102 @@
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# Niveles por ID/nombre en orden de jerarquía (Medios se evalúa aparte, después de Gold)
+TIER_PRIORITY = ["supremos", "monarquia", "nobleza", "imperiales", "altos"]
+
+# Alias de nombre de rol por nivel (coincidencia por contenido, sin distinguir mayúsculas)
+TIER_NAME_ALIASES = {
+    "medios": ["medios", "medio", "[⚔️]  medios", "[⚔️] medios"],
+    "altos": ["altos", "alto", "[⚔️]  altos", "[⚔️] altos"],
+    "imperiales": ["imperiales", "imperial", "[👑]  imperiales", "[👑] imperiales"],
+    "nobleza": ["nobleza", "[🏰]  nobleza", "[🏰] nobleza"],
+    "monarquia": ["monarquia", "monarquía", "[💎]  monarquia", "[💎] monarquía"],
+    "supremos": ["supremos", "supremo", "[⭐]  supremos", "[⭐] supremos"]
+}
+
+GOLD_NAME_ALIASES = ["gold", "[🟡]  gold", "[🟡] gold", "🟡 gold", "[🟡]gold", "🟡gold"]
+
+# Etapas de resolución: gana la etapa más baja y, dentro de ella, el nivel de mayor jerarquía
+STAGE_TIER_ID = 1
+STAGE_TIER_NAME = 2
+STAGE_GOLD_ID = 3
+STAGE_GOLD_NAME = 4
+STAGE_MEDIOS_ID = 5
+STAGE_MEDIOS_NAME = 6
+
+NO_MATCH = (99, 0, "normal")
+
+
+class TierMatcher:
+    """Resolución de tier compilada una vez desde la configuración de roles
+
+    Cada rol del miembro se traduce a un rango (etapa, jerarquía, tier) con búsquedas en
+    diccionarios: por ID con un mapa precompilado y por nombre con un resultado memorizado
+    por nombre de rol. El tier del miembro es el de menor rango, igual que el orden de
+    prioridades de la resolución original.
+    """
+
+    def __init__(self, role_tiers: Dict[str, Any], gold_role_ids: Iterable[int]):
+        self.id_ranks: Dict[int, Tuple[int, int, str]] = {}
+
+        for priority, tier_name in enumerate(TIER_PRIORITY):
+            self._add_id(role_tiers.get(tier_name, {}).get('role_id'), (STAGE_TIER_ID, priority, tier_name))
+        for gold_role_id in gold_role_ids:
+            self._add_id(gold_role_id, (STAGE_GOLD_ID, 0, "gold"))
+        self._add_id(role_tiers.get("medios", {}).get('role_id'), (STAGE_MEDIOS_ID, 0, "medios"))
+
+        self.tier_aliases: List[Tuple[int, str, List[str]]] = [
+            (priority, tier_name, [alias.lower() for alias in TIER_NAME_ALIASES[tier_name]])
+            for priority, tier_name in enumerate(TIER_PRIORITY)
+        ]
+        self.gold_aliases = [' '.join(alias.lower().split()) for alias in GOLD_NAME_ALIASES]
+        self.medios_aliases = [alias.lower() for alias in TIER_NAME_ALIASES["medios"]]
+
+        # nombre de rol -> rango por nombre (los nombres se repiten entre miembros)
+        self.name_ranks: Dict[str, Tuple[int, int, str]] = {}
+
+    def _add_id(self, role_id: Any, rank: Tuple[int, int, str]) -> None:
+        if role_id and isinstance(role_id, int):
+            current = self.id_ranks.get(role_id)
+            if current is None or rank < current:
+                self.id_ranks[role_id] = rank
+
+    def _compile_name_rank(self, role_name: str) -> Tuple[int, int, str]:
+        role_name_lower = role_name.lower().strip()
+
+        for priority, tier_name, aliases in self.tier_aliases:
+            for alias in aliases:
+                if alias in role_name_lower:
+                    return (STAGE_TIER_NAME, priority, tier_name)
+
+        role_name_cleaned = ' '.join(role_name_lower.split())
+        for alias in self.gold_aliases:
+            if alias in role_name_cleaned or role_name_cleaned in alias:
+                return (STAGE_GOLD_NAME, 0, "gold")
+
+        for alias in self.medios_aliases:
+            if alias in role_name_lower:
+                return (STAGE_MEDIOS_NAME, 0, "medios")
+
+        return NO_MATCH
+
+    def name_rank(self, role_name: str) -> Tuple[int, int, str]:
+        rank = self.name_ranks.get(role_name)
+        if rank is None:
+            rank = self._compile_name_rank(role_name)
+            self.name_ranks[role_name] = rank
+        return rank
+
+    def resolve(self, member: Optional[Any]) -> str:
+        """Tier del miembro en una sola pasada por sus roles"""
+        if not member:
+            return "normal"
+
+        best = NO_MATCH
+        for role in member.roles:
+            id_rank = self.id_ranks.get(role.id)
+            if id_rank is not None and id_rank < best:
+                best = id_rank
+            name_rank = self.name_rank(role.name)
+            if name_rank < best:
+                best = name_rank
+        return best[2]
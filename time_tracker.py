@@ -1,15 +1,60 @@
 import json
 import os
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, Optional, Tuple, Set, Iterable, Callable, List
+
+from name_index import NameSearchIndex, SortedNameIndex
+from credit_ledger import CreditLedger, KIND_RESET, KIND_DELETE, KIND_RECONCILE
+from notification_outbox import NotificationJournal
+
+# Banderas de estado que se indexan por usuario (flag -> ids con la bandera en True)
+STATE_FLAGS = ('is_active', 'is_paused', 'is_pre_registered', 'milestone_completed')
 
 class TimeTracker:
-    def __init__(self, data_file: str = "user_times.json"):
+    def __init__(self, data_file: str = "user_times.json", attendance_file: str = "attendance_data.json",
+                 ledger_file: str = "credit_ledger.jsonl", notification_journal_file: str = "notification_journal.jsonl"):
         self.data_file = data_file
         self.data = self.load_data()
-        self.attendance_file = "attendance_data.json"
+        # Marcas de lote y entregas de los avisos pendientes desde el último guardado
+        self.notification_journal = NotificationJournal(notification_journal_file)
+        self._apply_notification_journal()
+        # Lista del servidor que recibe los avisos sin entregar de los usuarios eliminados
+        self.notification_fallback: Optional[Any] = None
+        self.attendance_file = attendance_file
         self.attendance_data = self.load_attendance_data()
 
+        # Índices secundarios por estado para no recorrer todos los usuarios
+        self.state_index: Dict[str, Set[str]] = {flag: set() for flag in STATE_FLAGS}
+        self.rebuild_state_indexes()
+
+        # Índice de búsqueda por nombre (prefijos + trigramas, sin tildes) y orden alfabético
+        user_names = [
+            (user_id_str, user_data.get('name', f'Usuario {user_id_str}'))
+            for user_id_str, user_data in self.data.items()
+        ]
+        self.name_index = NameSearchIndex()
+        self.name_index.rebuild(user_names)
+        self.sorted_index = SortedNameIndex()
+        self.sorted_index.rebuild(user_names)
+
+        # Historial append-only de movimientos de créditos (el saldo sigue en confirmed_credits).
+        # Los movimientos se escriben después de guardar el saldo que los origina; si el proceso
+        # se corta entre los dos, al cargar se registra el ajuste que falte
+        self.credit_ledger = CreditLedger(ledger_file)
+        self._pending_credit_events: List[Tuple[str, str, float, float, datetime]] = []
+        self.reconcile_credit_ledger()
+
+        # Versión por usuario, incrementada en cada cambio (para cachés de renderizado)
+        self.versions: Dict[str, int] = {}
+
+        # Callbacks (user_id_str, user_data o None si se eliminó) avisados en cada cambio
+        self._change_listeners: List[Callable[[str, Optional[Dict[str, Any]]], None]] = []
+
+        # Guardados aplazados dentro de batch_save() (se escribe una sola vez al salir)
+        self._batch_depth = 0
+        self._batch_dirty = False
+
     def load_data(self) -> Dict[str, Any]:
         """Cargar datos desde el archivo JSON"""
         try:
@@ -23,11 +68,293 @@ class TimeTracker:
 
     def save_data(self) -> None:
         """Guardar datos al archivo JSON"""
+        if self._batch_depth:
+            self._batch_dirty = True
+            return
         try:
             with open(self.data_file, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, indent=2, ensure_ascii=False)
         except Exception as e:
             print(f"Error guardando datos: {e}")
+            return
+        # Lo escrito ya incluye las marcas y entregas de avisos del journal
+        self.notification_journal.compact()
+        self._flush_credit_events()
+        # Lo guardado es la fuente de verdad: comprobar que los índices siguen coincidiendo
+        self.verify_state_indexes()
+
+    @contextmanager
+    def batch_save(self):
+        """Agrupar los guardados de muchas operaciones en una sola escritura al salir"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0 and self._batch_dirty:
+                self._batch_dirty = False
+                self.save_data()
+
+    def _new_user_record(self, user_name: str) -> Dict[str, Any]:
+        """Crear el registro vacío de un usuario nuevo"""
+        return {
+            'name': user_name,
+            'total_time': 0,
+            'sessions': [],
+            'is_active': False,
+            'is_paused': False,
+            'pause_count': 0,
+            'notified_milestones': [],
+            'milestone_completed': False,
+            'is_pre_registered': False
+        }
+
+    def add_change_listener(self, callback: Callable[[str, Optional[Dict[str, Any]]], None]) -> None:
+        """Registrar un callback que se llama cada vez que cambia (o se elimina) un usuario"""
+        self._change_listeners.append(callback)
+
+    def _touch_user(self, user_id_str: str) -> None:
+        """Actualizar los índices secundarios tras modificar (o eliminar) un usuario"""
+        user_data = self.data.get(user_id_str)
+        self.versions[user_id_str] = self.versions.get(user_id_str, 0) + 1
+        for flag, ids in self.state_index.items():
+            if user_data is not None and user_data.get(flag, False):
+                ids.add(user_id_str)
+            else:
+                ids.discard(user_id_str)
+
+        if user_data is not None:
+            user_name = user_data.get('name', f'Usuario {user_id_str}')
+            self.name_index.update(user_id_str, user_name)
+            self.sorted_index.update(user_id_str, user_name)
+        else:
+            self.name_index.remove(user_id_str)
+            self.sorted_index.remove(user_id_str)
+
+        for callback in self._change_listeners:
+            try:
+                callback(user_id_str, user_data)
+            except Exception as e:
+                print(f"Error notificando cambio de usuario {user_id_str}: {e}")
+
+    def rebuild_state_indexes(self) -> int:
+        """Reconstruir los índices de estado desde los datos y devolver cuántas entradas estaban desincronizadas"""
+        fresh: Dict[str, Set[str]] = {flag: set() for flag in STATE_FLAGS}
+        for user_id_str, user_data in self.data.items():
+            for flag in STATE_FLAGS:
+                if user_data.get(flag, False):
+                    fresh[flag].add(user_id_str)
+
+        mismatches = sum(len(fresh[flag] ^ self.state_index.get(flag, set())) for flag in STATE_FLAGS)
+        self.state_index = fresh
+        return mismatches
+
+    def verify_state_indexes(self) -> bool:
+        """Verificar que los índices coinciden con los datos (los reconstruye si no)"""
+        mismatches = self.rebuild_state_indexes()
+        if mismatches:
+            print(f"⚠️ Índices de estado desincronizados ({mismatches} entradas), reconstruidos")
+        return mismatches == 0
+
+    def get_active_user_ids(self) -> Set[str]:
+        """IDs de usuarios con tiempo activo"""
+        return set(self.state_index['is_active'])
+
+    def get_paused_user_ids(self) -> Set[str]:
+        """IDs de usuarios con tiempo pausado"""
+        return set(self.state_index['is_paused'])
+
+    def get_pre_registered_user_ids(self) -> Set[str]:
+        """IDs de usuarios pre-registrados"""
+        return set(self.state_index['is_pre_registered'])
+
+    def get_completed_user_ids(self) -> Set[str]:
+        """IDs de usuarios que completaron su milestone"""
+        return set(self.state_index['milestone_completed'])
+
+    def get_version(self, user_id_str: str) -> int:
+        """Versión del registro de un usuario (cambia cada vez que se modifica)"""
+        return self.versions.get(user_id_str, 0)
+
+    def search_users(self, term: str, limit: Optional[int] = None,
+                     restrict_to: Optional[Set[str]] = None) -> List[str]:
+        """Buscar usuarios por nombre y devolver sus IDs ordenados por relevancia"""
+        return self.name_index.search(term, limit=limit, restrict_to=restrict_to)
+
+    def get_users_by_ids(self, user_ids: Iterable[str]) -> Dict[str, Any]:
+        """Obtener los datos de un conjunto de usuarios (ignora IDs inexistentes)"""
+        return {uid: self.data[uid] for uid in user_ids if uid in self.data}
+
+    def ensure_user(self, user_id: int, user_name: str) -> Dict[str, Any]:
+        """Obtener el registro de un usuario creándolo si no existe"""
+        user_id_str = str(user_id)
+        if user_id_str not in self.data:
+            self.data[user_id_str] = self._new_user_record(user_name)
+            self._touch_user(user_id_str)
+        return self.data[user_id_str]
+
+    def mark_milestone_completed(self, user_id: int) -> bool:
+        """Marcar que el usuario completó su tiempo máximo"""
+        user_id_str = str(user_id)
+        if user_id_str not in self.data:
+            return False
+
+        self.data[user_id_str]['milestone_completed'] = True
+        self._touch_user(user_id_str)
+        self.save_data()
+        return True
+
+    def _record_credits(self, user_id_str: str, kind: str, new_balance: float) -> None:
+        """Fijar el saldo de créditos confirmados registrando el movimiento en el ledger"""
+        user_data = self.data[user_id_str]
+        old_balance = user_data.get('confirmed_credits', 0)
+        user_data['confirmed_credits'] = new_balance
+        self._queue_credit_event(user_id_str, kind, round(new_balance - old_balance, 2), new_balance)
+
+    def _record_deletion(self, user_id_str: str) -> None:
+        """Registrar en el ledger que un usuario eliminado deja su saldo en 0"""
+        balance = self.data[user_id_str].get('confirmed_credits', 0)
+        if balance or self.credit_ledger.last_balance(user_id_str) is not None:
+            self._queue_credit_event(user_id_str, KIND_DELETE, round(-balance, 2), 0)
+
+    def _queue_credit_event(self, user_id_str: str, kind: str, delta: float, balance: float) -> None:
+        """Movimiento pendiente de escribir en el ledger (se escribe tras el guardado del saldo)"""
+        self._pending_credit_events.append((user_id_str, kind, delta, balance, datetime.now()))
+
+    def _flush_credit_events(self) -> None:
+        events, self._pending_credit_events = self._pending_credit_events, []
+        for user_id_str, kind, delta, balance, when in events:
+            self.credit_ledger.append(user_id_str, kind, delta, balance, when=when)
+
+    def reconcile_credit_ledger(self) -> int:
+        """Ajustar el ledger a los saldos guardados (al cargar) y devolver cuántos usuarios difieren
+
+        Cubre los movimientos que no llegaron a escribirse (corte entre el guardado y el ledger)
+        y los saldos anteriores a que existiera el ledger.
+        """
+        adjusted = 0
+        for user_id_str, user_data in self.data.items():
+            balance = user_data.get('confirmed_credits', 0)
+            last_balance = self.credit_ledger.last_balance(user_id_str)
+            if round(balance - (last_balance or 0), 2) != 0:
+                self.credit_ledger.append(user_id_str, KIND_RECONCILE, round(balance - (last_balance or 0), 2), balance)
+                adjusted += 1
+        for user_id_str in list(self.credit_ledger.user_positions):
+            last_balance = self.credit_ledger.last_balance(user_id_str)
+            if user_id_str not in self.data and last_balance:
+                self.credit_ledger.append(user_id_str, KIND_DELETE, round(-last_balance, 2), 0)
+                adjusted += 1
+        if adjusted:
+            print(f"⚠️ Ledger de créditos ajustado para {adjusted} usuarios que no coincidían con sus saldos")
+        return adjusted
+
+    def set_confirmed_credits(self, user_id: int, credits: float, kind: str) -> bool:
+        """Fijar los créditos confirmados de un usuario (kind: tipo de movimiento del ledger)"""
+        user_id_str = str(user_id)
+        if user_id_str not in self.data:
+            return False
+
+        self._record_credits(user_id_str, kind, credits)
+        self._touch_user(user_id_str)
+        self.save_data()
+        return True
+
+    def _apply_notification_journal(self) -> None:
+        """Aplicar a los avisos cargados las marcas y entregas posteriores al último guardado"""
+        marks, delivered = self.notification_journal.replay()
+        if not marks and not delivered:
+            return
+        for user_data in self.data.values():
+            pending = user_data.get('pending_notifications')
+            if not pending:
+                continue
+            kept = [entry for entry in pending if entry.get('id') not in delivered]
+            for entry in kept:
+                entry.update(marks.get(entry.get('id'), {}))
+            if kept:
+                user_data['pending_notifications'] = kept
+            else:
+                del user_data['pending_notifications']
+
+    def _hand_off_notifications(self, user_id_strs: Iterable[str]) -> None:
+        """Pasar a la lista del servidor los avisos sin entregar de usuarios que se van a eliminar
+
+        Se escriben allí antes del guardado que borra los registros, así no se pierden.
+        """
+        entries = [entry for user_id_str in user_id_strs
+                   for entry in self.data.get(user_id_str, {}).get('pending_notifications', [])]
+        if not entries:
+            return
+        if self.notification_fallback is None:
+            print(f"⚠️ {len(entries)} avisos sin entregar se pierden con los usuarios eliminados")
+            return
+        self.notification_fallback.adopt_pending_notifications(entries)
+
+    def add_pending_notification(self, user_id_str: str, entry: Dict[str, Any]) -> bool:
+        """Adjuntar un aviso pendiente al registro del usuario
+
+        No guarda: el aviso se escribe en el mismo guardado que el cambio de estado que lo origina.
+        """
+        user_data = self.data.get(user_id_str)
+        if user_data is None:
+            return False
+        user_data.setdefault('pending_notifications', []).append(entry)
+        return True
+
+    def mark_pending_notifications(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """Guardar la marca de lote de avisos (en el journal, sin reescribir los datos)"""
+        self.notification_journal.append([
+            {'id': entry['id'], 'batch': entry['batch'], 'attempted_at': entry['attempted_at']}
+            for entry in entries
+        ])
+
+    def remove_pending_notifications(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Quitar avisos ya entregados de los registros de sus usuarios
+
+        La entrega se anota en el journal; los registros se escriben en el siguiente guardado.
+        """
+        ids_by_user: Dict[str, Set[str]] = {}
+        for entry in entries:
+            ids_by_user.setdefault(entry['owner'], set()).add(entry['id'])
+
+        removed = 0
+        for user_id_str, entry_ids in ids_by_user.items():
+            user_data = self.data.get(user_id_str)
+            if user_data is None or not user_data.get('pending_notifications'):
+                continue
+            pending = user_data['pending_notifications']
+            kept = [entry for entry in pending if entry.get('id') not in entry_ids]
+            removed += len(pending) - len(kept)
+            if kept:
+                user_data['pending_notifications'] = kept
+            else:
+                del user_data['pending_notifications']
+        if removed:
+            self.notification_journal.append([{'id': entry_id, 'delivered': True}
+                                              for entry_ids in ids_by_user.values() for entry_id in entry_ids])
+        return removed
+
+    def get_pending_notifications(self) -> List[Dict[str, Any]]:
+        """Avisos guardados sin entregar de todos los usuarios"""
+        pending = []
+        for user_data in self.data.values():
+            pending.extend(user_data.get('pending_notifications', []))
+        return pending
+
+    def remove_users(self, user_id_strs: Iterable[str]) -> int:
+        """Eliminar varios usuarios con un solo guardado"""
+        removed = 0
+        user_id_strs = list(user_id_strs)
+        self._hand_off_notifications(user_id_strs)
+        for user_id_str in user_id_strs:
+            if user_id_str in self.data:
+                self._record_deletion(user_id_str)
+                del self.data[user_id_str]
+                self._touch_user(user_id_str)
+                removed += 1
+        if removed:
+            self.save_data()
+        return removed
 
     def pre_register_user(self, user_id: int, user_name: str) -> bool:
         """Pre-registrar usuario para inicio automático"""
@@ -35,17 +362,7 @@ class TimeTracker:
         current_time = datetime.now().isoformat()
 
         if user_id_str not in self.data:
-            self.data[user_id_str] = {
-                'name': user_name,
-                'total_time': 0,
-                'sessions': [],
-                'is_active': False,
-                'is_paused': False,
-                'pause_count': 0,
-                'notified_milestones': [],
-                'milestone_completed': False,
-                'is_pre_registered': False
-            }
+            self.data[user_id_str] = self._new_user_record(user_name)
 
         user_data = self.data[user_id_str]
 
@@ -62,26 +379,21 @@ class TimeTracker:
         user_data['pre_register_time'] = current_time
         user_data['name'] = user_name  # Actualizar nombre
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
-    def start_tracking(self, user_id: int, user_name: str) -> bool:
-        """Iniciar seguimiento de tiempo para un usuario"""
+    def start_tracking(self, user_id: int, user_name: str, source: Optional[str] = None) -> bool:
+        """Iniciar seguimiento de tiempo para un usuario
+
+        Con source="voice" (entrada al canal de voz) la sesión se marca para que, al reconectar
+        el bot, se pause si el usuario salió del canal mientras estaba caído.
+        """
         user_id_str = str(user_id)
         current_time = datetime.now().isoformat()
 
         if user_id_str not in self.data:
-            self.data[user_id_str] = {
-                'name': user_name,
-                'total_time': 0,
-                'sessions': [],
-                'is_active': False,
-                'is_paused': False,
-                'pause_count': 0,
-                'notified_milestones': [],
-                'milestone_completed': False,
-                'is_pre_registered': False
-            }
+            self.data[user_id_str] = self._new_user_record(user_name)
 
         user_data = self.data[user_id_str]
 
@@ -106,7 +418,12 @@ class TimeTracker:
         user_data['is_paused'] = False
         user_data['last_start'] = current_time
         user_data['name'] = user_name  # Actualizar nombre
+        if source:
+            user_data['start_source'] = source
+        else:
+            user_data.pop('start_source', None)
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -133,6 +450,7 @@ class TimeTracker:
         user_data['is_paused'] = False
         user_data['is_pre_registered'] = False
         user_data['last_start'] = current_time
+        user_data.pop('start_source', None)
 
         # Limpiar pre-registro
         if 'pre_register_time' in user_data:
@@ -142,16 +460,13 @@ class TimeTracker:
         if 'pre_register_initiator' in user_data:
             del user_data['pre_register_initiator']
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
     def get_pre_registered_users(self) -> Dict[str, Any]:
         """Obtener usuarios pre-registrados"""
-        pre_registered = {}
-        for user_id_str, data in self.data.items():
-            if data.get('is_pre_registered', False):
-                pre_registered[user_id_str] = data
-        return pre_registered
+        return self.get_users_by_ids(self.state_index['is_pre_registered'])
 
     def stop_tracking(self, user_id: int) -> bool:
         """Detener seguimiento de tiempo para un usuario"""
@@ -177,6 +492,7 @@ class TimeTracker:
         # Marcar como inactivo
         user_data['is_active'] = False
         user_data['is_paused'] = False
+        user_data.pop('start_source', None)
 
         # Agregar sesión al historial
         if 'sessions' not in user_data:
@@ -189,11 +505,16 @@ class TimeTracker:
         }
         user_data['sessions'].append(session_record)
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
-    def pause_tracking(self, user_id: int, user_role_type: str = "normal") -> bool:
-        """Pausar seguimiento de tiempo para un usuario"""
+    def pause_tracking(self, user_id: int, user_role_type: str = "normal", source: Optional[str] = None) -> bool:
+        """Pausar seguimiento de tiempo para un usuario
+
+        Con source="voice" (salida del canal de voz) la pausa no cuenta para el límite de 3
+        y se marca para que volver al canal la reanude; las pausas de admin no se reanudan así.
+        """
         user_id_str = str(user_id)
 
         if user_id_str not in self.data:
@@ -204,10 +525,13 @@ class TimeTracker:
         if not user_data.get('is_active', False):
             return False
 
+        user_data.pop('start_source', None)
+
         # TODOS los usuarios (incluido Gold) siguen la misma lógica de pausas
-        user_data['pause_count'] = user_data.get('pause_count', 0) + 1
+        if source != "voice":
+            user_data['pause_count'] = user_data.get('pause_count', 0) + 1
 
-        if user_data['pause_count'] >= 3:
+        if user_data.get('pause_count', 0) >= 3:
             # Cancelar automáticamente al llegar a 3 pausas
             # Calcular tiempo perdido ANTES de modificar el total
             current_total = user_data.get('total_time', 0)
@@ -233,6 +557,7 @@ class TimeTracker:
                 del user_data['last_start']
             if 'pause_start' in user_data:
                 del user_data['pause_start']
+            user_data.pop('pause_source', None)
         else:
             # Comportamiento normal: añadir tiempo de sesión actual al total
             if user_data.get('last_start'):
@@ -244,12 +569,17 @@ class TimeTracker:
             user_data['is_active'] = False
             user_data['is_paused'] = True
             user_data['pause_start'] = datetime.now().isoformat()
+            if source:
+                user_data['pause_source'] = source
+            else:
+                user_data.pop('pause_source', None)
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
-    def resume_tracking(self, user_id: int) -> bool:
-        """Reanudar seguimiento de tiempo para un usuario pausado"""
+    def resume_tracking(self, user_id: int, source: Optional[str] = None) -> bool:
+        """Reanudar seguimiento de tiempo para un usuario pausado (source como en start_tracking)"""
         user_id_str = str(user_id)
 
         if user_id_str not in self.data:
@@ -264,11 +594,17 @@ class TimeTracker:
         user_data['is_active'] = True
         user_data['is_paused'] = False
         user_data['last_start'] = datetime.now().isoformat()
+        if source:
+            user_data['start_source'] = source
+        else:
+            user_data.pop('start_source', None)
 
         # Limpiar pause_start
         if 'pause_start' in user_data:
             del user_data['pause_start']
+        user_data.pop('pause_source', None)
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -332,9 +668,11 @@ class TimeTracker:
             del user_data['last_start']
         if 'pause_start' in user_data:
             del user_data['pause_start']
+        user_data.pop('pause_source', None)
         if 'pre_register_time' in user_data:
             del user_data['pre_register_time']
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -358,16 +696,18 @@ class TimeTracker:
         user_data['extra_minutes'] = 0  # Resetear minutos extra también
 
         # CONSERVAR créditos confirmados
-        user_data['confirmed_credits'] = confirmed_credits
+        self._record_credits(user_id_str, KIND_RESET, confirmed_credits)
 
         # Limpiar campos de seguimiento
         if 'last_start' in user_data:
             del user_data['last_start']
         if 'pause_start' in user_data:
             del user_data['pause_start']
+        user_data.pop('pause_source', None)
         if 'pre_register_time' in user_data:
             del user_data['pre_register_time']
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -380,7 +720,7 @@ class TimeTracker:
 
         # CONSERVAR tiempo histórico y créditos
         user_data['total_time'] = historical_time
-        user_data['confirmed_credits'] = confirmed_credits
+        self._record_credits(user_id_str, KIND_RESET, confirmed_credits)
 
         # Resetear SOLO estados para permitir trabajar nuevamente
         user_data['is_active'] = False
@@ -399,9 +739,11 @@ class TimeTracker:
             del user_data['last_start']
         if 'pause_start' in user_data:
             del user_data['pause_start']
+        user_data.pop('pause_source', None)
         if 'pre_register_time' in user_data:
             del user_data['pre_register_time']
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -414,7 +756,7 @@ class TimeTracker:
 
         # RESETEAR tiempo a 0 pero CONSERVAR créditos
         user_data['total_time'] = 0
-        user_data['confirmed_credits'] = confirmed_credits
+        self._record_credits(user_id_str, KIND_RESET, confirmed_credits)
 
         # Resetear SOLO estados para permitir trabajar nuevamente
         user_data['is_active'] = False
@@ -431,9 +773,11 @@ class TimeTracker:
             del user_data['last_start']
         if 'pause_start' in user_data:
             del user_data['pause_start']
+        user_data.pop('pause_source', None)
         if 'pre_register_time' in user_data:
             del user_data['pre_register_time']
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -455,7 +799,10 @@ class TimeTracker:
             return False
 
         # Eliminar completamente al usuario
+        self._hand_off_notifications([user_id_str])
+        self._record_deletion(user_id_str)
         del self.data[user_id_str]
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -488,14 +835,22 @@ class TimeTracker:
             del user_data['last_start']
         if 'pause_start' in user_data:
             del user_data['pause_start']
+        user_data.pop('pause_source', None)
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
     def clear_all_data(self) -> bool:
         """Limpiar completamente todos los datos"""
         try:
+            removed_ids = list(self.data.keys())
+            self._hand_off_notifications(removed_ids)
+            for user_id_str in removed_ids:
+                self._record_deletion(user_id_str)
             self.data = {}
+            for user_id_str in removed_ids:
+                self._touch_user(user_id_str)
             self.save_data()
             return True
         except Exception as e:
@@ -514,6 +869,7 @@ class TimeTracker:
         user_data['total_time'] = user_data.get('total_time', 0) + (minutes * 60)
         user_data['name'] = user_name  # Actualizar nombre
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -529,6 +885,7 @@ class TimeTracker:
         new_time = max(0, current_time - (minutes * 60))
         user_data['total_time'] = new_time
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
@@ -767,6 +1124,7 @@ class TimeTracker:
                 'admin_name': admin_name,
                 'timestamp': datetime.now().isoformat()
             }
+            self._touch_user(user_id_str)
             self.save_data()
 
     def get_time_initiator(self, user_id: int) -> Optional[Dict[str, Any]]:
@@ -781,6 +1139,7 @@ class TimeTracker:
         user_id_str = str(user_id)
         if user_id_str in self.data and 'time_initiator' in self.data[user_id_str]:
             del self.data[user_id_str]['time_initiator']
+            self._touch_user(user_id_str)
             self.save_data()
 
     def reset_weekly_manual_attendances(self) -> None:
@@ -905,6 +1264,7 @@ class TimeTracker:
                 'admin_name': admin_name,
                 'timestamp': datetime.now().isoformat()
             }
+            self._touch_user(user_id_str)
             self.save_data()
 
     def get_pre_register_initiator(self, user_id: int) -> Optional[Dict[str, Any]]:
@@ -919,6 +1279,7 @@ class TimeTracker:
         user_id_str = str(user_id)
         if user_id_str in self.data and 'pre_register_initiator' in self.data[user_id_str]:
             del self.data[user_id_str]['pre_register_initiator']
+            self._touch_user(user_id_str)
             self.save_data()
 
     def get_extra_minutes(self, user_id: int) -> int:
@@ -943,9 +1304,30 @@ class TimeTracker:
         user_data['extra_minutes'] = user_data.get('extra_minutes', 0) + minutes
         user_data['name'] = user_name  # Actualizar nombre
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
 
+    def clear_all_extra_minutes(self) -> int:
+        """Poner en 0 los minutos extra de todos los usuarios y devolver cuántos minutos se limpiaron"""
+        return self.clear_extra_minutes(list(self.data.keys()))
+
+    def clear_extra_minutes(self, user_id_strs: Iterable[str]) -> int:
+        """Poner en 0 los minutos extra de los usuarios dados (un solo guardado)"""
+        cleaned = 0
+        for user_id_str in user_id_strs:
+            user_data = self.data.get(user_id_str)
+            if user_data is None:
+                continue
+            extra_minutes = user_data.get('extra_minutes', 0)
+            if extra_minutes > 0:
+                cleaned += extra_minutes
+                user_data['extra_minutes'] = 0
+                self._touch_user(user_id_str)
+        if cleaned:
+            self.save_data()
+        return cleaned
+
     def subtract_extra_minutes(self, user_id: int, minutes: int) -> bool:
         """Restar minutos extra del usuario (no puede ser menor a 0)"""
         user_id_str = str(user_id)
@@ -960,5 +1342,6 @@ class TimeTracker:
         new_extra = max(0, current_extra - minutes)
         user_data['extra_minutes'] = new_extra
 
+        self._touch_user(user_id_str)
         self.save_data()
         return True
\ No newline at end of file
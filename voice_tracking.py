@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Dict, Any, Awaitable, Callable, Iterable, Optional, Tuple
+
+
+class VoicePresenceBatcher:
+    """Presencia en los canales de voz con periodo de gracia, aplicada por lotes
+
+    Cada entrada o salida solo anota la presencia deseada del usuario. Un emisor la revisa
+    cada batch_interval segundos y aplica juntas las que llevan grace_seconds sin cambiar;
+    si el usuario vuelve al estado ya aplicado antes de que pase la gracia (se desconecta y
+    reconecta), el cambio se descarta sin tocar el tracker. Así una ráfaga de entradas
+    termina en unas pocas llamadas a apply en lugar de una por evento.
+    """
+
+    def __init__(self, apply: Callable[[Dict[int, bool]], Awaitable[Any]],
+                 grace_seconds: float = 15.0, batch_interval: float = 2.0):
+        # apply({user_id: en_canal}) aplica los cambios de un lote
+        self.apply = apply
+        self.grace_seconds = grace_seconds
+        self.batch_interval = batch_interval
+        # user_id -> (en canal, momento del último cambio) pendiente de aplicar
+        self.pending: Dict[int, Tuple[bool, float]] = {}
+        # user_id -> última presencia aplicada
+        self.applied: Dict[int, bool] = {}
+        self.worker: Optional[asyncio.Task] = None
+
+        self.events = 0
+        self.debounced = 0
+        self.batches = 0
+        self.transitions = 0
+
+    def record(self, user_id: int, present: bool, force: bool = False) -> None:
+        """Anotar la presencia de un usuario (debe llamarse dentro del loop del bot)
+
+        Con force se vuelve a aplicar aunque coincida con la ya aplicada (p. ej. al llegar
+        la hora de inicio con el usuario ya conectado).
+        """
+        self.events += 1
+        if not force and self.applied.get(user_id, False) == present:
+            if self.pending.pop(user_id, None) is not None:
+                self.debounced += 1
+            return
+        previous = self.pending.get(user_id)
+        if previous is not None and previous[0] == present:
+            return
+        if previous is not None:
+            self.debounced += 1
+        self.pending[user_id] = (present, time.monotonic())
+        self._ensure_worker()
+
+    def record_many(self, user_ids: Iterable[int], present: bool, force: bool = False) -> None:
+        for user_id in user_ids:
+            self.record(user_id, present, force=force)
+
+    def forget(self, user_id: int) -> None:
+        self.pending.pop(user_id, None)
+        self.applied.pop(user_id, None)
+
+    def _ensure_worker(self) -> None:
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.get_running_loop().create_task(self._drain())
+
+    def _take_due(self) -> Dict[int, bool]:
+        """Sacar los cambios que ya superaron el periodo de gracia"""
+        now = time.monotonic()
+        due = {user_id: present for user_id, (present, changed_at) in self.pending.items()
+               if now - changed_at >= self.grace_seconds}
+        for user_id, present in due.items():
+            del self.pending[user_id]
+            self.applied[user_id] = present
+        return due
+
+    async def _drain(self) -> None:
+        while self.pending:
+            await asyncio.sleep(self.batch_interval)
+            due = self._take_due()
+            if not due:
+                continue
+            self.batches += 1
+            self.transitions += len(due)
+            try:
+                await self.apply(due)
+            except Exception as e:
+                print(f"❌ Error aplicando {len(due)} cambios de presencia en voz: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'pending': len(self.pending),
+            'in_voice': sum(1 for present in self.applied.values() if present),
+            'events': self.events,
+            'debounced': self.debounced,
+            'batches': self.batches,
+            'transitions': self.transitions
+        }